@@ -0,0 +1,303 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpRequest, HttpResponse
+
+logger = logging.getLogger(__name__)
+
+
+class RequestMetrics:
+    """
+    Numbers collected while handling a single request. Timings are in seconds and the ones of nested timers overlap,
+    e.g. categorization includes stemming.
+    """
+
+    def __init__(self) -> None:
+        self.sql_count = 0
+        self.timings: Dict[str, float] = {}
+
+    def add(self, name: str, elapsed: float) -> None:
+        self.timings[name] = self.timings.get(name, 0.0) + elapsed
+
+    def record_query(self, execute: Callable, sql: str, params: Any, many: bool, context: Dict[str, Any]) -> Any:
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_count += 1
+            self.add('sql', time.perf_counter() - started)
+
+    def server_timing(self) -> str:
+        entries = []
+        for name, elapsed in self.timings.items():
+            entry = f'{name};dur={elapsed * 1000:.1f}'
+            if name == 'sql':
+                entry += f';desc="{self.sql_count} queries"'
+            entries.append(entry)
+        return ', '.join(entries)
+
+
+current_metrics: ContextVar[Optional[RequestMetrics]] = ContextVar('current_metrics', default=None)
+
+
+def record_query(execute: Callable, sql: str, params: Any, many: bool, context: Dict[str, Any]) -> Any:
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics.record_query(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_query_recorder(sender: Any, connection: Any, **kwargs: Any) -> None:
+    # connections belong to threads and async views query from worker threads, so every connection gets the wrapper
+    # and finds the metrics of the request in the context copied to the thread; it goes first so that wrappers added
+    # with execute_wrapper are still removed by their own exit
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+@contextmanager
+def quiet_request_log(verbosity: int) -> Iterator[None]:
+    """
+    Hide the log line of every request made in the block, e.g. by the test client of a management command, unless
+    ``verbosity`` is above 1.
+    """
+    if verbosity > 1 or logger.level >= logging.WARNING:
+        yield
+        return
+
+    level = logger.level
+    logger.setLevel(logging.WARNING)
+    try:
+        yield
+    finally:
+        logger.setLevel(level)
+
+
+@contextmanager
+def timer(name: str) -> Iterator[None]:
+    """
+    Add the time spent in the block to the metrics of the current request, does nothing outside of one.
+    """
+    metrics = current_metrics.get()
+    if metrics is None:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add(name, time.perf_counter() - started)
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def merge(self, other: 'Histogram') -> None:
+        self.counts = [count + other_count for count, other_count in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum += other.sum
+
+    def as_dict(self) -> dict:
+        buckets = {}
+        cumulative = 0
+        for bound, count in zip([*map(str, self.buckets), '+Inf'], self.counts):
+            cumulative += count
+            buckets[bound] = cumulative
+        return {'count': self.count, 'sum': round(self.sum, 3), 'buckets': buckets}
+
+    def dump(self) -> dict:
+        return {'buckets': list(self.buckets), 'counts': self.counts, 'sum': self.sum}
+
+    @classmethod
+    def load(cls, data: dict) -> 'Histogram':
+        histogram = cls(data['buckets'])
+        histogram.counts = list(data['counts'])
+        histogram.count = sum(histogram.counts)
+        histogram.sum = data['sum']
+        return histogram
+
+
+Histograms = Dict[str, Dict[str, Histogram]]
+
+
+class MetricsRegistry:
+    """
+    Histograms of request metrics per view. Every process aggregates its own requests. With
+    ``METRICS_MULTIPROCESS_DIR`` set, each process also writes them to its own file in that directory at most every
+    ``METRICS_FLUSH_INTERVAL`` seconds and snapshots merge the files of all processes, like the multiprocess mode of
+    Prometheus clients. Files of stopped processes are kept, so their requests still count.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._views: Histograms = {}
+        self._pid = os.getpid()
+        self._path: Optional[Path] = None
+        self._next_flush = 0.0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._views = {}
+            self._next_flush = 0.0
+            if self._path is not None:
+                self._path.unlink(missing_ok=True)
+
+    def _check_process(self) -> None:
+        # a forked worker starts with its own histograms and file, the lock must be held
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._views = {}
+            self._path = None
+            self._next_flush = 0.0
+
+    def _flush(self, directory: Union[str, Path]) -> None:
+        # the lock must be held
+        if self._path is None:
+            # pids are reused, so a new process must not overwrite the file of a stopped one
+            self._path = Path(directory) / f'{self._pid}-{uuid.uuid4().hex}.json'
+        data = {
+            view: {name: histogram.dump() for name, histogram in histograms.items()}
+            for view, histograms in self._views.items()
+        }
+        temporary = self._path.with_suffix('.tmp')
+        temporary.write_text(json.dumps(data))
+        os.replace(temporary, self._path)
+        self._next_flush = time.monotonic() + settings.METRICS_FLUSH_INTERVAL
+
+    def record(self, view: str, metrics: RequestMetrics) -> None:
+        values: List[Tuple[str, float, Sequence[float]]] = [
+            ('sql_count', metrics.sql_count, settings.METRICS_QUERY_COUNT_BUCKETS)
+        ]
+        values += [
+            (name, elapsed * 1000, settings.METRICS_DURATION_BUCKETS) for name, elapsed in metrics.timings.items()
+        ]
+        directory = settings.METRICS_MULTIPROCESS_DIR
+        with self._lock:
+            self._check_process()
+            histograms = self._views.setdefault(view, {})
+            for name, value, buckets in values:
+                histograms.setdefault(name, Histogram(buckets)).observe(value)
+            if directory and time.monotonic() >= self._next_flush:
+                self._flush(directory)
+
+    def snapshot(self) -> Dict[str, Dict[str, dict]]:
+        directory = settings.METRICS_MULTIPROCESS_DIR
+        with self._lock:
+            self._check_process()
+            if not directory:
+                views = self._views
+            else:
+                self._flush(directory)
+                views = {}
+                for path in Path(directory).glob('*.json'):
+                    try:
+                        data = json.loads(path.read_text())
+                    except (OSError, ValueError):
+                        # removed or being replaced meanwhile
+                        continue
+                    for view, histograms in data.items():
+                        merged = views.setdefault(view, {})
+                        for name, dumped in histograms.items():
+                            histogram = Histogram.load(dumped)
+                            if name not in merged:
+                                merged[name] = histogram
+                            elif merged[name].buckets == histogram.buckets:
+                                # buckets are changed only by a deployment, old files are skipped then
+                                merged[name].merge(histogram)
+            return {
+                view: {name: histogram.as_dict() for name, histogram in histograms.items()}
+                for view, histograms in sorted(views.items())
+            }
+
+
+registry = MetricsRegistry()
+
+
+class MetricsMiddleware:
+    """
+    Measure SQL queries, the timers of the request and its total time. They are sent back in the Server-Timing
+    header, logged as JSON and aggregated per view in the registry. Queries run while streaming a response are not
+    included. Runs in the mode of the rest of the middleware, so it does not move async requests off the event loop.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Callable[[HttpRequest], Any]) -> None:
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # lets the middleware wrapping this one see it as a coroutine function, as MiddlewareMixin does
+            self._is_coroutine = asyncio.coroutines._is_coroutine  # type: ignore[attr-defined]
+
+    def __call__(self, request: HttpRequest) -> Union[HttpResponse, Awaitable[HttpResponse]]:
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics, started)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics, started)
+
+    def finish(
+        self, request: HttpRequest, response: HttpResponse, metrics: RequestMetrics, started: float
+    ) -> HttpResponse:
+        metrics.add('total', time.perf_counter() - started)
+
+        view = request.resolver_match.view_name if request.resolver_match else None
+        response['Server-Timing'] = metrics.server_timing()
+        logger.info(
+            json.dumps(
+                {
+                    'method': request.method,
+                    'path': request.path,
+                    'view': view,
+                    'status': response.status_code,
+                    'sql_count': metrics.sql_count,
+                    **{f'{name}_ms': round(elapsed * 1000, 3) for name, elapsed in metrics.timings.items()},
+                }
+            )
+        )
+        if view is not None:
+            registry.record(f'{request.method} {view}', metrics)
+        return response
@@ -0,0 +1,89 @@
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Iterator, Optional, Type, Union
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, models
+from django.http import HttpRequest, HttpResponse
+
+replica_reads: ContextVar[bool] = ContextVar('replica_reads', default=False)
+pinned_to_primary: ContextVar[bool] = ContextVar('pinned_to_primary', default=False)
+
+
+@contextmanager
+def read_from_replica() -> Iterator[None]:
+    """
+    Send reads made in the block to the replica, unless the current user wrote something recently.
+    """
+    token = replica_reads.set(True)
+    try:
+        yield
+    finally:
+        replica_reads.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Reads go to the primary unless they are made in ``read_from_replica``. Writes, and so row locks, always go to the
+    primary and migrations run only there. Entries of the database cache backend are always read from the primary,
+    invalidations would not be seen on a lagging replica.
+    """
+
+    def db_for_read(self, model: Type[models.Model], **hints: Any) -> Optional[str]:
+        if model._meta.app_label == 'django_cache':
+            return DEFAULT_DB_ALIAS
+        if settings.REPLICA_DATABASE and replica_reads.get() and not pinned_to_primary.get():
+            return str(settings.REPLICA_DATABASE)
+        return None
+
+    def db_for_write(self, model: Type[models.Model], **hints: Any) -> Optional[str]:
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1: models.Model, obj2: models.Model, **hints: Any) -> Optional[bool]:
+        return True
+
+    def allow_migrate(self, db: str, app_label: str, model_name: Optional[str] = None, **hints: Any) -> Optional[bool]:
+        return db == DEFAULT_DB_ALIAS
+
+
+class PrimaryPinMiddleware:
+    """
+    Pin the user's reads to the primary for ``REPLICA_PIN_SECONDS`` after each successful write, so they see their own
+    changes while the replica catches up. The pin is kept in a cookie to avoid a session write per request.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Callable[[HttpRequest], Any]) -> None:
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # lets the middleware wrapping this one see it as a coroutine function, as MiddlewareMixin does
+            self._is_coroutine = asyncio.coroutines._is_coroutine  # type: ignore[attr-defined]
+
+    def __call__(self, request: HttpRequest) -> Union[HttpResponse, Awaitable[HttpResponse]]:
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+
+        token = pinned_to_primary.set(settings.REPLICA_PIN_COOKIE in request.COOKIES)
+        try:
+            response = self.get_response(request)
+        finally:
+            pinned_to_primary.reset(token)
+        return self.pin_after_write(request, response)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        token = pinned_to_primary.set(settings.REPLICA_PIN_COOKIE in request.COOKIES)
+        try:
+            response = await self.get_response(request)
+        finally:
+            pinned_to_primary.reset(token)
+        return self.pin_after_write(request, response)
+
+    def pin_after_write(self, request: HttpRequest, response: HttpResponse) -> HttpResponse:
+        if request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE') and response.status_code < 400:
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax'
+            )
+        return response
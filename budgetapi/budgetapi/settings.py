@@ -14,7 +14,7 @@ import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
-from typing import List
+from typing import Any, Dict, List
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -41,13 +41,14 @@ INSTALLED_APPS = [
     'rest_framework',
     'corsheaders',
     'django_extensions',
-    'debug_toolbar',
     'drf_spectacular',
     'django_filters',
     'budgets',
 ]
 
 MIDDLEWARE = [
+    'budgetapi.metrics.MetricsMiddleware',
+    'budgetapi.replicas.PrimaryPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -56,9 +57,13 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
+if DEBUG:
+    # the toolbar middleware is sync only, with it every async request would be moved off the event loop
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+
 ROOT_URLCONF = 'budgetapi.urls'
 
 TEMPLATES = [
@@ -82,7 +87,7 @@ WSGI_APPLICATION = 'budgetapi.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
-DATABASES = {
+DATABASES: Dict[str, Dict[str, Any]] = {
     "default": {
         "ENGINE": "django.db.backends.postgresql_psycopg2",
         "NAME": os.environ.get('POSTGRES_DB'),
@@ -93,6 +98,32 @@ DATABASES = {
     }
 }
 
+# Heavy reads go to the replica when it is configured, see budgetapi.replicas
+if os.environ.get('POSTGRES_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.environ.get('POSTGRES_REPLICA_HOST'),
+        'PORT': os.environ.get('POSTGRES_REPLICA_PORT', DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['budgetapi.replicas.ReplicaRouter']
+REPLICA_DATABASE = 'replica' if 'replica' in DATABASES else None
+REPLICA_PIN_COOKIE = 'pin_primary'
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 5))
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+# Membership changes, the category index version and summary invalidations reach other workers only through a shared
+# backend such as memcached or DatabaseCache; with the default per-process cache they are seen when entries expire.
+
+CACHES: Dict[str, Dict[str, Any]] = {
+    'default': {
+        'BACKEND': os.environ.get('DJANGO_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('DJANGO_CACHE_LOCATION', ''),
+    }
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -129,7 +160,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': ['rest_framework.authentication.SessionAuthentication'],
     'DEFAULT_RENDERER_CLASSES': (
-        'djangorestframework_camel_case.render.CamelCaseJSONRenderer',
+        'budgets.renderers.FastCamelCaseJSONRenderer',
         'djangorestframework_camel_case.render.CamelCaseBrowsableAPIRenderer',
     ),
     'DEFAULT_PARSER_CLASSES': (
@@ -156,6 +187,47 @@ CORS_URLS_REGEX = r'^/api/.*$'
 
 SHELL_PLUS = "ipython"
 
+# Budgets
+BUDGETS_PRELOAD_STEMMER = os.environ.get('BUDGETS_PRELOAD_STEMMER') == 'True'
+BUDGETS_STEM_CACHE_SIZE = int(os.environ.get('BUDGETS_STEM_CACHE_SIZE', 50000))
+BUDGETS_CATEGORY_INDEX_TIMEOUT = int(os.environ.get('BUDGETS_CATEGORY_INDEX_TIMEOUT', 300))
+BUDGETS_CATEGORY_INDEX_POLL_INTERVAL = float(os.environ.get('BUDGETS_CATEGORY_INDEX_POLL_INTERVAL', 1))
+BUDGETS_BATCH_MAX_SIZE = 1000
+BUDGETS_EXPORT_CHUNK_SIZE = 2000
+BUDGETS_SUMMARY_CACHE_TIMEOUT = int(os.environ.get('BUDGETS_SUMMARY_CACHE_TIMEOUT', 24 * 60 * 60))
+BUDGETS_SUMMARY_CLOSE_DELAY = 10 * 60
+BUDGETS_MEMBERSHIP_CACHE_SIZE = 10000
+BUDGETS_MEMBERSHIP_CACHE_TIMEOUT = int(os.environ.get('BUDGETS_MEMBERSHIP_CACHE_TIMEOUT', 60))
+BUDGETS_MEMBERSHIP_CACHE_POLL_INTERVAL = float(os.environ.get('BUDGETS_MEMBERSHIP_CACHE_POLL_INTERVAL', 1))
+BUDGETS_BULK_MEMBERS_MAX_SIZE = 1000
+BUDGETS_PROFILE_DIR = os.environ.get('BUDGETS_PROFILE_DIR', BASE_DIR / 'profiles')
+BUDGETS_PROFILE_INTERVAL = int(os.environ.get('BUDGETS_PROFILE_INTERVAL', 60))
+BUDGETS_TRANSACTION_PARTITIONS_AHEAD = 3
+BUDGETS_TRANSACTION_RETENTION_MONTHS = None
+# Transfers are saved without a category and categorized later by the categorize_pending worker
+BUDGETS_DEFERRED_CATEGORIZATION = os.environ.get('BUDGETS_DEFERRED_CATEGORIZATION') == 'True'
+
+# Metrics
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'True') == 'True'
+METRICS_DURATION_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+METRICS_QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+# a directory shared by the server processes, emptied before they start, see budgetapi.metrics.MetricsRegistry
+METRICS_MULTIPROCESS_DIR = os.environ.get('METRICS_MULTIPROCESS_DIR')
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 1))
+
+LOGGING: Dict[str, Any] = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {'console': {'class': 'logging.StreamHandler'}},
+    'loggers': {
+        'budgetapi.metrics': {
+            'handlers': ['console'],
+            'level': os.environ.get('METRICS_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
 # DEBUG_TOOLBAR_CONFIG = {
 #     "SHOW_TOOLBAR_CALLBACK": lambda _: True,
 # }
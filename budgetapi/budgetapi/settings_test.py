@@ -0,0 +1,18 @@
+"""
+Settings of the test suite, ``manage.py test`` uses them instead of ``budgetapi.settings``.
+"""
+
+from budgetapi.settings import *  # noqa: F401, F403
+from budgetapi.settings import LOGGING
+
+# every request of the tests would be logged, test_metrics checks the log with assertLogs
+LOGGING = {
+    **LOGGING,
+    'loggers': {
+        **LOGGING['loggers'],
+        'budgetapi.metrics': {**LOGGING['loggers']['budgetapi.metrics'], 'level': 'WARNING'},
+    },
+}
+
+# the connection of the replica does not see data of test transactions, so only the replica tests route reads to it
+REPLICA_DATABASE = None
@@ -18,9 +18,13 @@ from django.contrib import admin
 from django.urls import include, path
 from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView
 
+from budgetapi.views import MetricsAPIView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/budgets/', include('budgets.urls', namespace='budgets')),
+    path('api/async/budgets/', include('budgets.async_urls', namespace='budgets-async')),
+    path('api/metrics/', MetricsAPIView.as_view(), name='metrics'),
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
     path('api/schema/redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc'),
 ]
@@ -1,6 +1,19 @@
+import gc
+
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class BudgetsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'budgets'
+
+    def ready(self) -> None:
+        import budgets.signals  # noqa: F401
+
+        if settings.BUDGETS_PRELOAD_STEMMER:
+            from budgets.categorization import get_stemmer
+
+            get_stemmer()
+            # keep the stemming tables out of GC bookkeeping so forked workers share their pages copy-on-write
+            gc.freeze()
@@ -0,0 +1,9 @@
+from budgets.async_views import AsyncBudgetRetrieveView, AsyncTransactionListView
+from django.urls import path
+
+app_name = 'budgets-async'
+
+urlpatterns = [
+    path('<int:pk>/', AsyncBudgetRetrieveView.as_view(), name='budget-details'),
+    path('<int:pk>/transactions/', AsyncTransactionListView.as_view(), name='transactions'),
+]
@@ -0,0 +1,131 @@
+import asyncio
+from abc import ABCMeta, abstractmethod
+from functools import update_wrapper
+from typing import Any, Awaitable, Callable, List, Optional, Tuple, TypeVar, cast
+
+from asgiref.sync import sync_to_async
+from budgets.filters import TransactionFilter
+from budgets.memberships import membership_cache
+from budgets.models import Budget, Transaction
+from budgets.pagination import KeysetPagination
+from budgets.renderers import FastCamelCaseJSONRenderer
+from budgets.serializers import BudgetSerializer, FastTransactionSerializer
+from django.contrib.auth.models import User
+from django.db import close_old_connections
+from django.http import HttpRequest, HttpResponse
+from django.http.response import HttpResponseBase
+from django.views import View
+from rest_framework.exceptions import APIException, NotAuthenticated, NotFound, PermissionDenied, ValidationError
+from rest_framework.request import Request
+
+from budgetapi.replicas import read_from_replica
+
+T = TypeVar('T')
+
+
+def database_sync_to_async(func: Callable[..., T]) -> Callable[..., Awaitable[T]]:
+    """
+    Run read-only database work in the thread pool instead of the single thread shared by sync code of all requests,
+    so concurrent requests do not wait for each other. The threads have their own connections, which are closed when
+    they are obsolete like the ones of requests.
+    """
+
+    def run(*args: Any, **kwargs: Any) -> T:
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(run, thread_sensitive=False)
+
+
+class AsyncAPIView(View, metaclass=ABCMeta):
+    """
+    Read-only view served natively by the ASGI handler. The ORM is synchronous in Django 3.2, so database work is
+    grouped into a single ``database_sync_to_async`` call per step while serialization and rendering stay on the event
+    loop. Responses mirror the DRF views of the same resources.
+    """
+
+    http_method_names = ['get', 'head', 'options']
+    renderer = FastCamelCaseJSONRenderer()
+
+    @classmethod
+    def as_view(cls: Any, **initkwargs: Any) -> Callable[..., HttpResponseBase]:
+        view = super().as_view(**initkwargs)
+
+        # Django 3.2 only awaits views that are coroutine functions themselves
+        async def async_view(request: HttpRequest, *args: Any, **kwargs: Any) -> HttpResponseBase:
+            response: Any = view(request, *args, **kwargs)
+            if asyncio.iscoroutine(response):
+                response = await response
+            return cast(HttpResponseBase, response)
+
+        return cast(Callable[..., HttpResponseBase], update_wrapper(async_view, view))
+
+    def render(self, data: Any, status: int = 200) -> HttpResponse:
+        return HttpResponse(self.renderer.render(data), status=status, content_type=self.renderer.media_type)
+
+    @staticmethod
+    def get_user(request: HttpRequest) -> Optional[User]:
+        user = request.user
+        return user if user.is_authenticated else None
+
+    async def get(self, request: HttpRequest, *args: Any, **kwargs: Any) -> HttpResponse:
+        try:
+            user = await database_sync_to_async(self.get_user)(request)
+            if user is None:
+                # session authentication has no WWW-Authenticate challenge, so DRF answers with 403 instead of 401
+                raise PermissionDenied(NotAuthenticated.default_detail)
+            return self.render(await self.get_data(Request(request), user, **kwargs))
+        except APIException as exc:
+            data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+            return self.render(data, status=exc.status_code)
+
+    @abstractmethod
+    async def get_data(self, request: Request, user: User, **kwargs: Any) -> Any:
+        """
+        Data of the response to the authenticated ``user``, database work has to go through ``database_sync_to_async``.
+        """
+
+
+class AsyncBudgetRetrieveView(AsyncAPIView):
+    @staticmethod
+    def get_budget(user: User, pk: int) -> Optional[Budget]:
+        if not membership_cache.is_member(user.pk, pk):
+            return None
+        budget = Budget.objects.filter(pk=pk).select_related('creator').prefetch_related('members').first()
+        if budget is not None:
+            # sharded budgets query their balance, it has to happen before serializing on the event loop
+            budget.total_balance
+        return budget
+
+    async def get_data(self, request: Request, user: User, **kwargs: Any) -> Any:
+        budget = await database_sync_to_async(self.get_budget)(user, kwargs['pk'])
+        if budget is None:
+            raise NotFound
+        return BudgetSerializer(budget).data
+
+
+class AsyncTransactionListView(AsyncAPIView):
+    @staticmethod
+    def get_page(request: Request, user: User, pk: int) -> Tuple[KeysetPagination, List[Any]]:
+        if not membership_cache.is_member(user.pk, pk):
+            raise NotFound
+
+        filterset = TransactionFilter(
+            request.query_params,
+            queryset=Transaction.objects.filter(budget_id=pk).values_list(
+                *FastTransactionSerializer.fields, named=True
+            ),
+        )
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+
+        paginator = KeysetPagination()
+        return paginator, paginator.paginate_queryset(filterset.qs, request)
+
+    async def get_data(self, request: Request, user: User, **kwargs: Any) -> Any:
+        with read_from_replica():
+            paginator, transactions = await database_sync_to_async(self.get_page)(request, user, kwargs['pk'])
+        return paginator.get_paginated_response(FastTransactionSerializer(transactions).data).data
@@ -0,0 +1,326 @@
+import io
+import json
+import re
+from itertools import islice
+from pathlib import Path
+from typing import IO, Any, Dict, Iterator, List, Set, Type
+
+from budgets.categorization import category_index
+from budgets.memberships import membership_cache
+from budgets.models import Budget, BudgetDailyBalance, Category, Transaction
+from budgets.summaries import summary_cache_key
+from django.apps import apps
+from django.contrib.postgres.fields import ArrayField
+from django.core.cache import cache
+from django.core.management.color import no_style
+from django.db import connection, models, transaction
+from django.db.models.functions import TruncMonth
+
+NDJSON_SUFFIXES = ('.ndjson', '.jsonl')
+READ_SIZE = 1 << 16
+SEPARATORS_RE = re.compile(r'[\s,]*')
+STAGING_TABLE = 'bulk_load_staging'
+# JSON text cannot contain raw control characters, so with them as quote and delimiter every line is copied verbatim
+COPY_STAGING_SQL = f"COPY {STAGING_TABLE} (data) FROM STDIN WITH (FORMAT csv, QUOTE e'\\x01', DELIMITER e'\\x02')"
+
+
+def iter_json_list(stream: IO[str]) -> Iterator[str]:
+    """
+    Yield objects of a JSON list as JSON text one by one so that only the current object and a read buffer are kept in
+    memory.
+    """
+    decoder = json.JSONDecoder()
+    buffer = stream.read(READ_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise ValueError('Fixture has to be a JSON list of objects')
+
+    position = 1
+    while True:
+        position = SEPARATORS_RE.match(buffer, position).end()  # type: ignore[union-attr]
+        if buffer.startswith(']', position):
+            return
+        error = None
+        if position < len(buffer):
+            if buffer[position] != '{':
+                raise ValueError(f'Fixture has to be a JSON list of objects, found {buffer[position:position + 20]!r}')
+            try:
+                end = decoder.raw_decode(buffer, position)[1]
+            except json.JSONDecodeError as decode_error:
+                error = decode_error
+            else:
+                # line breaks can only be whitespace between tokens, so the object fits on one line without them
+                yield buffer[position:end].replace('\n', ' ').replace('\r', ' ')
+                position = end
+                continue
+
+        # the object continues past the buffer
+        chunk = stream.read(READ_SIZE)
+        if not chunk:
+            raise ValueError(f'Unexpected end of fixture: {error or "missing ]"}')
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+def iter_fixture(path: Path) -> Iterator[str]:
+    """
+    Yield objects of a fixture in the format written by dumpdata as single lines of JSON. ``.ndjson`` and ``.jsonl``
+    files hold one object per line, other files a JSON list.
+    """
+    with path.open(encoding='utf-8') as stream:
+        if path.suffix not in NDJSON_SUFFIXES:
+            yield from iter_json_list(stream)
+            return
+        for line in stream:
+            line = line.strip()
+            if line:
+                yield line
+
+
+def cast_type(field: Any) -> str:
+    return str(field.cast_db_type(connection))
+
+
+def many_to_many_fields(model: Type[models.Model]) -> List[Any]:
+    """
+    Many to many fields of the model with through tables created by Django.
+    """
+    fields: List[Any] = list(model._meta.local_many_to_many)
+    return [field for field in fields if field.remote_field.through._meta.auto_created]
+
+
+def record_type(field: models.Field) -> str:
+    """
+    Type of the field's value in the record decoded from the fields of a fixture object.
+    """
+    if isinstance(field, (ArrayField, models.JSONField)):
+        return 'jsonb'
+    if isinstance(field, models.BinaryField):
+        return 'text'
+    return cast_type(field)
+
+
+def column_sql(field: models.Field, value: str) -> str:
+    """
+    SQL converting the decoded ``value`` of the field to the value of its column.
+    """
+    if isinstance(field, ArrayField):
+        # dumpdata writes arrays as JSON strings
+        array = f"CASE jsonb_typeof({value}) WHEN 'string' THEN ({value} #>> '{{}}')::jsonb ELSE {value} END"
+        return (
+            f"CASE WHEN jsonb_typeof({value}) IN ('array', 'string') "
+            f"THEN ARRAY(SELECT jsonb_array_elements_text({array}))::{cast_type(field)} END"
+        )
+    if isinstance(field, models.JSONField):
+        return f"NULLIF({value}, 'null'::jsonb)"
+    if isinstance(field, models.BinaryField):
+        return f"decode({value}, 'base64')"
+    return value
+
+
+def defer_indexes(cursor: Any, table: str) -> List[str]:
+    """
+    Drop non-unique indexes and foreign keys of the table if it is empty and return SQL creating them again. Building
+    an index and checking a foreign key once after a load is much faster than doing it for every row, unique indexes
+    are kept so that conflicts are still detected.
+    """
+    quote_name = connection.ops.quote_name
+    cursor.execute(f'SELECT EXISTS (SELECT 1 FROM {quote_name(table)})')
+    if cursor.fetchone()[0]:
+        return []
+    cursor.execute(
+        '''
+        SELECT indexrelid::regclass::text, pg_get_indexdef(indexrelid)
+        FROM pg_index
+        WHERE indrelid = %s::regclass AND NOT indisunique AND NOT indisprimary
+        ''',
+        [table],
+    )
+    indexes = cursor.fetchall()
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'",
+        [table],
+    )
+    foreign_keys = cursor.fetchall()
+
+    restore_sql: List[str] = []
+    for name, definition in indexes:
+        cursor.execute(f'DROP INDEX {name}')
+        # indexes of partitioned tables are defined ON ONLY the parent and attached to indexes of partitions
+        restore_sql.append(definition.replace(' ON ONLY ', ' ON ', 1))
+    for name, definition in foreign_keys:
+        cursor.execute(f'ALTER TABLE {quote_name(table)} DROP CONSTRAINT {quote_name(name)}')
+        restore_sql.append(f'ALTER TABLE {quote_name(table)} ADD CONSTRAINT {quote_name(name)} {definition}')
+    return restore_sql
+
+
+class BulkLoader:
+    """
+    Loads fixture objects in chunks of ``chunk_size`` objects. Every chunk is copied as JSON to a temporary table and
+    inserted from there into the tables of its models, so Postgres does the parsing instead of the ORM. Has to be used
+    in a transaction.
+
+    With ``defer`` set, indexes and foreign keys of tables which are empty before the load are deferred with
+    ``defer_indexes`` and created again by ``finish``. No signals are sent, so ``finish`` also rebuilds daily balance
+    snapshots of budgets with loaded transactions and does the work of the signal receivers: it touches the changed
+    budgets and invalidates the caches once the transaction is committed.
+    """
+
+    def __init__(self, chunk_size: int, defer: bool = True) -> None:
+        self.chunk_size = chunk_size
+        self.defer = defer
+        self.models: List[Type[models.Model]] = []
+        self.counts: Dict[str, int] = {}
+        self.prepared: Set[str] = set()
+        self.restore_sql: List[str] = []
+        self.budget_ids: Set[int] = set()
+        self.loaded_budget_ids: Set[int] = set()
+
+    def load(self, objects: Iterator[str]) -> None:
+        while True:
+            chunk = list(islice(objects, self.chunk_size))
+            if not chunk:
+                return
+            self.load_chunk(chunk)
+
+    def load_chunk(self, chunk: List[str]) -> None:
+        with connection.cursor() as cursor:
+            cursor.execute(f'CREATE TEMPORARY TABLE IF NOT EXISTS {STAGING_TABLE} (data jsonb NOT NULL) ON COMMIT DROP')
+            cursor.copy_expert(COPY_STAGING_SQL, io.StringIO('\n'.join(chunk)))
+            cursor.execute(f"SELECT DISTINCT data->>'model' FROM {STAGING_TABLE}")
+            labels = [row[0] for row in cursor.fetchall()]
+
+            for label in labels:
+                if label is None:
+                    raise ValueError('Every object of a fixture needs a model')
+                model = apps.get_model(label)
+                if model not in self.models:
+                    self.models.append(model)
+                self.insert(cursor, label, model)
+            cursor.execute(f'TRUNCATE {STAGING_TABLE}')
+
+    def insert(self, cursor: Any, label: str, model: Type[models.Model]) -> None:
+        quote_name = connection.ops.quote_name
+        opts = model._meta
+        columns, expressions, record, params = [], [], [], []
+        returning = ''
+        for field in opts.local_concrete_fields:
+            columns.append(quote_name(field.column))
+            if field.primary_key:
+                if model is Budget:
+                    # primary keys of budgets may be generated, members of the loaded budgets are read in finish
+                    returning = f'RETURNING {quote_name(field.column)}'
+                expression = f"(data->>'pk')::{cast_type(field)}"
+                if isinstance(field, models.AutoField):
+                    expression = f'COALESCE({expression}, nextval(pg_get_serial_sequence(%s, %s)))'
+                    params += [opts.db_table, field.column]
+                expressions.append(expression)
+                continue
+
+            record.append(f'{quote_name(field.name)} {record_type(field)}')
+            expression = column_sql(field, f'fields.{quote_name(field.name)}')
+            default = field.get_default()
+            # fields missing in the fixture get their defaults, field names are identifiers so they are safe in SQL
+            if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+                expression = f"CASE WHEN data->'fields' ? '{field.name}' THEN {expression} ELSE NOW() END"
+            elif default is not None:
+                expression = (
+                    f"CASE WHEN data->'fields' ? '{field.name}' THEN {expression} ELSE %s::{cast_type(field)} END"
+                )
+                params.append(field.get_db_prep_save(default, connection))
+            expressions.append(expression)
+
+        self.prepare(cursor, opts.db_table)
+        cursor.execute(
+            f'INSERT INTO {quote_name(opts.db_table)} ({", ".join(columns)}) '
+            f'SELECT {", ".join(expressions)} '
+            f"FROM {STAGING_TABLE}, jsonb_to_record(data->'fields') AS fields({', '.join(record)}) "
+            f"WHERE data->>'model' = %s {returning}",
+            [*params, label],
+        )
+        self.counts[opts.db_table] = self.counts.get(opts.db_table, 0) + cursor.rowcount
+        if model is Budget:
+            self.loaded_budget_ids.update(row[0] for row in cursor.fetchall())
+        if model is Transaction:
+            cursor.execute(
+                f"SELECT DISTINCT data->'fields'->>'budget' FROM {STAGING_TABLE} WHERE data->>'model' = %s", [label]
+            )
+            self.budget_ids.update(int(row[0]) for row in cursor.fetchall())
+
+        for field in many_to_many_fields(model):
+            through = field.remote_field.through._meta
+            source = through.get_field(field.m2m_field_name())
+            target = through.get_field(field.m2m_reverse_field_name())
+            self.prepare(cursor, through.db_table)
+            cursor.execute(
+                f'INSERT INTO {quote_name(through.db_table)} ({quote_name(source.column)}, {quote_name(target.column)}) '
+                f"SELECT (data->>'pk')::{cast_type(source)}, value::{cast_type(target)} "
+                f"FROM {STAGING_TABLE}, jsonb_array_elements_text(data->'fields'->%s) "
+                "WHERE data->>'model' = %s AND jsonb_typeof(data->'fields'->%s) = 'array'",
+                [field.name, label, field.name],
+            )
+            self.counts[through.db_table] = self.counts.get(through.db_table, 0) + cursor.rowcount
+
+    def prepare(self, cursor: Any, table: str) -> None:
+        if table in self.prepared:
+            return
+        self.prepared.add(table)
+        if not self.defer:
+            return
+
+        self.restore_sql += defer_indexes(cursor, table)
+
+    def finish(self) -> Dict[str, int]:
+        """
+        Restore deferred indexes and foreign keys, move sequences past the loaded primary keys, rebuild daily balance
+        snapshots of budgets with loaded transactions and invalidate what the load changed. Return the number of rows
+        inserted into each table.
+        """
+        models_to_reset: List[Type[models.Model]] = []
+        for model in self.models:
+            models_to_reset.append(model)
+            models_to_reset.extend(field.remote_field.through for field in many_to_many_fields(model))
+
+        with connection.cursor() as cursor:
+            for sql in self.restore_sql:
+                cursor.execute(sql)
+            for sql in connection.ops.sequence_reset_sql(no_style(), models_to_reset):
+                cursor.execute(sql)
+        self.restore_sql = []
+        if self.budget_ids:
+            BudgetDailyBalance.objects.rebuild(self.budget_ids)
+        self.invalidate()
+        return self.counts
+
+    def invalidate(self) -> None:
+        """
+        Change ETags of loaded budgets and budgets with loaded transactions, and invalidate cached memberships of their
+        members, closed month summaries of the loaded transactions and category indexes once the load is committed.
+        """
+        budget_ids = self.budget_ids | self.loaded_budget_ids
+        if budget_ids:
+            Budget.objects.touch(budget_ids)
+
+        user_ids = set(
+            Budget.members.through.objects.filter(budget_id__in=self.loaded_budget_ids).values_list(
+                'user_id', flat=True
+            )
+        )
+        # deleting rollups of months which already had transactions is harmless, they are computed again
+        summary_keys = [
+            summary_cache_key(budget_id, month)
+            for budget_id, month in Transaction.objects.filter(budget_id__in=self.budget_ids)
+            .annotate(month=TruncMonth('created_at'))
+            .values_list('budget_id', 'month')
+            .distinct()
+        ]
+        categories_loaded = Category in self.models
+
+        def invalidate_caches() -> None:
+            if user_ids:
+                membership_cache.invalidate(user_ids)
+            if summary_keys:
+                cache.delete_many(summary_keys)
+            if categories_loaded:
+                category_index.invalidate()
+
+        transaction.on_commit(invalidate_caches)
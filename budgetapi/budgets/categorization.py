@@ -0,0 +1,155 @@
+import gzip
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, cast
+
+import stempel
+from budgets.models import Category
+from django.conf import settings
+from django.core.cache import cache
+from stempel import StempelStemmer
+from stempel.streams import DataInputStream
+
+from budgetapi.metrics import timer
+
+CATEGORY_INDEX_VERSION_KEY = 'budgets:category-index:version'
+
+stemmer = None
+stemmer_lock = threading.Lock()
+
+
+def get_stemmer() -> StempelStemmer:
+    global stemmer
+
+    if stemmer is None:
+        with stemmer_lock:
+            if stemmer is None:
+                # StempelStemmer.polimorf() does the same but prints a progress bar, which is noise in commands and logs
+                path = Path(stempel.__file__).parent / 'stemmer_polimorf.tbl.gz'
+                with gzip.open(path, 'rb') as stream:
+                    stemmer = StempelStemmer.from_stream(DataInputStream(stream))
+
+    return stemmer
+
+
+@lru_cache(maxsize=settings.BUDGETS_STEM_CACHE_SIZE)
+def stem_word(word: str) -> str:
+    return cast(str, get_stemmer().stem(word))
+
+
+def text_stemming(text: str) -> List[str]:
+    with timer('stem'):
+        return [stem_word(word) for word in text.split()]
+
+
+class CategoryIndex:
+    """
+    Process-level inverted index mapping category tags to categories. Changes made in other processes are picked up
+    through a version counter kept in the Django cache, which is checked at most every
+    ``BUDGETS_CATEGORY_INDEX_POLL_INTERVAL`` seconds, so matching does not wait on the cache. The index is also rebuilt
+    every ``BUDGETS_CATEGORY_INDEX_TIMEOUT`` seconds, so changes are not missed for longer if the counter is evicted or
+    the cache is not shared.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._version: Optional[int] = None
+        self._expires = 0.0
+        self._next_poll = 0.0
+        self._categories: Dict[int, Category] = {}
+        self._tags: Dict[str, List[int]] = {}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._version = None
+            self._expires = 0.0
+            self._next_poll = 0.0
+            self._categories = {}
+            self._tags = {}
+
+    def _add(self, category: Category) -> None:
+        self._categories[category.pk] = category
+        for tag in set(category.tags):
+            category_ids = self._tags.setdefault(tag, [])
+            category_ids.append(category.pk)
+            category_ids.sort()
+
+    def _remove(self, category_id: int) -> None:
+        category = self._categories.pop(category_id, None)
+        if category is None:
+            return
+
+        for tag in set(category.tags):
+            category_ids = self._tags[tag]
+            category_ids.remove(category_id)
+            if not category_ids:
+                del self._tags[tag]
+
+    def _build(self, version: int) -> None:
+        self._categories = {}
+        self._tags = {}
+        for category in Category.objects.all():
+            self._add(category)
+        self._version = version
+        self._expires = time.monotonic() + settings.BUDGETS_CATEGORY_INDEX_TIMEOUT
+
+    def _is_current(self, version: int) -> bool:
+        return version == self._version and time.monotonic() < self._expires
+
+    def _ensure_current(self) -> None:
+        now = time.monotonic()
+        if now < self._next_poll and now < self._expires:
+            return
+        version = cache.get(CATEGORY_INDEX_VERSION_KEY, 0)
+        self._next_poll = now + settings.BUDGETS_CATEGORY_INDEX_POLL_INTERVAL
+        if not self._is_current(version):
+            with self._lock:
+                if not self._is_current(version):
+                    self._build(version)
+
+    def _bump_version(self) -> int:
+        cache.add(CATEGORY_INDEX_VERSION_KEY, 0, timeout=None)
+        return cast(int, cache.incr(CATEGORY_INDEX_VERSION_KEY))
+
+    def update(self, category: Category) -> None:
+        version = self._bump_version()
+        with self._lock:
+            if self._version != version - 1:
+                return
+            self._remove(category.pk)
+            self._add(category)
+            self._version = version
+
+    def invalidate(self) -> None:
+        """
+        Make every process rebuild its index, for changes of categories made without signals.
+        """
+        self._bump_version()
+        self._next_poll = 0.0
+
+    def remove(self, category_id: int) -> None:
+        version = self._bump_version()
+        with self._lock:
+            if self._version != version - 1:
+                return
+            self._remove(category_id)
+            self._version = version
+
+    def match(self, stems: List[str]) -> Optional[Category]:
+        self._ensure_current()
+
+        with self._lock:
+            matches = [self._tags[stem][0] for stem in stems if stem in self._tags]
+            if not matches:
+                return None
+            return self._categories[min(matches)]
+
+
+category_index = CategoryIndex()
+
+
+def categorize_title(title: str) -> Optional[Category]:
+    with timer('categorize'):
+        return category_index.match(text_stemming(title))
@@ -0,0 +1,51 @@
+from typing import Any, Iterable, List, Tuple
+
+from budgets.categorization import categorize_title
+from budgets.models import PendingCategorization, Transaction, TransactionType
+from budgets.recategorization import save_categories
+from django.db import connection, transaction
+
+
+def enqueue_categorization(transactions: Iterable[Transaction]) -> None:
+    PendingCategorization.objects.bulk_create(
+        PendingCategorization(transaction=item, transaction_created_at=item.created_at)
+        for item in transactions
+        if item.type == TransactionType.TRANSFER
+    )
+
+
+def categorize_pending(batch_size: int) -> int:
+    """
+    Categorize up to ``batch_size`` queued transfers and return the number of taken queue entries. Entries are locked
+    with SKIP LOCKED, so concurrent workers take different ones, and deleted in the same transaction in which the
+    categories are saved.
+    """
+    queue_table = PendingCategorization._meta.db_table
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'''
+                DELETE FROM {queue_table}
+                WHERE id IN (SELECT id FROM {queue_table} ORDER BY id LIMIT %s FOR UPDATE SKIP LOCKED)
+                RETURNING transaction_id, transaction_created_at
+                ''',
+                [batch_size],
+            )
+            entries = cursor.fetchall()
+        if not entries:
+            return 0
+
+        # the range of created_at limits the lookup to partitions of the queued transfers
+        created_at = [entry[1] for entry in entries]
+        fields = ('id', 'created_at', 'budget_id', 'title')
+        rows: List[Tuple[int, Any, int, str]] = list(
+            Transaction.objects.filter(
+                pk__in=[entry[0] for entry in entries], created_at__gte=min(created_at), created_at__lte=max(created_at)
+            ).values_list(*fields)
+        )
+        changes = []
+        for transaction_id, transaction_created_at, budget_id, title in rows:
+            category = categorize_title(title)
+            changes.append((transaction_id, transaction_created_at, budget_id, category.pk if category else None))
+        save_categories(changes)
+    return len(entries)
@@ -0,0 +1,117 @@
+import csv
+import json
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+from budgets.serializers import TransactionSerializer
+from django.db import models
+
+EXPORT_FIELDS = (
+    'id',
+    'created_at',
+    'type',
+    'amount',
+    'title',
+    'current_balance',
+    'creator_id',
+    'creator__username',
+    'creator__first_name',
+    'creator__last_name',
+    'category_id',
+    'category__name',
+    'category_pending',
+)
+
+CSV_HEADER = (
+    'id',
+    'created_at',
+    'type',
+    'amount',
+    'title',
+    'current_balance',
+    'creator_id',
+    'creator_username',
+    'creator_first_name',
+    'creator_last_name',
+    'category_id',
+    'category_name',
+    'category_pending',
+)
+
+
+class Echo:
+    def write(self, value: str) -> str:
+        return value
+
+
+def iter_chunks(queryset: models.QuerySet, chunk_size: int) -> Iterator[List[Tuple[Any, ...]]]:
+    """
+    Yield rows of transactions, newest first, in chunks fetched by separate queries keyed on ``(created_at, id)``.
+    A server-side cursor would be declared WITH HOLD outside of a transaction, and Postgres materializes such a cursor
+    before the first row is returned, so nothing could be streamed until the whole export was read.
+    """
+    queryset = queryset.order_by('-created_at', '-pk').values_list(*EXPORT_FIELDS)
+    chunk_queryset = queryset
+    while True:
+        rows = list(chunk_queryset[:chunk_size])
+        if rows:
+            yield rows
+        if len(rows) < chunk_size:
+            return
+
+        pk, created_at = rows[-1][0], rows[-1][1]
+        chunk_queryset = queryset.filter(created_at__lte=created_at).filter(
+            models.Q(created_at__lt=created_at) | models.Q(pk__lt=pk)
+        )
+
+
+def iter_rows(queryset: models.QuerySet, chunk_size: int) -> Iterator[List[Tuple[Any, ...]]]:
+    fields = TransactionSerializer().fields
+    created_at, amount, current_balance = fields['created_at'], fields['amount'], fields['current_balance']
+
+    for rows in iter_chunks(queryset, chunk_size):
+        yield [
+            (
+                row[0],
+                created_at.to_representation(row[1]),
+                row[2],
+                amount.to_representation(row[3]),
+                row[4],
+                current_balance.to_representation(row[5]),
+                *row[6:],
+            )
+            for row in rows
+        ]
+
+
+def export_csv(queryset: models.QuerySet, chunk_size: int) -> Iterator[bytes]:
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER).encode()
+
+    for rows in iter_rows(queryset, chunk_size):
+        yield ''.join(writer.writerow(row) for row in rows).encode()
+
+
+def export_ndjson(queryset: models.QuerySet, chunk_size: int) -> Iterator[bytes]:
+    for rows in iter_rows(queryset, chunk_size):
+        lines = []
+        for row in rows:
+            category = {'id': row[10], 'name': row[11]} if row[10] is not None else None
+            item = {
+                'id': row[0],
+                'creator': {'id': row[6], 'username': row[7], 'firstName': row[8], 'lastName': row[9]},
+                'amount': row[3],
+                'title': row[4],
+                'createdAt': row[1],
+                'type': row[2],
+                'category': category,
+                'categoryPending': row[12],
+                'currentBalance': row[5],
+            }
+            lines.append(json.dumps(item, ensure_ascii=False) + '\n')
+        yield ''.join(lines).encode()
+
+
+EXPORT_FORMATS: Dict[str, Tuple[str, Callable[[models.QuerySet, int], Iterator[bytes]]]] = {
+    'csv': ('text/csv', export_csv),
+    'ndjson': ('application/x-ndjson', export_ndjson),
+}
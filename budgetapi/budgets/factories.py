@@ -4,7 +4,6 @@ from typing import List
 import factory.fuzzy
 from budgets.models import Budget, Category, Transaction, TransactionType
 from django.contrib.auth.models import User
-from faker import Faker
 
 USER_PASSWORD = 'password'  # nosec
 
@@ -39,7 +38,7 @@ class BudgetFactory(factory.django.DjangoModelFactory):
 
 class CategoryFactory(factory.django.DjangoModelFactory):
     name = factory.fuzzy.FuzzyText()
-    tags = factory.LazyFunction(lambda: Faker().sentence().split())
+    tags = factory.Faker('words')
 
     class Meta:
         model = Category
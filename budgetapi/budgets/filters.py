@@ -3,3 +3,7 @@ from django_filters import rest_framework as filters
 
 class TransactionFilter(filters.FilterSet):
     created_at = filters.IsoDateTimeFromToRangeFilter(field_name='created_at')
+
+
+class BudgetDailyBalanceFilter(filters.FilterSet):
+    date = filters.DateFromToRangeFilter(field_name='date')
@@ -0,0 +1,36 @@
+from typing import Any
+
+from budgets.models import Budget, BudgetDailyBalance
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import transaction
+
+
+class Command(BaseCommand):
+    help = 'Rebuild daily balance snapshots of budgets from their transactions'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('--budget', type=int, action='append', dest='budgets', help='Budget id, can be repeated')
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        queryset = Budget.objects.order_by('pk')
+        if options['budgets']:
+            queryset = queryset.filter(pk__in=options['budgets'])
+
+        last_pk = 0
+        rebuilt = 0
+        while True:
+            with transaction.atomic():
+                # lock the budgets so no transaction is recorded while their snapshots are rebuilt
+                budget_ids = list(
+                    queryset.filter(pk__gt=last_pk)
+                    .select_for_update()
+                    .values_list('pk', flat=True)[: options['batch_size']]
+                )
+                if not budget_ids:
+                    break
+                BudgetDailyBalance.objects.rebuild(budget_ids)
+
+            last_pk = budget_ids[-1]
+            rebuilt += len(budget_ids)
+            self.stdout.write(f'Rebuilt snapshots of {rebuilt} budgets')
@@ -0,0 +1,334 @@
+import datetime
+import json
+import multiprocessing
+import platform
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, cast
+
+from budgets.categorization import get_stemmer
+from budgets.management.commands.benchmark_reads import percentile
+from budgets.models import Budget
+from budgets.synthetic import DatasetSpec, generate_dataset
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import connection, connections
+from django.http import StreamingHttpResponse
+from django.test import Client
+from django.test.runner import DiscoverRunner
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from budgetapi.metrics import quiet_request_log
+
+DEFAULT_BASELINE = settings.BASE_DIR / 'benchmarks' / 'endpoints.json'
+BULK_MEMBERS = 10
+TITLE = 'Zakupy spożywcze na wycieczkę'
+CONCURRENT_TRANSFERS = 'concurrent transfers'
+# latency differences below this many milliseconds are noise however small the baseline is
+LATENCY_SLACK_MS = 1.0
+# a few slow requests caused by the host move the tail latency, so it is allowed to regress twice as much
+TAIL_MARGIN_FACTOR = 2
+LOWER_IS_BETTER = ('p50_ms', 'peak_kib')
+HIGHER_IS_BETTER = ('transfers_per_s',)
+
+Results = Dict[str, Dict[str, Dict[str, float]]]
+
+
+class Endpoint(NamedTuple):
+    route: str
+    method: str
+    data: Callable[[int], Dict[str, Any]]
+
+    @property
+    def name(self) -> str:
+        return f'{self.method.upper()} {self.route}'
+
+    @property
+    def result_name(self) -> str:
+        """
+        Name of the results, requests to the same route with different query parameters are told apart by their names.
+        """
+        data = self.data(0)
+        return self.name + (f' {",".join(sorted(data))}' if self.method == 'get' and data else '')
+
+
+class Target(NamedTuple):
+    """
+    The largest budget of a dataset, its creator and users which are not its members.
+    """
+
+    budget: Budget
+    user: User
+    others: List[int]
+    today: datetime.date
+
+
+def get_endpoints(target: Target) -> List[Endpoint]:
+    """
+    Requests to every route of ``budgets.urls``, ``data`` returns query parameters or the body of the n-th request.
+    """
+    month_ago = datetime.datetime.combine(target.today - datetime.timedelta(days=30), datetime.time()).isoformat()
+    bulk_members = target.others[-BULK_MEMBERS:]
+    return [
+        Endpoint('create-budget', 'get', lambda n: {}),
+        Endpoint('create-budget', 'post', lambda n: {}),
+        Endpoint('budget-details', 'get', lambda n: {}),
+        Endpoint('bulk-members', 'post', lambda n: {'add' if n % 2 else 'remove': bulk_members}),
+        Endpoint('add-member', 'post', lambda n: {'user': target.others[n]}),
+        Endpoint('transactions', 'get', lambda n: {}),
+        Endpoint('transactions', 'get', lambda n: {'created_at_after': month_ago}),
+        Endpoint('export-transactions', 'get', lambda n: {'created_at_after': month_ago}),
+        Endpoint('balance', 'get', lambda n: {'date': target.today.isoformat()}),
+        Endpoint('balance-history', 'get', lambda n: {}),
+        Endpoint('summary', 'get', lambda n: {}),
+        Endpoint('summary', 'get', lambda n: {'bucket': 'month'}),
+        Endpoint('create-transfer', 'post', lambda n: {'title': TITLE, 'amount': '1.00'}),
+        Endpoint('create-withdrawal', 'post', lambda n: {'amount': '0.01'}),
+        Endpoint(
+            'create-transactions-batch',
+            'post',
+            lambda n: {'transactions': [{'type': 'TRANSFER', 'title': TITLE, 'amount': '1.00'}] * 10},
+        ),
+    ]
+
+
+def get_path(target: Target, endpoint: Endpoint) -> str:
+    kwargs = {} if endpoint.route == 'create-budget' else dict(pk=target.budget.pk)
+    return reverse(f'budgets:{endpoint.route}', kwargs=kwargs)
+
+
+def send(client: Client, endpoint: Endpoint, path: str, n: int) -> float:
+    """
+    Send the n-th request to the endpoint and return its latency in seconds, including reading a streamed response.
+    """
+    data = endpoint.data(n)
+    started = time.perf_counter()
+    if endpoint.method == 'get':
+        response = client.get(path, data)
+    else:
+        response = client.post(path, json.dumps(data), content_type='application/json')
+    if response.streaming:
+        content = b''.join(cast(StreamingHttpResponse, response).streaming_content)
+    else:
+        content = response.content
+    elapsed = time.perf_counter() - started
+    if response.status_code >= 300:
+        raise CommandError(f'{endpoint.name} responded with {response.status_code}: {content[:200]!r}')
+    return elapsed
+
+
+def benchmark_endpoint(client: Client, endpoint: Endpoint, path: str, warmup: int, requests: int) -> Dict[str, float]:
+    """
+    Latency percentiles of ``requests`` requests after ``warmup`` ones, then queries and the peak of memory allocated
+    by one more request, which is measured separately since tracing allocations slows everything down.
+    """
+    for n in range(warmup):
+        send(client, endpoint, path, n)
+    latencies = sorted(send(client, endpoint, path, n) for n in range(warmup, warmup + requests))
+
+    with CaptureQueriesContext(connection) as queries:
+        tracemalloc.start()
+        try:
+            send(client, endpoint, path, warmup + requests)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return {
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'queries': len(queries),
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def write_transfers(path: str, user_id: int, transfers: int, barrier: Any, queue: Any) -> None:
+    latencies: Optional[List[float]] = None
+    try:
+        client = Client()
+        client.force_login(User.objects.get(pk=user_id))
+        endpoint = Endpoint('create-transfer', 'post', lambda n: {'title': TITLE, 'amount': '1.00'})
+        barrier.wait()
+        latencies = [send(client, endpoint, path, n) for n in range(transfers)]
+    finally:
+        # the parent waits for a result of every writer, so it is sent even when the writer fails
+        queue.put(latencies)
+        connection.close()
+
+
+def benchmark_concurrent_transfers(target: Target, writers: int, transfers: int) -> Dict[str, float]:
+    path = reverse('budgets:create-transfer', kwargs=dict(pk=target.budget.pk))
+    connections.close_all()
+
+    context = multiprocessing.get_context('fork')
+    barrier = context.Barrier(writers + 1, timeout=60)
+    queue = context.SimpleQueue()
+    processes = [
+        context.Process(target=write_transfers, args=(path, target.user.pk, transfers, barrier, queue))
+        for _ in range(writers)
+    ]
+    for process in processes:
+        process.start()
+    barrier.wait()
+    started = time.perf_counter()
+    results = [queue.get() for _ in processes]
+    elapsed = time.perf_counter() - started
+    for process in processes:
+        process.join()
+    if None in results:
+        raise CommandError('A transfer writer failed.')
+    latencies = sorted(latency for result in results for latency in result)
+
+    return {
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'transfers_per_s': round(len(latencies) / elapsed, 1),
+    }
+
+
+def find_regressions(results: Results, baseline: Results, margin: float) -> List[str]:
+    """
+    Describe every metric worse than the baseline by more than ``margin`` (a fraction of it), p99 latency by more than
+    ``TAIL_MARGIN_FACTOR`` times the margin. Query counts are deterministic, so any increase is a regression.
+    """
+    regressions = []
+    for dataset, benchmarks in results.items():
+        for benchmark, metrics in benchmarks.items():
+            expected = baseline.get(dataset, {}).get(benchmark, {})
+            for metric, value in metrics.items():
+                if metric not in expected:
+                    continue
+                limit = expected[metric]
+                if metric == 'p99_ms':
+                    limit = limit * (1 + margin * TAIL_MARGIN_FACTOR) + LATENCY_SLACK_MS
+                    exceeded = value > limit
+                elif metric in LOWER_IS_BETTER:
+                    limit = limit * (1 + margin) + (LATENCY_SLACK_MS if metric.endswith('_ms') else 0)
+                    exceeded = value > limit
+                elif metric in HIGHER_IS_BETTER:
+                    limit = limit / (1 + margin)
+                    exceeded = value < limit
+                else:
+                    exceeded = value > limit
+                if exceeded:
+                    regressions.append(
+                        f'{dataset} transactions, {benchmark}: {metric} {value} (baseline {expected[metric]}, '
+                        f'limit {limit:.2f})'
+                    )
+    return regressions
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark every budget endpoint and concurrent transfers to a single budget against generated datasets of '
+        'several sizes in a temporary database, and fail if the results are worse than the committed baseline.'
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[1000, 10000], help='Numbers of transactions of the datasets'
+        )
+        parser.add_argument('--requests', type=int, default=100, help='Number of measured requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=5, help='Number of requests per endpoint before measuring')
+        parser.add_argument('--writers', type=int, default=4, help='Number of concurrent transfer writers')
+        parser.add_argument('--transfers', type=int, default=25, help='Number of transfers per writer')
+        parser.add_argument('--output', type=Path, help='Write the results as JSON to this file')
+        parser.add_argument('--baseline', type=Path, default=DEFAULT_BASELINE)
+        parser.add_argument(
+            '--margin', type=float, default=1.0, help='Allowed regression as a fraction of the baseline value'
+        )
+        parser.add_argument('--update-baseline', action='store_true', help='Write the results to the baseline')
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        for name in ('sizes', 'requests', 'writers', 'transfers'):
+            values = options[name] if isinstance(options[name], list) else [options[name]]
+            if min(values) < 1:
+                raise CommandError(f'{name.capitalize()} must be at least 1.')
+        if options['warmup'] < 0 or options['margin'] < 0:
+            raise CommandError('Warmup and margin cannot be negative.')
+
+        # load the stemmer up front so that the first transfer does not measure it
+        get_stemmer()
+        runner = DiscoverRunner(interactive=False, verbosity=0)
+        runner.setup_test_environment()
+        old_config = runner.setup_databases()
+        try:
+            # the metrics middleware would log every request of the benchmark
+            with quiet_request_log(options['verbosity']):
+                results = {str(size): self.benchmark_dataset(size, **options) for size in options['sizes']}
+        finally:
+            runner.teardown_databases(old_config)
+            runner.teardown_test_environment()
+
+        report = json.dumps(
+            {'python': platform.python_version(), 'machine': platform.machine(), 'results': results}, indent=2
+        )
+        if options['output']:
+            options['output'].write_text(report + '\n')
+        if options['update_baseline']:
+            options['baseline'].parent.mkdir(parents=True, exist_ok=True)
+            options['baseline'].write_text(report + '\n')
+            self.stdout.write(f'Baseline written to {options["baseline"]}')
+            return
+
+        if not options['baseline'].is_file():
+            self.stdout.write(f'Baseline {options["baseline"]} does not exist, nothing to compare.')
+            return
+        baseline = json.loads(options['baseline'].read_text())['results']
+        regressions = find_regressions(results, baseline, options['margin'])
+        for regression in regressions:
+            self.stderr.write(regression)
+        if regressions:
+            raise CommandError(f'{len(regressions)} metrics are worse than the baseline by more than the margin.')
+        self.stdout.write(f'All metrics are within {options["margin"]:.0%} of the baseline.')
+
+    def benchmark_dataset(self, size: int, **options: Any) -> Dict[str, Dict[str, float]]:
+        target = self.generate(size, options['requests'] + options['warmup'] + 1)
+
+        client = Client()
+        client.force_login(target.user)
+        results = {}
+        for endpoint in get_endpoints(target):
+            name = endpoint.result_name
+            path = get_path(target, endpoint)
+            results[name] = benchmark_endpoint(client, endpoint, path, options['warmup'], options['requests'])
+            self.write_result(size, name, results[name])
+
+        results[CONCURRENT_TRANSFERS] = benchmark_concurrent_transfers(target, options['writers'], options['transfers'])
+        self.write_result(size, CONCURRENT_TRANSFERS, results[CONCURRENT_TRANSFERS])
+        return results
+
+    def generate(self, size: int, others: int) -> Target:
+        """
+        Replace the data with a dataset of ``size`` transactions in which the first budget has half of them.
+        """
+        call_command('flush', interactive=False, verbosity=0)
+        today = timezone.now().date()
+        end = datetime.datetime.combine(today, datetime.time(), datetime.timezone.utc)
+        budgets = max(10, size // 100)
+        spec = DatasetSpec(
+            seed=0,
+            users=budgets,
+            budgets=budgets,
+            categories=20,
+            transactions=size,
+            hot_budgets=1,
+            hot_share=0.5,
+            skew=1.1,
+            max_members=20,
+            start=end - datetime.timedelta(days=365),
+            end=end,
+        )
+        generate_dataset(spec, workers=1, batch_size=50000)
+
+        budget = Budget.objects.select_related('creator').earliest('pk')
+        User.objects.bulk_create(User(username=f'bench-{n}') for n in range(others + BULK_MEMBERS))
+        other_ids = list(User.objects.filter(username__startswith='bench-').order_by('pk').values_list('pk', flat=True))
+        return Target(budget=budget, user=budget.creator, others=other_ids, today=today)
+
+    def write_result(self, size: int, name: str, metrics: Dict[str, float]) -> None:
+        self.stdout.write(f'{size} {name}: ' + ' '.join(f'{metric}={value}' for metric, value in metrics.items()))
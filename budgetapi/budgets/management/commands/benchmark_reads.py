@@ -0,0 +1,94 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from typing import Any, List
+
+import requests
+from budgets.models import Budget, Transaction, TransactionType
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import transaction
+from django.test import Client
+from django.urls import reverse
+
+ENDPOINTS = {'details': 'budget-details', 'transactions': 'transactions'}
+
+
+def percentile(latencies: List[float], percent: int) -> float:
+    return latencies[min(len(latencies) - 1, len(latencies) * percent // 100)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure read latency of a running server under concurrent load. Run it against the WSGI and the ASGI '
+        'deployment to compare them.'
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('--url', default='http://localhost:8000', help='Base URL of the running server')
+        parser.add_argument('--endpoint', choices=list(ENDPOINTS), default='transactions')
+        parser.add_argument('--async', action='store_true', dest='use_async', help='Use the async views')
+        parser.add_argument('--concurrency', type=int, default=200)
+        parser.add_argument('--requests', type=int, default=5000)
+        parser.add_argument('--transactions', type=int, default=500, help='Number of transactions to create')
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        with transaction.atomic():
+            user = User.objects.create(username=f'benchmark-{time.time_ns()}')
+            budget = Budget.objects.create(creator=user)
+            budget.members.add(user)
+            Transaction.objects.bulk_create(
+                Transaction(
+                    budget=budget,
+                    creator=user,
+                    amount=Decimal(1),
+                    title=f'benchmark-{i}',
+                    type=TransactionType.TRANSFER,
+                    current_balance=Decimal(i + 1),
+                )
+                for i in range(options['transactions'])
+            )
+
+        try:
+            client = Client()
+            client.force_login(user)
+            cookies = {settings.SESSION_COOKIE_NAME: client.cookies[settings.SESSION_COOKIE_NAME].value}
+
+            namespace = 'budgets-async' if options['use_async'] else 'budgets'
+            url = options['url'].rstrip('/') + reverse(
+                f'{namespace}:{ENDPOINTS[options["endpoint"]]}', kwargs=dict(pk=budget.pk)
+            )
+
+            session = requests.Session()
+            session.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=options['concurrency']))
+
+            def fetch(_: int) -> float:
+                started = time.perf_counter()
+                response = session.get(url, cookies=cookies)
+                elapsed = time.perf_counter() - started
+                if response.status_code != 200:
+                    raise CommandError(f'{url} responded with {response.status_code}')
+                return elapsed
+
+            fetch(0)
+            with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+                started = time.perf_counter()
+                latencies = sorted(executor.map(fetch, range(options['requests'])))
+                elapsed = time.perf_counter() - started
+
+            self.stdout.write(
+                f'{len(latencies)} requests to {url} with concurrency {options["concurrency"]} in {elapsed:.2f}s: '
+                f'{len(latencies) / elapsed:.1f} requests/s'
+            )
+            summary = (
+                ('mean', statistics.mean(latencies)),
+                ('p50', percentile(latencies, 50)),
+                ('p90', percentile(latencies, 90)),
+                ('p99', percentile(latencies, 99)),
+                ('max', latencies[-1]),
+            )
+            self.stdout.write('latency ms: ' + ' '.join(f'{name}={value * 1000:.1f}' for name, value in summary))
+        finally:
+            user.delete()
@@ -0,0 +1,76 @@
+import time
+from decimal import Decimal
+from typing import Any, Callable, Tuple
+
+from budgets.models import Budget, Category, Transaction, TransactionType
+from budgets.renderers import FastCamelCaseJSONRenderer
+from budgets.serializers import FastTransactionSerializer, TransactionSerializer
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import transaction
+from djangorestframework_camel_case.render import CamelCaseJSONRenderer
+
+
+def timed(func: Callable[[], Any]) -> Tuple[Any, float]:
+    started = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare serializing and rendering transaction lists with TransactionSerializer and FastTransactionSerializer. '
+        'Benchmark data is rolled back.'
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000])
+
+    def run(self, budget: Budget, rows: int) -> None:
+        queryset = Transaction.objects.filter(budget=budget).order_by('-created_at', '-id')[:rows]
+
+        transactions, query = timed(lambda: list(queryset.select_related('creator', 'category')))
+        data, serialize = timed(lambda: TransactionSerializer(transactions, many=True).data)
+        content, render = timed(lambda: CamelCaseJSONRenderer().render(data))
+        self.stdout.write(
+            f'{rows} rows with TransactionSerializer: query={query * 1000:.1f}ms serialize={serialize * 1000:.1f}ms '
+            f'render={render * 1000:.1f}ms total={(query + serialize + render) * 1000:.1f}ms'
+        )
+
+        values, query = timed(lambda: list(queryset.values_list(*FastTransactionSerializer.fields, named=True)))
+        data, serialize = timed(lambda: FastTransactionSerializer(values).data)
+        fast_content, render = timed(lambda: FastCamelCaseJSONRenderer().render(data))
+        self.stdout.write(
+            f'{rows} rows with FastTransactionSerializer: query={query * 1000:.1f}ms '
+            f'serialize={serialize * 1000:.1f}ms render={render * 1000:.1f}ms '
+            f'total={(query + serialize + render) * 1000:.1f}ms'
+        )
+
+        if fast_content != content:
+            raise CommandError('Rendered outputs differ')
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        with transaction.atomic():
+            user = User.objects.create(username=f'benchmark-{time.time_ns()}')
+            budget = Budget.objects.create(creator=user)
+            category = Category.objects.create(name='benchmark', tags=[])
+            Transaction.objects.bulk_create(
+                (
+                    Transaction(
+                        budget=budget,
+                        creator=user,
+                        amount=Decimal('1.50'),
+                        title=f'benchmark-{i}',
+                        type=TransactionType.TRANSFER,
+                        category=category if i % 2 else None,
+                        current_balance=Decimal(i) * Decimal('1.50'),
+                    )
+                    for i in range(max(options['rows']))
+                ),
+                batch_size=5000,
+            )
+
+            for rows in options['rows']:
+                self.run(budget, rows)
+
+            transaction.set_rollback(True)
@@ -0,0 +1,90 @@
+import multiprocessing
+import time
+from decimal import Decimal
+from typing import Any
+
+from budgets.categorization import categorize_title
+from budgets.models import Budget, Category
+from budgets.serializers import TransferSerializer
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import connection, transaction
+from django.http import HttpRequest
+
+TITLE = 'Oddaję pieniądze za wspólne zakupy spożywcze i przejazd samochodem na wycieczkę w góry'
+
+
+def transfer(budget_id: int, user_id: int, transfers: int, title: str, barrier: Any) -> None:
+    request = HttpRequest()
+    request.user = User.objects.get(pk=user_id)
+    barrier.wait()
+    try:
+        for _ in range(transfers):
+            budget = Budget.objects.get(pk=budget_id)
+            serializer = TransferSerializer(
+                data={'title': title, 'amount': '1.00'}, context=dict(request=request, budget=budget)
+            )
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Measure transfer throughput of concurrent writers on a single budget'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('--processes', type=int, default=8)
+        parser.add_argument('--transfers', type=int, default=100, help='Number of transfers per process')
+        parser.add_argument('--categories', type=int, default=20, help='Number of categories to create')
+        parser.add_argument('--shards', type=int, nargs='+', default=[1], help='Balance shard counts to compare')
+        parser.add_argument('--title', default=TITLE)
+
+    def run(self, user: User, shard_count: int, **options: Any) -> None:
+        processes_count = options['processes']
+        transfers = options['transfers']
+
+        budget = Budget.objects.create(creator=user)
+        Budget.objects.reshard(budget.pk, shard_count)
+        connection.close()
+
+        context = multiprocessing.get_context('fork')
+        barrier = context.Barrier(processes_count + 1)
+        processes = [
+            context.Process(target=transfer, args=(budget.pk, user.pk, transfers, options['title'], barrier))
+            for _ in range(processes_count)
+        ]
+        for process in processes:
+            process.start()
+        barrier.wait()
+        started = time.perf_counter()
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - started
+
+        balance = Budget.objects.get_total_balance(budget.pk)
+        total = processes_count * transfers
+        if balance != Decimal(total):
+            self.stderr.write(f'Balance mismatch: {balance} != {total}')
+
+        self.stdout.write(
+            f'{total} transfers by {processes_count} processes to {shard_count} shards in {elapsed:.2f}s: '
+            f'{total / elapsed:.1f} transfers/s'
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        with transaction.atomic():
+            user = User.objects.create(username=f'benchmark-{time.time_ns()}')
+            categories = Category.objects.bulk_create(
+                Category(name=f'benchmark-{i}', tags=[f'benchmark-tag-{i}-{j}' for j in range(10)])
+                for i in range(options['categories'])
+            )
+        try:
+            # load the stemmer before forking so every process shares it
+            categorize_title(options['title'])
+
+            for shard_count in options['shards']:
+                self.run(user, shard_count, **options)
+        finally:
+            user.delete()
+            Category.objects.filter(pk__in=[category.pk for category in categories]).delete()
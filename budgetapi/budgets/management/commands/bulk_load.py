@@ -0,0 +1,54 @@
+import time
+from pathlib import Path
+from typing import Any
+
+from budgets.bulk_load import BulkLoader, iter_fixture
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import DatabaseError, transaction
+
+
+class Command(BaseCommand):
+    help = (
+        'Load fixtures written by dumpdata (JSON lists or NDJSON) with COPY. Unlike loaddata it does not send signals '
+        'and does not support natural keys. Daily balance snapshots of budgets with loaded transactions are rebuilt, '
+        'changed budgets get new ETags and cached memberships, summaries and category indexes are invalidated.'
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('fixtures', nargs='+', type=Path, help='Fixture files')
+        parser.add_argument('--chunk-size', type=int, default=20000, help='Number of rows copied at once per table')
+        parser.add_argument(
+            '--no-defer',
+            action='store_false',
+            dest='defer',
+            help='Keep indexes and foreign keys of empty tables while loading',
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if options['chunk_size'] < 1:
+            raise CommandError('Chunk size must be at least 1.')
+        for path in options['fixtures']:
+            if not path.is_file():
+                raise CommandError(f'Fixture {path} does not exist.')
+
+        started = time.perf_counter()
+        loader = BulkLoader(options['chunk_size'], defer=options['defer'])
+        try:
+            with transaction.atomic():
+                for path in options['fixtures']:
+                    loader.load(iter_fixture(path))
+                counts = loader.finish()
+        except (ValueError, LookupError, DatabaseError) as error:
+            raise CommandError(str(error))
+        elapsed = time.perf_counter() - started
+
+        for table, count in sorted(counts.items()):
+            if count:
+                self.stdout.write(f'{table}: {count} rows')
+        if loader.budget_ids:
+            self.stdout.write(f'Rebuilt daily balance snapshots of {len(loader.budget_ids)} budgets')
+        total = sum(counts.values())
+        self.stdout.write(
+            f'Loaded {total} rows from {len(options["fixtures"])} fixtures in {elapsed:.2f}s '
+            f'({total / elapsed:.0f} rows/s)'
+        )
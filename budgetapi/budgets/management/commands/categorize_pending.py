@@ -0,0 +1,36 @@
+import time
+from typing import Any
+
+from budgets.categorization import get_stemmer
+from budgets.categorization_queue import categorize_pending
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+
+class Command(BaseCommand):
+    help = (
+        'Categorize transfers queued with BUDGETS_DEFERRED_CATEGORIZATION. Any number of workers can run at once, '
+        'each takes different transfers.'
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('--batch-size', type=int, default=500, help='Number of transfers categorized at once')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Exit when the queue is empty')
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if options['batch_size'] < 1:
+            raise CommandError('Batch size must be at least 1.')
+
+        get_stemmer()
+        total = 0
+        while True:
+            categorized = categorize_pending(options['batch_size'])
+            total += categorized
+            if categorized and options['verbosity'] > 1:
+                self.stdout.write(f'Categorized {categorized} transfers')
+            if categorized < options['batch_size']:
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+
+        self.stdout.write(f'Categorized {total} transfers')
@@ -0,0 +1,69 @@
+import datetime
+import os
+import time
+from typing import Any
+
+from budgets.synthetic import DatasetSpec, generate_dataset
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a synthetic dataset of users, budgets, categories and transactions with COPY. The same seed and sizes '
+        'always generate the same data.'
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--budgets', type=int, default=1000)
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--transactions', type=int, default=100000)
+        parser.add_argument('--hot-budgets', type=int, default=5, help='Number of budgets with the most transactions')
+        parser.add_argument('--hot-share', type=float, default=0.2, help='Share of transactions in hot budgets')
+        parser.add_argument('--skew', type=float, default=1.1, help="Zipf's law exponent of other budgets' sizes")
+        parser.add_argument('--max-members', type=int, default=20, help='Number of members of hot budgets')
+        parser.add_argument('--days', type=int, default=365, help='Number of days the transactions are spread over')
+        parser.add_argument(
+            '--end',
+            type=datetime.date.fromisoformat,
+            help='Day after the last transaction (YYYY-MM-DD), today by default',
+        )
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Number of writing processes')
+        parser.add_argument('--batch-size', type=int, default=50000, help='Number of transactions per COPY')
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        for name in ('users', 'budgets', 'days', 'max_members', 'workers', 'batch_size'):
+            if options[name] < 1:
+                raise CommandError(f'{name.replace("_", " ").capitalize()} must be at least 1.')
+        for name in ('categories', 'transactions', 'hot_budgets', 'skew'):
+            if options[name] < 0:
+                raise CommandError(f'{name.replace("_", " ").capitalize()} cannot be negative.')
+        if not 0 <= options['hot_share'] <= 1:
+            raise CommandError('Hot share must be between 0 and 1.')
+
+        end = options['end'] or timezone.now().date()
+        end_at = datetime.datetime.combine(end, datetime.time(), datetime.timezone.utc)
+        spec = DatasetSpec(
+            seed=options['seed'],
+            users=options['users'],
+            budgets=options['budgets'],
+            categories=options['categories'],
+            transactions=options['transactions'],
+            hot_budgets=options['hot_budgets'],
+            hot_share=options['hot_share'],
+            skew=options['skew'],
+            max_members=options['max_members'],
+            start=end_at - datetime.timedelta(days=options['days']),
+            end=end_at,
+        )
+
+        started = time.perf_counter()
+        counts = generate_dataset(spec, options['workers'], options['batch_size'])
+        elapsed = time.perf_counter() - started
+
+        for name, count in counts.items():
+            self.stdout.write(f'{name}: {count}')
+        total = sum(counts.values())
+        self.stdout.write(f'Generated {total} rows in {elapsed:.2f}s ({total / elapsed:.0f} rows/s)')
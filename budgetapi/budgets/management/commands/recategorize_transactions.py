@@ -0,0 +1,58 @@
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any
+
+from budgets.models import Category
+from budgets.recategorization import Recategorizer
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+
+class Command(BaseCommand):
+    help = 'Apply the current categories to existing transfers, e.g. after tags of categories were changed'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            '--categories', type=int, nargs='+', help='Ids of changed categories, only changes from or to them are made'
+        )
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Number of transfers read at once')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Number of stemming processes')
+        parser.add_argument(
+            '--checkpoint',
+            type=Path,
+            help='File storing the progress, an interrupted run with the same file continues where it stopped',
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if options['chunk_size'] < 1 or options['workers'] < 1:
+            raise CommandError('Chunk size and number of workers must be at least 1.')
+        category_ids = sorted(set(options['categories'] or ()))
+        missing = set(category_ids) - set(Category.objects.filter(pk__in=category_ids).values_list('pk', flat=True))
+        if missing:
+            raise CommandError(f'Categories {", ".join(map(str, sorted(missing)))} do not exist.')
+
+        checkpoint = options['checkpoint']
+        after_id = 0
+        if checkpoint and checkpoint.exists():
+            state = json.loads(checkpoint.read_text())
+            if state['categories'] != category_ids:
+                raise CommandError(f'Checkpoint {checkpoint} was written for other categories.')
+            after_id = state['after_id']
+            self.stdout.write(f'Resuming after transaction {after_id}')
+
+        started = time.perf_counter()
+        recategorizer = Recategorizer(options['workers'], category_ids)
+        for after_id in recategorizer.run(options['chunk_size'], after_id):
+            if checkpoint:
+                checkpoint.write_text(json.dumps({'categories': category_ids, 'after_id': after_id}))
+            if options['verbosity'] > 1:
+                self.stdout.write(f'Checked transfers up to {after_id}, updated {recategorizer.updated}')
+        if checkpoint and checkpoint.exists():
+            checkpoint.unlink()
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f'Checked {recategorizer.checked} transfers with {recategorizer.stemmed} unique titles and updated '
+            f'{recategorizer.updated} in {elapsed:.2f}s'
+        )
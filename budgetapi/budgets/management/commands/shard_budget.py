@@ -0,0 +1,21 @@
+from typing import Any
+
+from budgets.models import Budget
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+
+class Command(BaseCommand):
+    help = 'Split the balance of a budget into shards so that concurrent transfers do not contend on a single row'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('budget', type=int, help='Budget id')
+        parser.add_argument('shards', type=int, help='Number of balance shards, 1 disables sharding')
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if options['shards'] < 1:
+            raise CommandError('Number of shards must be at least 1.')
+        if not Budget.objects.filter(pk=options['budget']).exists():
+            raise CommandError(f'Budget {options["budget"]} does not exist.')
+
+        Budget.objects.reshard(options['budget'], options['shards'])
+        self.stdout.write(f'Budget {options["budget"]} has {options["shards"]} balance shards')
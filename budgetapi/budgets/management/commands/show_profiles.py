@@ -0,0 +1,44 @@
+import pstats
+from typing import IO, Any, cast
+
+from budgets.profiling import list_profiles, profile_dir
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+SORT_KEYS = ('cumulative', 'tottime', 'calls')
+
+
+class Command(BaseCommand):
+    help = 'List profiles of requests recorded with the X-Profile header or summarize one of them'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('name', nargs='?', help='Profile to summarize, the stored profiles are listed without it')
+        parser.add_argument('--route', help='List only profiles of this route, e.g. budgets:transactions')
+        parser.add_argument('--budget', type=int, help='List only profiles of this budget')
+        parser.add_argument('--limit', type=int, default=20, help='Number of profiles to list')
+        parser.add_argument('--sort', choices=SORT_KEYS, default='cumulative')
+        parser.add_argument('--lines', type=int, default=30, help='Number of functions to print')
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if options['name'] is None:
+            self.list(**options)
+            return
+
+        path = profile_dir() / f'{options["name"]}.prof'
+        if not path.exists():
+            raise CommandError(f'Profile {options["name"]} does not exist')
+        stats = pstats.Stats(str(path), stream=cast(IO[str], self.stdout))
+        stats.strip_dirs().sort_stats(options['sort']).print_stats(options['lines'])
+
+    def list(self, **options: Any) -> None:
+        profiles = [
+            profile
+            for profile in list_profiles()
+            if options['route'] in (None, profile['route']) and options['budget'] in (None, profile['budget_id'])
+        ]
+        for profile in profiles[: options['limit']]:
+            self.stdout.write(
+                f'{profile["name"]}  {profile["method"]} {profile["path"]} status={profile["status"]} '
+                f'duration={profile["duration_ms"]:.1f}ms'
+            )
+        if not profiles:
+            self.stdout.write('No profiles')
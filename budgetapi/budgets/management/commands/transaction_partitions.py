@@ -0,0 +1,40 @@
+from typing import Any
+
+from budgets.partitions import add_months, create_partitions_ahead, detach_partitions, month_start
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = 'Create monthly partitions of the transaction table ahead of time and detach the old ones'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            '--ahead',
+            type=int,
+            default=settings.BUDGETS_TRANSACTION_PARTITIONS_AHEAD,
+            help='Number of future months to create partitions for',
+        )
+        parser.add_argument(
+            '--retention',
+            type=int,
+            default=settings.BUDGETS_TRANSACTION_RETENTION_MONTHS,
+            help='Detach partitions of months older than this many months, nothing is detached without it',
+        )
+        parser.add_argument('--drop', action='store_true', help='Drop detached partitions instead of keeping them')
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if options['ahead'] < 0:
+            raise CommandError('Number of months ahead cannot be negative.')
+        if options['retention'] is not None and options['retention'] < 1:
+            raise CommandError('Retention must be at least 1 month.')
+
+        for partition in create_partitions_ahead(options['ahead']):
+            self.stdout.write(f'Created {partition.name}')
+
+        if options['retention'] is None:
+            return
+        before = add_months(month_start(timezone.now()), -options['retention'])
+        for partition in detach_partitions(before, drop=options['drop']):
+            self.stdout.write(f'{"Dropped" if options["drop"] else "Detached"} {partition.name}')
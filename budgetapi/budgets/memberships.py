@@ -0,0 +1,138 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import FrozenSet, Iterable, Optional, Tuple
+
+from budgets.models import Budget
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+MEMBERSHIP_GENERATION_KEY = 'budgets:membership:generation'
+# a process that fell further behind than this clears its entries instead of replaying the changes
+MEMBERSHIP_MAX_REPLAYED_CHANGES = 1000
+
+
+def membership_changes_key(generation: int) -> str:
+    return f'budgets:membership:changes:{generation}'
+
+
+class MembershipCache:
+    """
+    Ids of budgets each user is a member of, held in a process-level LRU. Hits are served from the process without any
+    lookup until they expire after ``timeout`` seconds.
+
+    Invalidations are appended to a log kept in the Django cache: a generation counter and the ids of users changed in
+    each generation. Every process polls the counter at most every ``poll_interval`` seconds and evicts the users
+    changed since its last poll. Other processes see changes only when the cache backend is shared, otherwise they pick
+    them up when their entries expire.
+    """
+
+    def __init__(self, maxsize: int, timeout: int, poll_interval: float) -> None:
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[int, Tuple[float, FrozenSet[int]]]' = OrderedDict()
+        self._generation: Optional[int] = None
+        self._next_poll = 0.0
+        # changed on every eviction, so that an entry read from the database before it is not stored after it
+        self._epoch = 0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._generation = None
+            self._next_poll = 0.0
+            self._epoch += 1
+
+    def _evict(self, user_ids: Optional[Iterable[int]]) -> None:
+        # evicts all entries when user_ids is None, the lock must be held
+        if user_ids is None:
+            self._entries.clear()
+        else:
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+        self._epoch += 1
+
+    def _poll(self) -> None:
+        now = time.monotonic()
+        if now < self._next_poll:
+            return
+        with self._lock:
+            if now < self._next_poll:
+                return
+            self._next_poll = now + self.poll_interval
+            seen = self._generation
+
+        generation = cache.get(MEMBERSHIP_GENERATION_KEY, 0)
+        if generation == seen:
+            return
+
+        changed: Optional[FrozenSet[int]] = None
+        if seen is not None and seen < generation <= seen + MEMBERSHIP_MAX_REPLAYED_CHANGES:
+            keys = [membership_changes_key(number) for number in range(seen + 1, generation + 1)]
+            changes = cache.get_many(keys)
+            # a missing change was evicted or is still being written, so any entry may be stale
+            if len(changes) == len(keys):
+                changed = frozenset().union(*changes.values())
+
+        with self._lock:
+            if self._generation != seen:
+                # another thread polled meanwhile
+                return
+            if seen is not None:
+                self._evict(changed)
+            self._generation = generation
+
+    def get(self, user_id: int) -> FrozenSet[int]:
+        self._poll()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(user_id)
+                return entry[1]
+            epoch = self._epoch
+
+        budget_ids = frozenset(
+            # entries are kept until invalidated or expired, so they must not come from a lagging replica
+            Budget.members.through.objects.using(DEFAULT_DB_ALIAS)
+            .filter(user_id=user_id)
+            .values_list('budget_id', flat=True)
+        )
+
+        with self._lock:
+            if self._epoch == epoch:
+                self._entries[user_id] = (time.monotonic() + self.timeout, budget_ids)
+                self._entries.move_to_end(user_id)
+                if len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return budget_ids
+
+    def is_member(self, user_id: int, budget_id: int) -> bool:
+        return budget_id in self.get(user_id)
+
+    def invalidate(self, user_ids: Iterable[int]) -> None:
+        user_ids = frozenset(user_ids)
+        with self._lock:
+            self._evict(user_ids)
+
+        # a constant number of cache operations however many users changed; incr is not atomic on every backend, so
+        # a generation taken concurrently by another process is skipped
+        for _ in range(10):
+            try:
+                generation = cache.incr(MEMBERSHIP_GENERATION_KEY)
+            except ValueError:
+                cache.add(MEMBERSHIP_GENERATION_KEY, 0, timeout=None)
+                continue
+            if cache.add(membership_changes_key(generation), user_ids, timeout=self.timeout):
+                return
+        # the log could not be written, other processes clear their entries when they see the gap
+        cache.incr(MEMBERSHIP_GENERATION_KEY)
+
+
+membership_cache = MembershipCache(
+    settings.BUDGETS_MEMBERSHIP_CACHE_SIZE,
+    settings.BUDGETS_MEMBERSHIP_CACHE_TIMEOUT,
+    settings.BUDGETS_MEMBERSHIP_CACHE_POLL_INTERVAL,
+)
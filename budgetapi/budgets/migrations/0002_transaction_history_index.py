@@ -0,0 +1,26 @@
+# Generated by Django 3.2.8 on 2026-10-18 20:04
+
+import django.db.models.deletion
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('budgets', '0001_initial'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='transaction',
+            index=models.Index(fields=['budget', '-created_at', '-id'], name='transaction_budget_history_idx'),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='budget',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='budgets.budget'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 3.2.8 on 2026-10-18 20:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budgets', '0002_transaction_history_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BudgetDailyBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('opening_balance', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('closing_balance', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('inflow', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('outflow', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('count', models.PositiveIntegerField(default=0)),
+                (
+                    'budget',
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='daily_balances',
+                        to='budgets.budget',
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='budgetdailybalance',
+            constraint=models.UniqueConstraint(fields=('budget', 'date'), name='budget_daily_balance_unique'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 3.2.8 on 2026-10-18 20:32
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budgets', '0003_budget_daily_balance'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='budget',
+            name='shard_count',
+            field=models.PositiveSmallIntegerField(
+                default=1,
+                help_text='Number of balance shards, 1 disables sharding',
+                validators=[django.core.validators.MinValueValidator(1)],
+            ),
+        ),
+        migrations.CreateModel(
+            name='BudgetBalanceShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveSmallIntegerField()),
+                ('balance', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                (
+                    'budget',
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='balance_shards',
+                        to='budgets.budget',
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='budgetbalanceshard',
+            constraint=models.UniqueConstraint(fields=('budget', 'index'), name='budget_balance_shard_unique'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.2.8 on 2026-10-18 20:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budgets', '0004_budget_balance_shards'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='budget',
+            name='modified_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='budget',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='budgetbalanceshard',
+            name='modified_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='budgetbalanceshard',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
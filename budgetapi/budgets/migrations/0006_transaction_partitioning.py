@@ -0,0 +1,80 @@
+import datetime
+
+from django.db import migrations
+from django.utils import timezone
+
+MONTHS_AHEAD = 3
+
+# indexes and foreign keys are named as Django created them for the unpartitioned table
+INDEXES_SQL = '''
+CREATE INDEX budgets_transaction_category_id_37e17a21 ON budgets_transaction (category_id);
+CREATE INDEX budgets_transaction_creator_id_08040dee ON budgets_transaction (creator_id);
+CREATE INDEX transaction_budget_history_idx ON budgets_transaction (budget_id, created_at DESC, id DESC);
+ALTER TABLE budgets_transaction
+    ADD CONSTRAINT budgets_transaction_budget_id_3c6ca6df_fk_budgets_budget_id
+    FOREIGN KEY (budget_id) REFERENCES budgets_budget (id) DEFERRABLE INITIALLY DEFERRED,
+    ADD CONSTRAINT budgets_transaction_category_id_37e17a21_fk_budgets_category_id
+    FOREIGN KEY (category_id) REFERENCES budgets_category (id) DEFERRABLE INITIALLY DEFERRED,
+    ADD CONSTRAINT budgets_transaction_creator_id_08040dee_fk_auth_user_id
+    FOREIGN KEY (creator_id) REFERENCES auth_user (id) DEFERRABLE INITIALLY DEFERRED;
+'''
+
+RENAME_SQL = '''
+ALTER TABLE budgets_transaction RENAME TO budgets_transaction_old;
+ALTER TABLE budgets_transaction_old RENAME CONSTRAINT budgets_transaction_pkey TO budgets_transaction_old_pkey;
+ALTER INDEX budgets_transaction_category_id_37e17a21 RENAME TO budgets_transaction_old_category_id;
+ALTER INDEX budgets_transaction_creator_id_08040dee RENAME TO budgets_transaction_old_creator_id;
+ALTER INDEX transaction_budget_history_idx RENAME TO budgets_transaction_old_history;
+'''
+
+PARTITION_SQL = f'''{RENAME_SQL}
+CREATE TABLE budgets_transaction (LIKE budgets_transaction_old INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+    PARTITION BY RANGE (created_at);
+-- the partition key has to be a part of the primary key
+ALTER TABLE budgets_transaction ADD CONSTRAINT budgets_transaction_pkey PRIMARY KEY (id, created_at);
+ALTER SEQUENCE budgets_transaction_id_seq OWNED BY budgets_transaction.id;
+CREATE TABLE budgets_transaction_default PARTITION OF budgets_transaction DEFAULT;
+{INDEXES_SQL}'''
+
+UNPARTITION_SQL = f'''{RENAME_SQL}
+CREATE TABLE budgets_transaction (LIKE budgets_transaction_old INCLUDING DEFAULTS INCLUDING CONSTRAINTS);
+ALTER TABLE budgets_transaction ADD CONSTRAINT budgets_transaction_pkey PRIMARY KEY (id);
+ALTER SEQUENCE budgets_transaction_id_seq OWNED BY budgets_transaction.id;
+INSERT INTO budgets_transaction SELECT * FROM budgets_transaction_old;
+DROP TABLE budgets_transaction_old;
+{INDEXES_SQL}'''
+
+
+def create_monthly_partitions(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('SELECT MIN(created_at) FROM budgets_transaction_old')
+        first = cursor.fetchone()[0] or timezone.now()
+        month = datetime.datetime(first.year, first.month, 1, tzinfo=datetime.timezone.utc)
+        now = timezone.now()
+        last = datetime.datetime(now.year, now.month, 1, tzinfo=datetime.timezone.utc)
+        for _ in range(MONTHS_AHEAD):
+            last = (last + datetime.timedelta(days=32)).replace(day=1)
+
+        while month <= last:
+            next_month = (month + datetime.timedelta(days=32)).replace(day=1)
+            cursor.execute(
+                f'CREATE TABLE budgets_transaction_p{month:%Y_%m} PARTITION OF budgets_transaction '
+                'FOR VALUES FROM (%s) TO (%s)',
+                [month, next_month],
+            )
+            month = next_month
+
+        cursor.execute('INSERT INTO budgets_transaction SELECT * FROM budgets_transaction_old')
+        cursor.execute('DROP TABLE budgets_transaction_old')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budgets', '0005_budget_version'),
+    ]
+
+    operations = [
+        migrations.RunSQL(PARTITION_SQL, reverse_sql=UNPARTITION_SQL),
+        migrations.RunPython(create_monthly_partitions, reverse_code=migrations.RunPython.noop),
+    ]
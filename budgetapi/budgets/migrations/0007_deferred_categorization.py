@@ -0,0 +1,35 @@
+# Generated by Django 3.2.8 on 2026-10-18 22:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budgets', '0006_transaction_partitioning'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='category_pending',
+            field=models.BooleanField(default=False, help_text='Category is not assigned yet'),
+        ),
+        migrations.CreateModel(
+            name='PendingCategorization',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('transaction_created_at', models.DateTimeField()),
+                (
+                    'transaction',
+                    models.ForeignKey(
+                        db_constraint=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='+',
+                        to='budgets.transaction',
+                    ),
+                ),
+            ],
+        ),
+    ]
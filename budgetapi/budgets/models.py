@@ -1,19 +1,237 @@
+import datetime
+import random
 from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Tuple, cast
 
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib.postgres.fields import ArrayField
-from django.db import models
+from django.core.validators import MinValueValidator
+from django.db import connections, models, router, transaction
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+
+class BudgetManager(models.Manager):
+    """
+    Balance updates of budgets. A budget with ``shard_count`` above one keeps part of its balance in balance shards so
+    that concurrent deposits update different rows. Deposits go to a random shard while withdrawals are taken from the
+    budget row and move the shards back into it only when the budget row alone does not cover the amount.
+
+    Every balance change bumps ``version`` and ``modified_at`` of the changed row, the version of a sharded budget is
+    the sum of its own version and versions of its shards.
+    """
+
+    bump_version_sql = 'version = version + 1, modified_at = NOW()'
+
+    def _shards_sql(self, budget_table: str, aggregate: str, default: str = '0') -> str:
+        return (
+            f'CASE WHEN {budget_table}.shard_count > 1 THEN COALESCE('
+            f'(SELECT {aggregate} FROM {BudgetBalanceShard._meta.db_table} WHERE budget_id = {budget_table}.id), '
+            f'{default}) ELSE {default} END'
+        )
+
+    def _shards_balance_sql(self, budget_table: str) -> str:
+        return self._shards_sql(budget_table, 'SUM(balance)')
+
+    def deposit(self, pk: int, amount: Decimal, shard_count: int = 1) -> Decimal:
+        """
+        Add amount to the budget balance and return the new balance. The updated row stays locked until the end of
+        the transaction. For sharded budgets it is the balance observed right after updating the shard, deposits to
+        other shards that are not committed yet are not included.
+        """
+        table = self.model._meta.db_table
+        with connections[router.db_for_write(self.model)].cursor() as cursor:
+            if shard_count > 1:
+                shard_table = BudgetBalanceShard._meta.db_table
+                # lock the budget before the shard like lock_balance does, the foreign keys of new transactions would
+                # lock it afterwards otherwise and deadlock with a concurrent withdrawal; key share locks do not block
+                # each other, so concurrent deposits still only wait for their shards
+                cursor.execute(f'SELECT 1 FROM {table} WHERE id = %s FOR KEY SHARE', [pk])
+                cursor.execute(
+                    f'''
+                    WITH shard AS (
+                        UPDATE {shard_table} SET balance = balance + %s, {self.bump_version_sql}
+                        WHERE budget_id = %s AND index = %s RETURNING id, balance
+                    )
+                    SELECT {table}.balance + shard.balance + COALESCE(
+                        (SELECT SUM(balance) FROM {shard_table} WHERE budget_id = {table}.id AND id <> shard.id), 0
+                    )
+                    FROM {table}, shard WHERE {table}.id = %s
+                    ''',
+                    [amount, pk, random.randrange(shard_count), pk],
+                )
+                row = cursor.fetchone()
+                if row:
+                    return cast(Decimal, row[0])
+
+            cursor.execute(
+                f'UPDATE {table} SET balance = balance + %s, {self.bump_version_sql} WHERE id = %s '
+                f'RETURNING balance + {self._shards_balance_sql(table)}',
+                [amount, pk],
+            )
+            return cast(Decimal, cursor.fetchone()[0])
+
+    def withdraw(self, pk: int, amount: Decimal) -> Optional[Decimal]:
+        """
+        Subtract amount from the budget balance and return the new balance or None if there are not enough funds.
+        The updated row stays locked until the end of the transaction.
+        """
+        table = self.model._meta.db_table
+        with connections[router.db_for_write(self.model)].cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {table} SET balance = balance - %s, {self.bump_version_sql} WHERE id = %s AND balance >= %s '
+                f'RETURNING balance + {self._shards_balance_sql(table)}',
+                [amount, pk, amount],
+            )
+            row = cursor.fetchone()
+            if row:
+                return cast(Decimal, row[0])
+
+            if self.lock_balance(pk) < amount:
+                return None
+
+            cursor.execute(
+                f'UPDATE {table} SET balance = balance - %s, {self.bump_version_sql} WHERE id = %s RETURNING balance',
+                [amount, pk],
+            )
+            return cast(Decimal, cursor.fetchone()[0])
+
+    def lock_balance(self, pk: int) -> Decimal:
+        """
+        Lock the budget together with its balance shards, move the shards into the budget row and return the balance.
+        While the budget row is locked the balance can only change through the caller.
+        """
+        table = self.model._meta.db_table
+        shard_table = BudgetBalanceShard._meta.db_table
+        with connections[router.db_for_write(self.model)].cursor() as cursor:
+            cursor.execute(f'SELECT balance, shard_count FROM {table} WHERE id = %s FOR UPDATE', [pk])
+            balance, shard_count = cursor.fetchone()
+            if shard_count == 1:
+                return cast(Decimal, balance)
+
+            cursor.execute(
+                f'''
+                UPDATE {shard_table} SET balance = 0
+                FROM (
+                    SELECT id, balance FROM {shard_table} WHERE budget_id = %s ORDER BY index FOR UPDATE
+                ) AS locked
+                WHERE {shard_table}.id = locked.id
+                RETURNING locked.balance
+                ''',
+                [pk],
+            )
+            shards_balance = sum((row[0] for row in cursor.fetchall()), Decimal(0))
+            if not shards_balance:
+                return cast(Decimal, balance)
+
+            cursor.execute(
+                f'UPDATE {table} SET balance = balance + %s, {self.bump_version_sql} WHERE id = %s RETURNING balance',
+                [shards_balance, pk],
+            )
+            return cast(Decimal, cursor.fetchone()[0])
+
+    def get_total_balance(self, pk: int) -> Decimal:
+        table = self.model._meta.db_table
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(f'SELECT balance + {self._shards_balance_sql(table)} FROM {table} WHERE id = %s', [pk])
+            return cast(Decimal, cursor.fetchone()[0])
+
+    def get_version(self, pk: int) -> Optional[Tuple[int, datetime.datetime]]:
+        """
+        Return the version and the last modification time of the budget or None if it does not exist.
+        """
+        table = self.model._meta.db_table
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(
+                f'''
+                SELECT version + {self._shards_sql(table, 'SUM(version)')},
+                    GREATEST(modified_at, {self._shards_sql(table, 'MAX(modified_at)', 'NULL')})
+                FROM {table} WHERE id = %s
+                ''',
+                [pk],
+            )
+            row = cursor.fetchone()
+        return (int(row[0]), row[1]) if row else None
+
+    def with_total_balance(self) -> 'models.QuerySet[Budget]':
+        """
+        Annotate budgets with ``total_balance`` so that listing sharded budgets does not query the shards of each one.
+        """
+        table = self.model._meta.db_table
+        total_balance = RawSQL(f'{table}.balance + {self._shards_balance_sql(table)}', [], models.DecimalField())
+        return cast('models.QuerySet[Budget]', self.annotate(total_balance=total_balance))
+
+    def touch(self, budget_ids: Iterable[int]) -> None:
+        """
+        Mark budgets as modified by a change other than a balance update, e.g. of their members or history.
+        """
+        self.filter(pk__in=budget_ids).update(version=models.F('version') + 1, modified_at=timezone.now())
+
+    @transaction.atomic
+    def reshard(self, pk: int, shard_count: int) -> None:
+        """
+        Change the number of balance shards of the budget, 1 disables sharding.
+        """
+        self.lock_balance(pk)
+        shards = BudgetBalanceShard.objects.filter(budget_id=pk)
+        # versions of removed shards are moved to the budget so that its version never goes back
+        removed = shards.aggregate(version=models.Sum('version'), count=models.Count('id'))
+        shards_version = removed['version'] or 0
+        shards.delete()
+        if shard_count > 1:
+            BudgetBalanceShard.objects.bulk_create(
+                BudgetBalanceShard(budget_id=pk, index=index) for index in range(shard_count)
+            )
+        self.filter(pk=pk).update(
+            shard_count=shard_count,
+            version=models.F('version') + shards_version + 1,
+            modified_at=timezone.now(),
+        )
+        if shard_count == 1 and removed['count']:
+            # snapshots are not recorded while the budget is sharded
+            BudgetDailyBalance.objects.rebuild_from_total_balance(pk)
 
 
 class Budget(models.Model):
     creator = models.ForeignKey(User, on_delete=models.CASCADE, related_name='budgets')
     members = models.ManyToManyField(User, blank=True)
     balance = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    shard_count = models.PositiveSmallIntegerField(
+        default=1, validators=[MinValueValidator(1)], help_text='Number of balance shards, 1 disables sharding'
+    )
     created_at = models.DateTimeField(auto_now_add=True)
+    version = models.PositiveBigIntegerField(default=0)
+    modified_at = models.DateTimeField(auto_now=True)
+
+    objects = BudgetManager()
 
     def __str__(self) -> str:
         return f'Budget: {self.pk}'
 
+    @cached_property
+    def total_balance(self) -> Decimal:
+        if self.shard_count == 1:
+            return self.balance
+        return Budget.objects.get_total_balance(self.pk)
+
+
+class BudgetBalanceShard(models.Model):
+    budget = models.ForeignKey(Budget, on_delete=models.CASCADE, related_name='balance_shards', db_index=False)
+    index = models.PositiveSmallIntegerField()
+    balance = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    version = models.PositiveBigIntegerField(default=0)
+    modified_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['budget', 'index'], name='budget_balance_shard_unique'),
+        ]
+
+    def __str__(self) -> str:
+        return f'Budget balance shard: {self.pk}'
+
 
 class Category(models.Model):
     name = models.CharField(max_length=100)
@@ -32,19 +250,249 @@ class TransactionType(models.TextChoices):
 
 
 class Transaction(models.Model):
+    # the table is partitioned by created_at with the primary key (id, created_at), ids come from one sequence but the
+    # database does not prevent rows with explicit ids from repeating them in different months
     creator = models.ForeignKey(User, on_delete=models.CASCADE)
-    budget = models.ForeignKey(Budget, on_delete=models.CASCADE)
+    budget = models.ForeignKey(Budget, on_delete=models.CASCADE, db_index=False)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     created_at = models.DateTimeField(auto_now_add=True)
     title = models.CharField(max_length=255, blank=True)
     category = models.ForeignKey(Category, null=True, blank=True, on_delete=models.CASCADE)
     type = models.CharField(max_length=10, choices=TransactionType.choices)
     current_balance = models.DecimalField(max_digits=10, decimal_places=2, help_text='Budget balance after transaction')
+    category_pending = models.BooleanField(default=False, help_text='Category is not assigned yet')
 
     class Meta:
         constraints = [
             models.CheckConstraint(check=models.Q(amount__gt=Decimal('0')), name='transaction_amount_positive'),
         ]
+        indexes = [
+            # history is always read per budget, newest first; the index also replaces the budget foreign key index
+            models.Index(fields=['budget', '-created_at', '-id'], name='transaction_budget_history_idx'),
+        ]
 
     def __str__(self) -> str:
         return f'Transaction: {self.pk}'
+
+
+class PendingCategorization(models.Model):
+    """
+    Queue of transfers waiting for the categorization worker.
+    """
+
+    # the primary key of the partitioned transaction table includes created_at, so a constraint cannot reference its id
+    transaction = models.ForeignKey(Transaction, on_delete=models.CASCADE, db_constraint=False, related_name='+')
+    transaction_created_at = models.DateTimeField()
+
+    def __str__(self) -> str:
+        return f'Pending categorization: {self.transaction_id}'
+
+
+class BudgetDailyBalanceManager(models.Manager):
+    def record(
+        self,
+        budget_id: int,
+        date: datetime.date,
+        opening_balance: Decimal,
+        closing_balance: Decimal,
+        inflow: Decimal = Decimal(0),
+        outflow: Decimal = Decimal(0),
+        count: int = 1,
+    ) -> None:
+        """
+        Add transactions to the budget's snapshot of the given day. It has to be called while the budget row is locked
+        so that days are updated in the order of transactions. Nothing is recorded for a sharded budget: concurrent
+        transfers to its shards would wait for each other on the snapshot row, its history is computed by
+        ``compute_days`` instead.
+        """
+        with connections[router.db_for_write(self.model)].cursor() as cursor:
+            cursor.execute(
+                f'''
+                INSERT INTO {self.model._meta.db_table} AS snapshot
+                    (budget_id, date, opening_balance, closing_balance, inflow, outflow, count)
+                SELECT id, %s, %s, %s, %s, %s, %s FROM {Budget._meta.db_table} WHERE id = %s AND shard_count = 1
+                ON CONFLICT (budget_id, date) DO UPDATE SET
+                    closing_balance = EXCLUDED.closing_balance,
+                    inflow = snapshot.inflow + EXCLUDED.inflow,
+                    outflow = snapshot.outflow + EXCLUDED.outflow,
+                    count = snapshot.count + EXCLUDED.count
+                ''',
+                [date, opening_balance, closing_balance, inflow, outflow, count, budget_id],
+            )
+
+    def record_transactions(self, transactions: Iterable['Transaction']) -> None:
+        """
+        Add new transactions of a budget, given in the order they were applied, to the daily snapshots.
+        """
+        days: Dict[datetime.date, Dict[str, Any]] = {}
+        for instance in transactions:
+            date = timezone.localdate(instance.created_at)
+            signed_amount = instance.amount if instance.type == TransactionType.TRANSFER else -instance.amount
+            if date not in days:
+                days[date] = {
+                    'budget_id': instance.budget_id,
+                    'date': date,
+                    'opening_balance': instance.current_balance - signed_amount,
+                    'inflow': Decimal(0),
+                    'outflow': Decimal(0),
+                    'count': 0,
+                }
+            day = days[date]
+            day['closing_balance'] = instance.current_balance
+            day['inflow' if signed_amount > 0 else 'outflow'] += instance.amount
+            day['count'] += 1
+
+        for day in days.values():
+            self.record(**day)
+
+    def rebuild(self, budget_ids: Iterable[int]) -> None:
+        """
+        Recompute snapshots of the given budgets from their transactions.
+        """
+        budget_ids = list(budget_ids)
+        self.filter(budget_id__in=budget_ids).delete()
+        with connections[router.db_for_write(self.model)].cursor() as cursor:
+            cursor.execute(
+                f'''
+                INSERT INTO {self.model._meta.db_table}
+                    (budget_id, date, opening_balance, closing_balance, inflow, outflow, count)
+                SELECT
+                    budget_id,
+                    (created_at AT TIME ZONE %(time_zone)s)::date,
+                    (ARRAY_AGG(
+                        current_balance - CASE WHEN type = %(transfer)s THEN amount ELSE -amount END
+                        ORDER BY created_at, id
+                    ))[1],
+                    (ARRAY_AGG(current_balance ORDER BY created_at DESC, id DESC))[1],
+                    COALESCE(SUM(amount) FILTER (WHERE type = %(transfer)s), 0),
+                    COALESCE(SUM(amount) FILTER (WHERE type = %(withdrawal)s), 0),
+                    COUNT(*)
+                FROM {Transaction._meta.db_table}
+                WHERE budget_id = ANY(%(budget_ids)s)
+                GROUP BY 1, 2
+                ''',
+                {
+                    'time_zone': settings.TIME_ZONE,
+                    'transfer': TransactionType.TRANSFER,
+                    'withdrawal': TransactionType.WITHDRAWAL,
+                    'budget_ids': budget_ids,
+                },
+            )
+
+    def _days_sql(self) -> str:
+        # balances are derived backwards from the current total balance of the budget, because current_balance of
+        # transactions in a sharded budget is not a running balance
+        budget_table = Budget._meta.db_table
+        return f'''
+            WITH days AS (
+                SELECT
+                    (created_at AT TIME ZONE %(time_zone)s)::date AS date,
+                    COALESCE(SUM(amount) FILTER (WHERE type = %(transfer)s), 0) AS inflow,
+                    COALESCE(SUM(amount) FILTER (WHERE type = %(withdrawal)s), 0) AS outflow,
+                    COUNT(*) AS count
+                FROM {Transaction._meta.db_table}
+                WHERE budget_id = %(budget_id)s
+                GROUP BY 1
+            ), opening AS (
+                SELECT
+                    date,
+                    total_balance - SUM(inflow - outflow) OVER (ORDER BY date DESC) AS opening_balance,
+                    inflow,
+                    outflow,
+                    count
+                FROM days, (
+                    SELECT balance + {Budget.objects._shards_balance_sql(budget_table)} AS total_balance
+                    FROM {budget_table} WHERE id = %(budget_id)s
+                ) AS budget
+            )
+            SELECT date, opening_balance, opening_balance + inflow - outflow AS closing_balance, inflow, outflow, count
+            FROM opening
+        '''
+
+    def _days_params(self, budget_id: int) -> Dict[str, Any]:
+        return {
+            'time_zone': settings.TIME_ZONE,
+            'transfer': TransactionType.TRANSFER,
+            'withdrawal': TransactionType.WITHDRAWAL,
+            'budget_id': budget_id,
+        }
+
+    def compute_days(
+        self, budget_id: int, after: Optional[datetime.date] = None, before: Optional[datetime.date] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Compute snapshots of the budget's days from its transactions and total balance, ordered by date, for budgets
+        whose snapshots are not recorded.
+        """
+        conditions = ['TRUE']
+        if after is not None:
+            conditions.append('date >= %(after)s')
+        if before is not None:
+            conditions.append('date <= %(before)s')
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(
+                f'SELECT * FROM ({self._days_sql()}) AS day WHERE {" AND ".join(conditions)} ORDER BY date',
+                {**self._days_params(budget_id), 'after': after, 'before': before},
+            )
+            columns = [column.name for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def compute_balance_on(self, budget_id: int, date: datetime.date) -> Decimal:
+        """
+        Compute the balance of the budget at the end of the given day from its total balance and later transactions.
+        """
+        table = Budget._meta.db_table
+        next_day = timezone.make_aware(datetime.datetime.combine(date + datetime.timedelta(days=1), datetime.time()))
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(
+                f'''
+                SELECT balance + {Budget.objects._shards_balance_sql(table)} - COALESCE((
+                    SELECT SUM(CASE WHEN type = %s THEN amount ELSE -amount END) FROM {Transaction._meta.db_table}
+                    WHERE budget_id = %s AND created_at >= %s
+                ), 0)
+                FROM {table} WHERE id = %s
+                ''',
+                [TransactionType.TRANSFER, budget_id, next_day, budget_id],
+            )
+            return cast(Decimal, cursor.fetchone()[0])
+
+    def rebuild_from_total_balance(self, budget_id: int) -> None:
+        """
+        Recompute snapshots of the budget like ``compute_days`` does. The budget must be locked.
+        """
+        self.filter(budget_id=budget_id).delete()
+        with connections[router.db_for_write(self.model)].cursor() as cursor:
+            cursor.execute(
+                f'''
+                INSERT INTO {self.model._meta.db_table}
+                    (budget_id, date, opening_balance, closing_balance, inflow, outflow, count)
+                SELECT %(budget_id)s, * FROM ({self._days_sql()}) AS day
+                ''',
+                self._days_params(budget_id),
+            )
+
+    def balance_on(self, budget_id: int, date: datetime.date) -> Decimal:
+        closing_balance = (
+            self.filter(budget_id=budget_id, date__lte=date).order_by('-date').values_list('closing_balance', flat=True)
+        ).first()
+        return cast(Decimal, closing_balance) if closing_balance is not None else Decimal(0)
+
+
+class BudgetDailyBalance(models.Model):
+    budget = models.ForeignKey(Budget, on_delete=models.CASCADE, related_name='daily_balances', db_index=False)
+    date = models.DateField()
+    opening_balance = models.DecimalField(max_digits=10, decimal_places=2)
+    closing_balance = models.DecimalField(max_digits=10, decimal_places=2)
+    inflow = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    outflow = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    count = models.PositiveIntegerField(default=0)
+
+    objects = BudgetDailyBalanceManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['budget', 'date'], name='budget_daily_balance_unique'),
+        ]
+
+    def __str__(self) -> str:
+        return f'Budget daily balance: {self.pk}'
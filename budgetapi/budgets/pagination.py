@@ -0,0 +1,143 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+from typing import Any, List, Optional, Tuple
+
+from django.db import models
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+Position = Tuple[str, int]
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination keyed on ``(created_at, id)`` in descending order. Every page is fetched with an index range
+    condition and a LIMIT so neither OFFSET nor COUNT(*) is ever issued.
+    """
+
+    cursor_query_param = 'cursor'
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self) -> None:
+        self.base_url = ''
+        self.next_position: Optional[Position] = None
+        self.previous_position: Optional[Position] = None
+
+    def get_page_size(self, request: Request) -> int:
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def decode_cursor(self, request: Request) -> Optional[Tuple[Position, bool]]:
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            created_at, pk, reverse = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            if parse_datetime(created_at) is None:
+                raise ValueError
+            return (created_at, int(pk)), bool(reverse)
+        except (TypeError, ValueError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, position: Position, reverse: bool) -> str:
+        data = json.dumps([position[0], position[1], int(reverse)], separators=(',', ':'))
+        encoded = base64.urlsafe_b64encode(data.encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_position(self, instance: Any) -> Position:
+        return instance.created_at.isoformat(), instance.id
+
+    def paginate_queryset(self, queryset: models.QuerySet, request: Request, view: Any = None) -> List[Any]:
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        reverse = cursor is not None and cursor[1]
+
+        if cursor is not None:
+            (created_at, pk) = cursor[0]
+            if reverse:
+                queryset = queryset.filter(created_at__gte=created_at).filter(
+                    models.Q(created_at__gt=created_at) | models.Q(pk__gt=pk)
+                )
+            else:
+                queryset = queryset.filter(created_at__lte=created_at).filter(
+                    models.Q(created_at__lt=created_at) | models.Q(pk__lt=pk)
+                )
+
+        ordering = ('created_at', 'pk') if reverse else ('-created_at', '-pk')
+        results = list(queryset.order_by(*ordering)[: page_size + 1])
+        has_following = len(results) > page_size
+        results = results[:page_size]
+
+        if reverse:
+            results.reverse()
+            has_next, has_previous = True, has_following
+        else:
+            has_next, has_previous = has_following, cursor is not None
+
+        self.next_position = self.get_position(results[-1]) if has_next and results else None
+        self.previous_position = self.get_position(results[0]) if has_previous and results else None
+
+        return results
+
+    def get_next_link(self) -> Optional[str]:
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position, reverse=False)
+
+    def get_previous_link(self) -> Optional[str]:
+        if self.previous_position is None:
+            return None
+        return self.encode_cursor(self.previous_position, reverse=True)
+
+    def get_paginated_response(self, data: Any) -> Response:
+        return Response(
+            OrderedDict(
+                [
+                    ('next', self.get_next_link()),
+                    ('previous', self.get_previous_link()),
+                    ('results', data),
+                ]
+            )
+        )
+
+    def get_paginated_response_schema(self, schema: dict) -> dict:
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view: Any) -> List[dict]:
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'The pagination cursor value.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Number of results to return per page.',
+                'schema': {'type': 'integer'},
+            },
+        ]
@@ -0,0 +1,116 @@
+import datetime
+import re
+from typing import List, NamedTuple, Optional
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+TRANSACTION_TABLE = 'budgets_transaction'
+DEFAULT_PARTITION = f'{TRANSACTION_TABLE}_default'
+PARTITION_NAME_RE = re.compile(rf'^{TRANSACTION_TABLE}_p(\d{{4}})_(\d{{2}})$')
+
+
+class Partition(NamedTuple):
+    name: str
+    start: datetime.datetime
+
+    @property
+    def end(self) -> datetime.datetime:
+        return add_months(self.start, 1)
+
+
+def month_start(value: datetime.datetime) -> datetime.datetime:
+    value = value.astimezone(datetime.timezone.utc)
+    return datetime.datetime(value.year, value.month, 1, tzinfo=datetime.timezone.utc)
+
+
+def add_months(month: datetime.datetime, months: int) -> datetime.datetime:
+    year, index = divmod(month.year * 12 + month.month - 1 + months, 12)
+    return month.replace(year=year, month=index + 1)
+
+
+def partition_name(month: datetime.datetime) -> str:
+    return f'{TRANSACTION_TABLE}_p{month:%Y_%m}'
+
+
+def list_partitions() -> List[Partition]:
+    """
+    Monthly partitions currently attached to the transaction table, oldest first. The default partition is skipped.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            '''
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = %s
+            ''',
+            [TRANSACTION_TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    partitions = []
+    for name in names:
+        match = PARTITION_NAME_RE.match(name)
+        if match:
+            start = datetime.datetime(int(match[1]), int(match[2]), 1, tzinfo=datetime.timezone.utc)
+            partitions.append(Partition(name, start))
+    return sorted(partitions, key=lambda partition: partition.start)
+
+
+def create_partition(month: datetime.datetime) -> Optional[Partition]:
+    """
+    Create the partition of the month starting at ``month`` unless it exists. Transactions of that month which landed
+    in the default partition are moved to it, the indexes and foreign keys are created when it is attached. Writes to
+    the default partition wait until the partition is attached, otherwise a transaction of the month inserted after
+    the move would make the attach fail.
+    """
+    partition = Partition(partition_name(month), month)
+    if partition in list_partitions():
+        return None
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {DEFAULT_PARTITION} IN SHARE ROW EXCLUSIVE MODE')
+        cursor.execute(
+            f'CREATE TABLE {partition.name} (LIKE {TRANSACTION_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+        )
+        cursor.execute(
+            f'''
+            WITH moved AS (
+                DELETE FROM {DEFAULT_PARTITION} WHERE created_at >= %(start)s AND created_at < %(end)s RETURNING *
+            )
+            INSERT INTO {partition.name} SELECT * FROM moved
+            ''',
+            {'start': partition.start, 'end': partition.end},
+        )
+        cursor.execute(
+            f'ALTER TABLE {TRANSACTION_TABLE} ATTACH PARTITION {partition.name} FOR VALUES FROM (%s) TO (%s)',
+            [partition.start, partition.end],
+        )
+    return partition
+
+
+def create_partitions_ahead(months: int) -> List[Partition]:
+    """
+    Make sure that partitions exist from the current month to ``months`` months ahead, return the created ones.
+    """
+    current = month_start(timezone.now())
+    created = (create_partition(add_months(current, offset)) for offset in range(months + 1))
+    return [partition for partition in created if partition]
+
+
+def detach_partitions(before: datetime.datetime, drop: bool = False) -> List[Partition]:
+    """
+    Detach partitions of months before ``before``. Detached tables are kept as archives unless ``drop`` is set.
+    """
+    detached = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        for partition in list_partitions():
+            if partition.end > before:
+                break
+            cursor.execute(f'ALTER TABLE {TRANSACTION_TABLE} DETACH PARTITION {partition.name}')
+            if drop:
+                cursor.execute(f'DROP TABLE {partition.name}')
+            detached.append(partition)
+    return detached
@@ -0,0 +1,73 @@
+import cProfile
+import json
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework.request import Request
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_QUERY_PARAM = 'profile'
+PROFILING_LOCK_KEY = 'budgets:profiling:lock'
+
+
+def profile_dir() -> Path:
+    return Path(settings.BUDGETS_PROFILE_DIR)
+
+
+class RequestProfiler:
+    def __init__(self) -> None:
+        self.profile = cProfile.Profile()
+        self.started = time.perf_counter()
+        self.profile.enable()
+
+    def save(self, request: Request, budget_id: Optional[int], status: int) -> str:
+        """
+        Stop profiling and store the stats next to a JSON file describing the request, return the profile name.
+        """
+        self.profile.disable()
+        duration = time.perf_counter() - self.started
+
+        created_at = timezone.now()
+        route = request.resolver_match.view_name if request.resolver_match else ''
+        name = f'{created_at:%Y%m%dT%H%M%S%f}-{route.replace(":", "-")}-{budget_id or "none"}'
+
+        directory = profile_dir()
+        directory.mkdir(parents=True, exist_ok=True)
+        self.profile.dump_stats(directory / f'{name}.prof')
+        metadata = {
+            'name': name,
+            'created_at': created_at.isoformat(),
+            'method': request.method,
+            'path': request.get_full_path(),
+            'route': route,
+            'budget_id': budget_id,
+            'user_id': request.user.pk,
+            'status': status,
+            'duration_ms': round(duration * 1000, 3),
+        }
+        (directory / f'{name}.json').write_text(json.dumps(metadata))
+        return name
+
+
+def start_profiling(request: Request) -> Optional[RequestProfiler]:
+    """
+    Start profiling the request if a staff user asked for it and no other request was profiled recently.
+    """
+    requested = request.headers.get(PROFILE_HEADER) or request.query_params.get(PROFILE_QUERY_PARAM)
+    if requested not in ('1', 'true') or not request.user.is_staff:
+        return None
+    if not cache.add(PROFILING_LOCK_KEY, 1, timeout=settings.BUDGETS_PROFILE_INTERVAL):
+        return None
+
+    return RequestProfiler()
+
+
+def list_profiles() -> List[dict]:
+    """
+    Metadata of the stored profiles, the newest first.
+    """
+    return [json.loads(path.read_text()) for path in sorted(profile_dir().glob('*.json'), reverse=True)]
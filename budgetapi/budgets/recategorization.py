@@ -0,0 +1,120 @@
+import multiprocessing
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from budgets.categorization import category_index, get_stemmer, text_stemming
+from budgets.models import Budget, Transaction, TransactionType
+from budgets.summaries import month_start, summary_cache_key
+from django.core.cache import cache
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+# categories of titles seen in previous chunks are remembered up to this many titles
+TITLE_CACHE_SIZE = 100000
+
+
+def save_categories(changes: Sequence[Tuple[int, Any, int, Optional[int]]]) -> None:
+    """
+    Set categories of transactions given as ``(id, created_at, budget_id, category_id)`` with a single statement and
+    clear their pending flag. The partition key is part of the join so that every row is found through the primary key
+    of its partition. The history of the budgets changes, so they are touched and their cached summaries of closed
+    months are dropped.
+    """
+    if not changes:
+        return
+    values = ', '.join(['(%s, %s::timestamptz, %s::integer)'] * len(changes))
+    current_month = month_start(timezone.now())
+    closed_months = [
+        summary_cache_key(budget_id, month_start(created_at))
+        for _, created_at, budget_id, _ in changes
+        if created_at < current_month
+    ]
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'''
+                UPDATE {Transaction._meta.db_table} AS existing
+                SET category_id = new.category_id, category_pending = FALSE
+                FROM (VALUES {values}) AS new (id, created_at, category_id)
+                WHERE existing.id = new.id AND existing.created_at = new.created_at
+                ''',
+                [value for change in changes for value in (change[0], change[1], change[3])],
+            )
+        Budget.objects.touch({budget_id for _, _, budget_id, _ in changes})
+        transaction.on_commit(lambda: cache.delete_many(list(set(closed_months))))
+
+
+class Recategorizer:
+    """
+    Applies the current categories to existing transfers in chunks ordered by id. Every unique title is stemmed once,
+    by a pool of ``workers`` processes, and only transactions whose category changes are updated.
+
+    With ``category_ids`` only changes from or to these categories are made. A title matches the category with the
+    lowest id, so transfers already in a category with a lower id than all of them cannot change and are skipped.
+    """
+
+    def __init__(self, workers: int, category_ids: Optional[List[int]] = None) -> None:
+        self.workers = workers
+        self.category_ids = set(category_ids or ())
+        self.title_categories: Dict[str, Optional[int]] = {}
+        self.checked = 0
+        self.stemmed = 0
+        self.updated = 0
+
+    def run(self, chunk_size: int, after_id: int = 0) -> Iterator[int]:
+        """
+        Re-categorize transfers with ids greater than ``after_id``, yield the id of the last transfer of every chunk
+        once its changes are committed.
+        """
+        # load the stemmer before forking so that the workers share it; they never touch the database
+        get_stemmer()
+        pool = multiprocessing.get_context('fork').Pool(self.workers) if self.workers > 1 else None
+        try:
+            while True:
+                rows = self.fetch(chunk_size, after_id)
+                if not rows:
+                    return
+                self.categorize_titles({row[3] for row in rows}, pool)
+                self.apply(rows)
+                after_id = rows[-1][0]
+                yield after_id
+        finally:
+            if pool is not None:
+                pool.terminate()
+
+    def fetch(self, chunk_size: int, after_id: int) -> List[Tuple[int, Any, int, str, Optional[int]]]:
+        queryset = Transaction.objects.filter(type=TransactionType.TRANSFER, id__gt=after_id)
+        if self.category_ids:
+            queryset = queryset.filter(
+                models.Q(category_id__isnull=True) | models.Q(category_id__gte=min(self.category_ids))
+            )
+        fields = ('id', 'created_at', 'budget_id', 'title', 'category_id')
+        return list(queryset.order_by('id').values_list(*fields)[:chunk_size])
+
+    def categorize_titles(self, titles: Set[str], pool: Any) -> None:
+        if len(self.title_categories) + len(titles) > TITLE_CACHE_SIZE:
+            self.title_categories = {}
+        missing = [title for title in titles if title not in self.title_categories]
+        if pool is None:
+            stems = [text_stemming(title) for title in missing]
+        else:
+            stems = pool.map(text_stemming, missing, chunksize=max(1, len(missing) // (self.workers * 4)))
+
+        for title, title_stems in zip(missing, stems):
+            category = category_index.match(title_stems)
+            self.title_categories[title] = category.pk if category else None
+        self.stemmed += len(missing)
+
+    def apply(self, rows: List[Tuple[int, Any, int, str, Optional[int]]]) -> None:
+        changes = []
+        for transaction_id, created_at, budget_id, title, category_id in rows:
+            new_category_id = self.title_categories[title]
+            if new_category_id == category_id:
+                continue
+            if self.category_ids and not {category_id, new_category_id} & self.category_ids:
+                continue
+            changes.append((transaction_id, created_at, budget_id, new_category_id))
+
+        save_categories(changes)
+        self.checked += len(rows)
+        self.updated += len(changes)
@@ -0,0 +1,30 @@
+from collections import OrderedDict
+from typing import Any, cast
+
+from djangorestframework_camel_case.render import CamelCaseJSONRenderer
+from djangorestframework_camel_case.settings import api_settings
+from djangorestframework_camel_case.util import camelize
+
+from budgetapi.metrics import timer
+
+
+class CamelizedList(list):
+    """
+    List of items that have camelCase keys already, the renderer outputs it as it is.
+    """
+
+
+def camelize_data(data: Any) -> Any:
+    if isinstance(data, CamelizedList):
+        return data
+    if isinstance(data, dict) and any(isinstance(value, CamelizedList) for value in data.values()):
+        # an envelope such as a page of results, only its own keys are converted
+        keys = camelize(OrderedDict.fromkeys(data), **api_settings.JSON_UNDERSCOREIZE)
+        return OrderedDict((key, camelize_data(value)) for key, value in zip(keys, data.values()))
+    return camelize(data, **api_settings.JSON_UNDERSCOREIZE)
+
+
+class FastCamelCaseJSONRenderer(CamelCaseJSONRenderer):
+    def render(self, data: Any, *args: Any, **kwargs: Any) -> bytes:
+        with timer('render'):
+            return cast(bytes, super(CamelCaseJSONRenderer, self).render(camelize_data(data), *args, **kwargs))
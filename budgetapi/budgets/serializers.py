@@ -1,11 +1,18 @@
+import datetime
 import decimal
-from typing import List, Optional, cast
-
-from budgets.models import Budget, Category, Transaction, TransactionType
+from typing import Any, Iterable, List, Sequence, cast
+
+from budgets.categorization import categorize_title
+from budgets.categorization_queue import enqueue_categorization
+from budgets.memberships import membership_cache
+from budgets.models import Budget, BudgetDailyBalance, Category, Transaction, TransactionType
+from budgets.renderers import CamelizedList
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.db import transaction
+from django.db import models, transaction
+from django.utils import timezone
 from rest_framework import serializers
-from stempel import StempelStemmer
+from rest_framework.exceptions import ErrorDetail
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -17,11 +24,11 @@ class UserSerializer(serializers.ModelSerializer):
 class BudgetSerializer(serializers.ModelSerializer):
     members = UserSerializer(many=True, read_only=True)
     creator = UserSerializer(read_only=True)
+    balance = serializers.DecimalField(max_digits=10, decimal_places=2, source='total_balance', read_only=True)
 
     class Meta:
         model = Budget
         fields = ('id', 'balance', 'members', 'creator')
-        read_only_fields = ('balance',)
 
     @transaction.atomic
     def create(self, validated_data: dict) -> Budget:
@@ -32,6 +39,16 @@ class BudgetSerializer(serializers.ModelSerializer):
         return cast(Budget, budget)
 
 
+class BudgetMemberCountSerializer(serializers.ModelSerializer):
+    creator = UserSerializer(read_only=True)
+    balance = serializers.DecimalField(max_digits=10, decimal_places=2, source='total_balance', read_only=True)
+    member_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Budget
+        fields = ('id', 'balance', 'member_count', 'creator')
+
+
 class BudgetAddMemberSerializer(serializers.Serializer):
     user = serializers.PrimaryKeyRelatedField(queryset=User.objects.all(), write_only=True)
 
@@ -43,6 +60,81 @@ class BudgetAddMemberSerializer(serializers.Serializer):
         return cast(Budget, budget)
 
 
+class MemberOutcome(models.TextChoices):
+    ADDED = 'added'
+    ALREADY_MEMBER = 'already_member'
+    REMOVED = 'removed'
+    NOT_MEMBER = 'not_member'
+    CREATOR = 'creator'
+    NOT_FOUND = 'not_found'
+
+
+class BudgetMemberOutcomeSerializer(serializers.Serializer):
+    user = serializers.IntegerField()
+    outcome = serializers.ChoiceField(choices=MemberOutcome.choices)
+
+
+class BudgetBulkMembersSerializer(serializers.Serializer):
+    add = serializers.ListField(child=serializers.IntegerField(), default=list, write_only=True)
+    remove = serializers.ListField(child=serializers.IntegerField(), default=list, write_only=True)
+    results = BudgetMemberOutcomeSerializer(many=True, read_only=True)
+
+    def validate(self, attrs: dict) -> dict:
+        max_size = settings.BUDGETS_BULK_MEMBERS_MAX_SIZE
+        if len(attrs['add']) + len(attrs['remove']) > max_size:
+            raise serializers.ValidationError(f'Ensure no more than {max_size} users are added and removed at once.')
+        if set(attrs['add']) & set(attrs['remove']):
+            raise serializers.ValidationError('The same user cannot be added and removed at once.')
+        return attrs
+
+    def create(self, validated_data: dict) -> List[dict]:
+        budget = self.context['budget']
+        add = list(dict.fromkeys(validated_data['add']))
+        remove = list(dict.fromkeys(validated_data['remove']))
+        through = Budget.members.through
+
+        with transaction.atomic():
+            existing = set(User.objects.filter(pk__in=add + remove).values_list('pk', flat=True))
+            members = set(
+                through.objects.filter(budget_id=budget.pk, user_id__in=existing).values_list('user_id', flat=True)
+            )
+
+            outcomes = {}
+            for user_id in add:
+                if user_id not in existing:
+                    outcomes[user_id] = MemberOutcome.NOT_FOUND
+                elif user_id in members:
+                    outcomes[user_id] = MemberOutcome.ALREADY_MEMBER
+                else:
+                    outcomes[user_id] = MemberOutcome.ADDED
+            for user_id in remove:
+                if user_id not in existing:
+                    outcomes[user_id] = MemberOutcome.NOT_FOUND
+                elif user_id == budget.creator_id:
+                    outcomes[user_id] = MemberOutcome.CREATOR
+                elif user_id not in members:
+                    outcomes[user_id] = MemberOutcome.NOT_MEMBER
+                else:
+                    outcomes[user_id] = MemberOutcome.REMOVED
+
+            added = [user_id for user_id in add if outcomes[user_id] == MemberOutcome.ADDED]
+            removed = [user_id for user_id in remove if outcomes[user_id] == MemberOutcome.REMOVED]
+            # the through table is written directly, so m2m_changed receivers do not run
+            through.objects.bulk_create(
+                (through(budget_id=budget.pk, user_id=user_id) for user_id in added), ignore_conflicts=True
+            )
+            through.objects.filter(budget_id=budget.pk, user_id__in=removed).delete()
+            changed = added + removed
+            if changed:
+                Budget.objects.touch([budget.pk])
+                transaction.on_commit(lambda: membership_cache.invalidate(changed))
+
+        return [{'user': user_id, 'outcome': outcome} for user_id, outcome in outcomes.items()]
+
+    def to_representation(self, instance: List[dict]) -> dict:
+        return {'results': BudgetMemberOutcomeSerializer(instance, many=True).data}
+
+
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         fields = ('id', 'name')
@@ -55,7 +147,86 @@ class TransactionSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Transaction
-        fields = ('id', 'creator', 'amount', 'title', 'created_at', 'type', 'category', 'current_balance')
+        fields = (
+            'id',
+            'creator',
+            'amount',
+            'title',
+            'created_at',
+            'type',
+            'category',
+            'category_pending',
+            'current_balance',
+        )
+
+
+class FastTransactionSerializer:
+    """
+    Read-only counterpart of TransactionSerializer for long lists. It formats rows of ``values_list(*fields)`` straight
+    into items with camelCase keys, skipping the field machinery and the renderer's key conversion.
+    """
+
+    fields = (
+        'id',
+        'creator_id',
+        'creator__username',
+        'creator__first_name',
+        'creator__last_name',
+        'amount',
+        'title',
+        'created_at',
+        'type',
+        'category_id',
+        'category__name',
+        'current_balance',
+        'category_pending',
+    )
+
+    def __init__(self, rows: Iterable[Sequence[Any]]) -> None:
+        self.rows = rows
+
+    @property
+    def data(self) -> CamelizedList:
+        tz = timezone.get_current_timezone()
+
+        def format_datetime(value: datetime.datetime) -> str:
+            # same output as serializers.DateTimeField
+            formatted = value.astimezone(tz).isoformat()
+            return formatted[:-6] + 'Z' if formatted.endswith('+00:00') else formatted
+
+        return CamelizedList(
+            {
+                'id': row[0],
+                'creator': {'id': row[1], 'username': row[2], 'firstName': row[3], 'lastName': row[4]},
+                'amount': f'{row[5]:f}',
+                'title': row[6],
+                'createdAt': format_datetime(row[7]),
+                'type': row[8],
+                'category': {'id': row[9], 'name': row[10]} if row[9] is not None else None,
+                'categoryPending': row[12],
+                'currentBalance': f'{row[11]:f}',
+            }
+            for row in self.rows
+        )
+
+
+class TransactionSummarySerializer(serializers.Serializer):
+    month = serializers.DateField(allow_null=True)
+    category = CategorySerializer(allow_null=True)
+    type = serializers.ChoiceField(choices=TransactionType.choices)
+    total = serializers.DecimalField(max_digits=12, decimal_places=2)
+    count = serializers.IntegerField()
+
+
+class BudgetDailyBalanceSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = BudgetDailyBalance
+        fields = ('date', 'opening_balance', 'closing_balance', 'inflow', 'outflow', 'count')
+
+
+class BudgetBalanceSerializer(serializers.Serializer):
+    date = serializers.DateField()
+    balance = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
 
 
 class TransactionSerializerMixin(serializers.ModelSerializer):
@@ -65,59 +236,48 @@ class TransactionSerializerMixin(serializers.ModelSerializer):
         return value
 
 
-stemmer = None
-
-
-def text_stemming(text: str) -> List[str]:
-    global stemmer
-
-    if stemmer is None:
-        stemmer = StempelStemmer.polimorf()
-
-    stems = []
-    for word in text.split():
-        stems.append(stemmer.stem(word))
-
-    return stems
-
-
-def categorize_title(title: str) -> Optional[Category]:
-    categories = Category.objects.all()
-    for category in categories:
-        category_tags = set(category.tags)
-        title_tags = set(text_stemming(title))
-
-        if category_tags & title_tags:
-            return category
-    return None
-
-
 class TransferSerializer(TransactionSerializerMixin):
     creator = UserSerializer(read_only=True)
     category = CategorySerializer(read_only=True)
 
     class Meta:
         model = Transaction
-        fields = ('id', 'creator', 'amount', 'title', 'created_at', 'type', 'category', 'current_balance')
-        read_only_fields = ('created_at', 'type', 'current_balance')
+        fields = (
+            'id',
+            'creator',
+            'amount',
+            'title',
+            'created_at',
+            'type',
+            'category',
+            'category_pending',
+            'current_balance',
+        )
+        read_only_fields = ('created_at', 'type', 'category_pending', 'current_balance')
         extra_kwargs = {'title': {'required': True}}
 
-    @transaction.atomic
     def create(self, validated_data: dict) -> Transaction:
-        budget = Budget.objects.filter(pk=self.context['budget'].pk).select_for_update().get()
-        budget.balance += validated_data['amount']
-        budget.save()
-        category = categorize_title(validated_data['title'])
-
-        data = {
-            **validated_data,
-            'creator': self.context['request'].user,
-            'budget': budget,
-            'category': category,
-            'type': TransactionType.TRANSFER,
-            'current_balance': budget.balance,
-        }
-        return cast(Transaction, super().create(data))
+        budget = self.context['budget']
+        deferred = settings.BUDGETS_DEFERRED_CATEGORIZATION
+        category = None if deferred else categorize_title(validated_data['title'])
+
+        with transaction.atomic():
+            budget.balance = Budget.objects.deposit(budget.pk, validated_data['amount'], budget.shard_count)
+
+            data = {
+                **validated_data,
+                'creator': self.context['request'].user,
+                'budget': budget,
+                'category': category,
+                'category_pending': deferred,
+                'type': TransactionType.TRANSFER,
+                'current_balance': budget.balance,
+            }
+            instance = cast(Transaction, super().create(data))
+            if deferred:
+                enqueue_categorization([instance])
+            BudgetDailyBalance.objects.record_transactions([instance])
+            return instance
 
 
 class WithdrawalSerializer(TransactionSerializerMixin):
@@ -126,20 +286,29 @@ class WithdrawalSerializer(TransactionSerializerMixin):
 
     class Meta:
         model = Transaction
-        fields = ('id', 'creator', 'amount', 'title', 'created_at', 'type', 'category', 'current_balance')
-        read_only_fields = ('created_at', 'type', 'title', 'current_balance')
+        fields = (
+            'id',
+            'creator',
+            'amount',
+            'title',
+            'created_at',
+            'type',
+            'category',
+            'category_pending',
+            'current_balance',
+        )
+        read_only_fields = ('created_at', 'type', 'title', 'category_pending', 'current_balance')
 
     @transaction.atomic
     def create(self, validated_data: dict) -> Transaction:
-        budget = Budget.objects.filter(pk=self.context['budget'].pk).select_for_update().get()
+        budget = self.context['budget']
 
-        amount = validated_data['amount']
+        balance = Budget.objects.withdraw(budget.pk, validated_data['amount'])
 
-        if amount > budget.balance:
+        if balance is None:
             raise serializers.ValidationError('Not enough funds in budget.')
 
-        budget.balance -= amount
-        budget.save()
+        budget.balance = balance
 
         data = {
             **validated_data,
@@ -149,4 +318,87 @@ class WithdrawalSerializer(TransactionSerializerMixin):
             'title': 'Withdrawal',
             'current_balance': budget.balance,
         }
-        return cast(Transaction, super().create(data))
+        instance = cast(Transaction, super().create(data))
+        BudgetDailyBalance.objects.record_transactions([instance])
+        return instance
+
+
+class TransactionBatchItemSerializer(TransactionSerializerMixin):
+    class Meta:
+        model = Transaction
+        fields = ('type', 'amount', 'title')
+
+    def validate(self, attrs: dict) -> dict:
+        if attrs['type'] == TransactionType.TRANSFER and not attrs.get('title'):
+            raise serializers.ValidationError(
+                {'title': [ErrorDetail(self.fields['title'].error_messages['required'], code='required')]}
+            )
+        return attrs
+
+
+class TransactionBatchSerializer(serializers.Serializer):
+    transactions = TransactionBatchItemSerializer(many=True, allow_empty=False, write_only=True)
+    results = TransactionSerializer(many=True, read_only=True)
+
+    def validate_transactions(self, value: List[dict]) -> List[dict]:
+        max_size = settings.BUDGETS_BATCH_MAX_SIZE
+        if len(value) > max_size:
+            raise serializers.ValidationError(f'Ensure this field has no more than {max_size} elements.')
+        return value
+
+    def create(self, validated_data: dict) -> List[Transaction]:
+        budget = self.context['budget']
+        creator = self.context['request'].user
+        items = validated_data['transactions']
+        deferred = settings.BUDGETS_DEFERRED_CATEGORIZATION
+        categories = [
+            categorize_title(item['title']) if item['type'] == TransactionType.TRANSFER and not deferred else None
+            for item in items
+        ]
+
+        with transaction.atomic():
+            budget.balance = Budget.objects.lock_balance(budget.pk)
+
+            transactions = []
+            errors: List[dict] = []
+            for item, category in zip(items, categories):
+                amount = item['amount']
+                title = item.get('title', '')
+
+                if item['type'] == TransactionType.WITHDRAWAL:
+                    if amount > budget.balance:
+                        errors.append({'amount': [ErrorDetail('Not enough funds in budget.', code='invalid')]})
+                        continue
+                    budget.balance -= amount
+                    title = 'Withdrawal'
+                else:
+                    budget.balance += amount
+
+                errors.append({})
+                transactions.append(
+                    Transaction(
+                        creator=creator,
+                        budget=budget,
+                        amount=amount,
+                        title=title,
+                        category=category,
+                        category_pending=deferred and item['type'] == TransactionType.TRANSFER,
+                        type=item['type'],
+                        current_balance=budget.balance,
+                    )
+                )
+
+            if any(errors):
+                raise serializers.ValidationError({'transactions': errors})
+
+            Budget.objects.filter(pk=budget.pk).update(
+                balance=budget.balance, version=models.F('version') + 1, modified_at=timezone.now()
+            )
+            transactions = Transaction.objects.bulk_create(transactions)
+            if deferred:
+                enqueue_categorization(transactions)
+            BudgetDailyBalance.objects.record_transactions(transactions)
+            return transactions
+
+    def to_representation(self, instance: List[Transaction]) -> dict:
+        return {'results': TransactionSerializer(instance, many=True).data}
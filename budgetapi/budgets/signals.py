@@ -0,0 +1,99 @@
+from typing import Any, FrozenSet, Optional, Set
+
+from budgets.categorization import category_index
+from budgets.memberships import membership_cache
+from budgets.models import Budget, Category, Transaction
+from budgets.summaries import month_start, summary_cache_key
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+
+@receiver(post_save, sender=Category)
+def update_category_index(sender: Any, instance: Category, **kwargs: Any) -> None:
+    transaction.on_commit(lambda: category_index.update(instance))
+
+
+@receiver(post_delete, sender=Category)
+def remove_from_category_index(sender: Any, instance: Category, **kwargs: Any) -> None:
+    category_id = instance.pk
+    transaction.on_commit(lambda: category_index.remove(category_id))
+
+
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+def invalidate_closed_month_summary(sender: Any, instance: Transaction, **kwargs: Any) -> None:
+    # new transactions always land in the current month, only edits of history touch closed months
+    if instance.created_at and instance.created_at < month_start(timezone.now()):
+        key = summary_cache_key(instance.budget_id, month_start(instance.created_at))
+        transaction.on_commit(lambda: cache.delete(key))
+
+
+@receiver(m2m_changed, sender=Budget.members.through)
+def invalidate_membership_cache(
+    sender: Any, instance: Any, action: str, reverse: bool, pk_set: Optional[Set[int]], **kwargs: Any
+) -> None:
+    if reverse:
+        # the user's memberships are changed, pk_set holds budgets
+        user_ids = [instance.pk] if action in ('post_add', 'post_remove', 'post_clear') else []
+    elif action == 'pre_clear':
+        user_ids = list(instance.members.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        user_ids = list(pk_set or ())
+    else:
+        user_ids = []
+
+    if user_ids:
+        transaction.on_commit(lambda: membership_cache.invalidate(user_ids))
+
+
+@receiver(m2m_changed, sender=Budget.members.through)
+def touch_budgets_on_members_change(
+    sender: Any, instance: Any, action: str, reverse: bool, pk_set: Optional[Set[int]], **kwargs: Any
+) -> None:
+    if not reverse:
+        budget_ids = [instance.pk] if action in ('post_add', 'post_remove', 'post_clear') else []
+    elif action == 'pre_clear':
+        budget_ids = list(instance.budget_set.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        budget_ids = list(pk_set or ())
+    else:
+        budget_ids = []
+
+    if budget_ids:
+        Budget.objects.touch(budget_ids)
+
+
+@receiver(post_save, sender=Transaction)
+def touch_budget_on_history_change(sender: Any, instance: Transaction, created: bool, **kwargs: Any) -> None:
+    # serializers bump the version together with the balance when creating transactions
+    if not created:
+        Budget.objects.touch([instance.budget_id])
+
+
+@receiver(post_save, sender=Category)
+def touch_budgets_on_category_change(sender: Any, instance: Category, created: bool, **kwargs: Any) -> None:
+    # transaction lists show category names, so their ETags must change with them
+    if not created:
+        Budget.objects.touch(Transaction.objects.filter(category=instance).values_list('budget_id', flat=True))
+
+
+@receiver(pre_delete, sender=Category)
+def touch_budgets_on_category_delete(sender: Any, instance: Category, **kwargs: Any) -> None:
+    # transactions of the category are deleted with it
+    Budget.objects.touch(Transaction.objects.filter(category=instance).values_list('budget_id', flat=True))
+
+
+@receiver(post_save, sender=User)
+def touch_budgets_on_user_change(
+    sender: Any, instance: User, created: bool, update_fields: Optional[FrozenSet[str]], **kwargs: Any
+) -> None:
+    # budget details show names of members and transaction lists names of creators, logins change neither
+    if created or (update_fields is not None and not update_fields & {'username', 'first_name', 'last_name'}):
+        return
+    Budget.objects.touch(Budget.objects.filter(Q(members=instance) | Q(creator=instance)).values_list('pk', flat=True))
+    Budget.objects.touch(Transaction.objects.filter(creator=instance).values_list('budget_id', flat=True))
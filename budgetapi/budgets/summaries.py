@@ -0,0 +1,155 @@
+import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from budgets.models import Transaction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+SummaryKey = Tuple[Optional[datetime.datetime], Optional[int], str]
+
+BALANCE_BUCKETS: Dict[str, Callable[[datetime.date], datetime.date]] = {
+    'day': lambda date: date,
+    'week': lambda date: date - datetime.timedelta(days=date.weekday()),
+    'month': lambda date: date.replace(day=1),
+}
+
+
+def month_start(value: datetime.datetime) -> datetime.datetime:
+    value = timezone.localtime(value)
+    return timezone.make_aware(datetime.datetime(value.year, value.month, 1))
+
+
+def next_month(value: datetime.datetime) -> datetime.datetime:
+    return month_start(value + datetime.timedelta(days=32))
+
+
+def summary_cache_key(budget_id: int, month: datetime.datetime) -> str:
+    return f'budgets:summary:{budget_id}:{month:%Y-%m}'
+
+
+def aggregate(queryset: models.QuerySet, by_month: bool) -> List[Dict[str, Any]]:
+    fields = ['category_id', 'category__name', 'type']
+    if by_month:
+        queryset = queryset.annotate(month=TruncMonth('created_at'))
+        fields.insert(0, 'month')
+    return list(queryset.order_by().values(*fields).annotate(total=models.Sum('amount'), count=models.Count('id')))
+
+
+def get_closed_month_rollups(
+    budget_id: int, months: List[datetime.datetime]
+) -> Dict[datetime.datetime, List[Dict[str, Any]]]:
+    """
+    Return per month aggregates of closed months. Closed months change only through edits of history, which drop their
+    rollups, so the rollups are computed once and then served from the cache for ``BUDGETS_SUMMARY_CACHE_TIMEOUT``.
+    """
+    keys = {summary_cache_key(budget_id, month): month for month in months}
+    rollups = {keys[key]: rows for key, rows in cache.get_many(list(keys)).items()}
+
+    missing = [month for month in months if month not in rollups]
+    if missing:
+        computed: Dict[datetime.datetime, List[Dict[str, Any]]] = {month: [] for month in missing}
+        queryset = Transaction.objects.filter(
+            budget_id=budget_id, created_at__gte=missing[0], created_at__lt=next_month(missing[-1])
+        )
+        for row in aggregate(queryset, by_month=True):
+            month = row.pop('month')
+            if month in computed:
+                computed[month].append(row)
+
+        cache.set_many(
+            {summary_cache_key(budget_id, month): rows for month, rows in computed.items()},
+            timeout=settings.BUDGETS_SUMMARY_CACHE_TIMEOUT,
+        )
+        rollups.update(computed)
+
+    return rollups
+
+
+def get_summary(
+    budget_id: int,
+    after: Optional[datetime.datetime] = None,
+    before: Optional[datetime.datetime] = None,
+    by_month: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Return totals of budget transactions grouped by category and type, and optionally by month. Months of the range
+    which are fully covered and already closed come from cached rollups, only the remaining edges are aggregated live.
+    """
+    queryset = Transaction.objects.filter(budget_id=budget_id)
+
+    if after is None:
+        first_created_at = queryset.order_by('created_at').values_list('created_at', flat=True).first()
+        if first_created_at is None:
+            return []
+        after = month_start(first_created_at)
+
+    first_month = month_start(after)
+    if first_month < after:
+        first_month = next_month(first_month)
+    # transactions created just before the end of a month may still be committing, so it is not closed right away
+    end = month_start(timezone.now() - datetime.timedelta(seconds=settings.BUDGETS_SUMMARY_CLOSE_DELAY))
+    if before is not None:
+        end = min(end, month_start(before + datetime.timedelta(microseconds=1)))
+
+    months = []
+    month = first_month
+    while month < end:
+        months.append(month)
+        month = next_month(month)
+
+    live = queryset.filter(created_at__gte=after)
+    if before is not None:
+        live = live.filter(created_at__lte=before)
+    if months:
+        live = live.exclude(created_at__gte=months[0], created_at__lt=end)
+
+    totals: Dict[SummaryKey, Dict[str, Any]] = {}
+
+    def add(row: Dict[str, Any], month: Optional[datetime.datetime]) -> None:
+        key = (month if by_month else None, row['category_id'], row['type'])
+        if key not in totals:
+            totals[key] = {
+                'month': timezone.localtime(month).date() if by_month and month else None,
+                'category': {'id': row['category_id'], 'name': row['category__name']} if row['category_id'] else None,
+                'type': row['type'],
+                'total': 0,
+                'count': 0,
+            }
+        totals[key]['total'] += row['total']
+        totals[key]['count'] += row['count']
+
+    for month, rows in get_closed_month_rollups(budget_id, months).items():
+        for row in rows:
+            add(row, month)
+    for row in aggregate(live, by_month):
+        add(row, row.get('month'))
+
+    def sort_key(key: SummaryKey) -> Tuple[Any, ...]:
+        month, category_id, transaction_type = key
+        return month is not None, month, category_id is not None, category_id, transaction_type
+
+    return [totals[key] for key in sorted(totals, key=sort_key)]
+
+
+def downsample_daily_balances(days: Iterable[Dict[str, Any]], bucket: str) -> List[Dict[str, Any]]:
+    """
+    Merge daily balance snapshots, ordered by date, into week or month buckets.
+    """
+    truncate = BALANCE_BUCKETS[bucket]
+    buckets: Dict[datetime.date, Dict[str, Any]] = {}
+
+    for day in days:
+        date = truncate(day['date'])
+        current = buckets.get(date)
+        if current is None:
+            buckets[date] = {**day, 'date': date}
+        else:
+            current['closing_balance'] = day['closing_balance']
+            current['inflow'] += day['inflow']
+            current['outflow'] += day['outflow']
+            current['count'] += day['count']
+
+    return list(buckets.values())
@@ -0,0 +1,376 @@
+import datetime
+import io
+import multiprocessing
+import random
+from functools import partial
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+from budgets.bulk_load import defer_indexes
+from budgets.models import Budget, BudgetDailyBalance, Category, Transaction, TransactionType
+from budgets.partitions import add_months, create_partition, month_start
+from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.db import connection, connections, models, transaction
+from django.utils import timezone
+from faker import Faker
+
+WITHDRAWAL_PROBABILITY = 0.4
+UNCATEGORIZED_PROBABILITY = 0.2
+# amounts in cents are log-normally distributed with a median of about 18.00
+AMOUNT_MU = 7.5
+AMOUNT_SIGMA = 1.0
+MAX_AMOUNT = 10_000_00
+MAX_BALANCE = 99_999_999_99
+VOCABULARY_SIZE = 300
+TAGS_PER_CATEGORY = 5
+
+
+class DatasetSpec(NamedTuple):
+    seed: int
+    users: int
+    budgets: int
+    categories: int
+    transactions: int
+    hot_budgets: int
+    hot_share: float
+    skew: float
+    max_members: int
+    start: datetime.datetime
+    end: datetime.datetime
+
+
+class Offsets(NamedTuple):
+    """
+    Largest ids of existing rows, generated rows get the following ones.
+    """
+
+    user: int
+    budget: int
+    category: int
+    transaction: int
+
+
+class Vocabulary(NamedTuple):
+    words: List[str]
+    tags: List[List[str]]
+    first_names: List[str]
+    last_names: List[str]
+
+
+class Task(NamedTuple):
+    first_budget: int
+    counts: List[int]
+    first_transaction: int
+
+
+def split_total(total: int, weights: Sequence[float]) -> List[int]:
+    """
+    Split ``total`` proportionally to the weights, remainders go to the largest fractions.
+    """
+    if not weights:
+        return []
+    weights_sum = sum(weights)
+    shares = [total * weight / weights_sum for weight in weights]
+    counts = [int(share) for share in shares]
+    by_fraction = sorted(range(len(shares)), key=lambda index: counts[index] - shares[index])
+    for index in by_fraction[: total - sum(counts)]:
+        counts[index] += 1
+    return counts
+
+
+def transaction_counts(spec: DatasetSpec) -> List[int]:
+    """
+    Number of transactions of every budget. The first ``hot_budgets`` budgets share ``hot_share`` of all transactions,
+    sizes of the others follow Zipf's law with the ``skew`` exponent in a random order.
+    """
+    hot_budgets = min(spec.hot_budgets, spec.budgets)
+    hot_total = round(spec.transactions * spec.hot_share) if hot_budgets < spec.budgets else spec.transactions
+    if not hot_budgets:
+        hot_total = 0
+
+    weights = [1 / rank ** spec.skew for rank in range(1, spec.budgets - hot_budgets + 1)]
+    random.Random(spec.seed).shuffle(weights)
+    return split_total(hot_total, [1] * hot_budgets) + split_total(spec.transactions - hot_total, weights)
+
+
+def plan_tasks(counts: List[int], batch_size: int) -> List[Task]:
+    """
+    Group consecutive budgets into tasks of about ``batch_size`` transactions or budgets.
+    """
+    tasks = []
+    first_budget = first_transaction = rows = 0
+    for end, count in enumerate(counts, start=1):
+        rows += count
+        if rows >= batch_size or end - first_budget >= batch_size or end == len(counts):
+            tasks.append(Task(first_budget, counts[first_budget:end], first_transaction))
+            first_budget, first_transaction, rows = end, first_transaction + rows, 0
+    return tasks
+
+
+def build_vocabulary(spec: DatasetSpec) -> Vocabulary:
+    faker = Faker('pl_PL')
+    faker.seed_instance(spec.seed)
+    words = faker.words(VOCABULARY_SIZE, unique=True)
+    rng = random.Random(spec.seed)
+    return Vocabulary(
+        words=words,
+        tags=[rng.sample(words, TAGS_PER_CATEGORY) for _ in range(spec.categories)],
+        first_names=[faker.first_name() for _ in range(100)],
+        last_names=[faker.last_name() for _ in range(100)],
+    )
+
+
+def cents(value: int) -> str:
+    return f'{value // 100}.{value % 100:02d}'
+
+
+def copy_rows(model: Any, columns: Sequence[str], rows: List[str]) -> None:
+    if not rows:
+        return
+    with connection.cursor() as cursor:
+        cursor.copy_expert(f'COPY {model._meta.db_table} ({", ".join(columns)}) FROM STDIN', io.StringIO(''.join(rows)))
+    rows.clear()
+
+
+class BudgetsWriter:
+    """
+    Generates budgets of a task with their members, transactions and daily balance snapshots and copies them in
+    batches. Every budget has its own random generator seeded with its index, so the dataset does not depend on how it
+    is split between workers.
+    """
+
+    def __init__(self, spec: DatasetSpec, offsets: Offsets, vocabulary: Vocabulary, batch_size: int) -> None:
+        self.spec = spec
+        self.offsets = offsets
+        self.vocabulary = vocabulary
+        self.batch_size = batch_size
+        self.time_zone = timezone.get_default_timezone()
+        self.budgets: List[str] = []
+        self.members: List[str] = []
+        self.transactions: List[str] = []
+        self.snapshots: List[str] = []
+        self.counts = {'budgets': 0, 'members': 0, 'transactions': 0, 'snapshots': 0}
+
+    def write(self, task: Task) -> Dict[str, int]:
+        with transaction.atomic():
+            transaction_id = self.offsets.transaction + task.first_transaction
+            for index, count in enumerate(task.counts, start=task.first_budget):
+                self.add_budget(index, count, transaction_id)
+                transaction_id += count
+            self.flush()
+        return self.counts
+
+    def flush(self) -> None:
+        for name, rows in (
+            ('budgets', self.budgets),
+            ('members', self.members),
+            ('transactions', self.transactions),
+            ('snapshots', self.snapshots),
+        ):
+            self.counts[name] += len(rows)
+        copy_rows(
+            Budget, ('id', 'balance', 'created_at', 'creator_id', 'shard_count', 'modified_at', 'version'), self.budgets
+        )
+        copy_rows(Budget.members.through, ('budget_id', 'user_id'), self.members)
+        copy_rows(
+            Transaction,
+            (
+                'id',
+                'budget_id',
+                'creator_id',
+                'amount',
+                'created_at',
+                'title',
+                'category_id',
+                'type',
+                'current_balance',
+                'category_pending',
+            ),
+            self.transactions,
+        )
+        copy_rows(
+            BudgetDailyBalance,
+            ('budget_id', 'date', 'opening_balance', 'closing_balance', 'inflow', 'outflow', 'count'),
+            self.snapshots,
+        )
+
+    def add_budget(self, index: int, count: int, first_transaction_id: int) -> None:
+        spec, vocabulary = self.spec, self.vocabulary
+        rng = random.Random(f'{spec.seed}:{index}')
+        budget_id = self.offsets.budget + index + 1
+        hot = index < spec.hot_budgets
+
+        size = spec.max_members if hot else min(spec.max_members, 1 + int(rng.expovariate(1.0)))
+        members = list(dict.fromkeys(rng.sample(range(spec.users), min(size, spec.users))))
+        creator_id = self.offsets.user + members[0] + 1
+        member_ids = [self.offsets.user + member + 1 for member in members]
+        self.members.extend(f'{budget_id}\t{member_id}\n' for member_id in member_ids)
+
+        start, end = spec.start.timestamp(), spec.end.timestamp()
+        # hot budgets are as old as the dataset and most active recently, others are created at random times
+        created_at = start if hot else start + (end - start) * rng.random() * 0.9
+        timestamps = sorted(
+            created_at + (end - created_at) * (rng.random() ** 0.5 if hot else rng.random()) for _ in range(count)
+        )
+
+        balance = 0
+        day: Optional[List[Any]] = None
+        for transaction_id, timestamp in enumerate(timestamps, start=first_transaction_id + 1):
+            amount = min(MAX_AMOUNT, max(1, int(rng.lognormvariate(AMOUNT_MU, AMOUNT_SIGMA))))
+            withdrawal = amount <= balance and (rng.random() < WITHDRAWAL_PROBABILITY or balance + amount > MAX_BALANCE)
+            opening_balance = balance
+            balance += -amount if withdrawal else amount
+
+            if not spec.categories or rng.random() < UNCATEGORIZED_PROBABILITY:
+                category_id = '\\N'
+                title = f'{rng.choice(vocabulary.words)} {rng.choice(vocabulary.words)}'
+            else:
+                category = rng.randrange(spec.categories)
+                category_id = str(self.offsets.category + category + 1)
+                title = f'{rng.choice(vocabulary.tags[category])} {rng.choice(vocabulary.words)}'
+
+            moment = datetime.datetime.fromtimestamp(timestamp, self.time_zone)
+            self.transactions.append(
+                f'{transaction_id}\t{budget_id}\t{rng.choice(member_ids)}\t{cents(amount)}\t{moment.isoformat()}\t'
+                f'{title}\t{category_id}\t'
+                f'{TransactionType.WITHDRAWAL if withdrawal else TransactionType.TRANSFER}\t{cents(balance)}\tf\n'
+            )
+
+            date = moment.date()
+            if day is None or day[0] != date:
+                self.add_snapshot(budget_id, day)
+                day = [date, opening_balance, balance, 0, 0, 0]
+            day[2] = balance
+            day[4 if withdrawal else 3] += amount
+            day[5] += 1
+
+            if len(self.transactions) >= self.batch_size:
+                self.flush()
+        self.add_snapshot(budget_id, day)
+
+        last_change = datetime.datetime.fromtimestamp(timestamps[-1] if timestamps else created_at, self.time_zone)
+        self.budgets.append(
+            f'{budget_id}\t{cents(balance)}\t'
+            f'{datetime.datetime.fromtimestamp(created_at, self.time_zone).isoformat()}\t{creator_id}\t1\t'
+            f'{last_change.isoformat()}\t{count}\n'
+        )
+
+    def add_snapshot(self, budget_id: int, day: Optional[List[Any]]) -> None:
+        if day is not None:
+            date, opening_balance, closing_balance, inflow, outflow, count = day
+            self.snapshots.append(
+                f'{budget_id}\t{date}\t{cents(opening_balance)}\t{cents(closing_balance)}\t{cents(inflow)}\t'
+                f'{cents(outflow)}\t{count}\n'
+            )
+
+
+def write_budgets(
+    spec: DatasetSpec, offsets: Offsets, vocabulary: Vocabulary, batch_size: int, task: Task
+) -> Dict[str, int]:
+    return BudgetsWriter(spec, offsets, vocabulary, batch_size).write(task)
+
+
+def write_budgets_in_worker(*args: Any) -> Dict[str, int]:
+    try:
+        return write_budgets(*args)
+    finally:
+        connection.close()
+
+
+def get_offsets() -> Offsets:
+    return Offsets(
+        user=User.objects.aggregate(id=models.Max('id'))['id'] or 0,
+        budget=Budget.objects.aggregate(id=models.Max('id'))['id'] or 0,
+        category=Category.objects.aggregate(id=models.Max('id'))['id'] or 0,
+        transaction=Transaction.objects.aggregate(id=models.Max('id'))['id'] or 0,
+    )
+
+
+def write_users_and_categories(spec: DatasetSpec, offsets: Offsets, vocabulary: Vocabulary) -> None:
+    rng = random.Random(spec.seed)
+    date_joined = spec.start.isoformat()
+    users = []
+    for index in range(1, spec.users + 1):
+        user_id = offsets.user + index
+        users.append(
+            f'{user_id}\t!\tf\tsynthetic-{user_id}\t{rng.choice(vocabulary.first_names)}\t'
+            f'{rng.choice(vocabulary.last_names)}\tsynthetic-{user_id}@example.com\tf\tt\t{date_joined}\n'
+        )
+    copy_rows(
+        User,
+        (
+            'id',
+            'password',
+            'is_superuser',
+            'username',
+            'first_name',
+            'last_name',
+            'email',
+            'is_staff',
+            'is_active',
+            'date_joined',
+        ),
+        users,
+    )
+
+    categories = [
+        f'{offsets.category + index + 1}\t{tags[0]}\t{{{",".join(tags)}}}\n'
+        for index, tags in enumerate(vocabulary.tags)
+    ]
+    copy_rows(Category, ('id', 'name', 'tags'), categories)
+
+
+def generate_dataset(spec: DatasetSpec, workers: int, batch_size: int) -> Dict[str, int]:
+    """
+    Generate the dataset and return the number of rows of every kind. Users and categories are written first, then
+    budgets with their members, transactions and snapshots by ``workers`` processes, each batch in its own
+    transaction.
+    """
+    offsets = get_offsets()
+    vocabulary = build_vocabulary(spec)
+    tasks = plan_tasks(transaction_counts(spec), batch_size)
+
+    with transaction.atomic():
+        write_users_and_categories(spec, offsets, vocabulary)
+    month = month_start(spec.start)
+    while month <= spec.end:
+        create_partition(month)
+        month = add_months(month, 1)
+
+    tables = [
+        Budget._meta.db_table,
+        Budget.members.through._meta.db_table,
+        Transaction._meta.db_table,
+        BudgetDailyBalance._meta.db_table,
+    ]
+    with transaction.atomic(), connection.cursor() as cursor:
+        restore_sql = [sql for table in tables for sql in defer_indexes(cursor, table)]
+
+    counts = {'users': spec.users, 'categories': spec.categories}
+    write = partial(write_budgets, spec, offsets, vocabulary, batch_size)
+    try:
+        if workers > 1:
+            connections.close_all()
+            with multiprocessing.get_context('fork').Pool(workers) as pool:
+                results = list(
+                    pool.imap_unordered(partial(write_budgets_in_worker, spec, offsets, vocabulary, batch_size), tasks)
+                )
+        else:
+            results = [write(task) for task in tasks]
+    finally:
+        with transaction.atomic(), connection.cursor() as cursor:
+            for sql in restore_sql:
+                cursor.execute(sql)
+
+    for result in results:
+        for name, count in result.items():
+            counts[name] = counts.get(name, 0) + count
+
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(
+            no_style(), [User, Category, Budget, Budget.members.through, Transaction, BudgetDailyBalance]
+        ):
+            cursor.execute(sql)
+        for table in [User._meta.db_table, Category._meta.db_table, *tables]:
+            cursor.execute(f'ANALYZE {table}')
+    return counts
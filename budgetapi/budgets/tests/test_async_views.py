@@ -0,0 +1,122 @@
+import datetime
+import threading
+from unittest import mock
+
+import pytz
+from asgiref.sync import AsyncToSync, sync_to_async
+from budgets.async_views import AsyncAPIView, AsyncBudgetRetrieveView
+from budgets.factories import BudgetFactory, TransactionFactory, UserFactory
+from budgets.serializers import BudgetSerializer, TransactionSerializer
+from django.test import SimpleTestCase, TransactionTestCase
+from django.urls import reverse
+from djangorestframework_camel_case.util import camelize
+
+
+# database work of the views runs in the thread pool with its own connections, so the test data has to be committed
+class AsyncBudgetRetrieveViewTest(TransactionTestCase):
+    def setUp(self):
+        self.user = UserFactory(is_active=True)
+        self.stranger = UserFactory(is_active=True)
+        self.budget = BudgetFactory(creator=self.user, members=(self.user,))
+        self.budget_data = camelize(BudgetSerializer(self.budget).data)
+        self.url = reverse('budgets-async:budget-details', kwargs=dict(pk=self.budget.pk))
+
+    async def test_cannot_retrieve_budget_as_unauthenticated_user(self):
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, 403)
+        self.assertDictEqual(response.json(), {'detail': 'Authentication credentials were not provided.'})
+
+    async def test_cannot_retrieve_someone_else_budget(self):
+        await sync_to_async(self.async_client.force_login)(self.stranger)
+
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, 404)
+        self.assertDictEqual(response.json(), {'detail': 'Not found.'})
+
+    async def test_retrieve_budget(self):
+        await sync_to_async(self.async_client.force_login)(self.user)
+
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertDictEqual(response.json(), self.budget_data)
+
+    async def test_request_does_not_leave_event_loop(self):
+        await sync_to_async(self.async_client.force_login)(self.user)
+        loop_thread = threading.get_ident()
+        threads = {}
+        get_budget, render = AsyncBudgetRetrieveView.get_budget, AsyncBudgetRetrieveView.render
+
+        def record_get_budget(*args):
+            threads['get_budget'] = threading.get_ident()
+            return get_budget(*args)
+
+        def record_render(view, *args, **kwargs):
+            threads['render'] = threading.get_ident()
+            return render(view, *args, **kwargs)
+
+        # a sync middleware or view in the chain would be called through async_to_sync
+        with mock.patch.object(AsyncToSync, '__call__', side_effect=AssertionError('The request left the event loop')):
+            with mock.patch.object(AsyncBudgetRetrieveView, 'get_budget', staticmethod(record_get_budget)):
+                with mock.patch.object(AsyncBudgetRetrieveView, 'render', record_render):
+                    response = await self.async_client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(threads['render'], loop_thread)
+        # not the thread shared by sync code of all requests either
+        self.assertNotIn(threads['get_budget'], (loop_thread, threading.main_thread().ident))
+
+
+class AsyncTransactionListViewTest(TransactionTestCase):
+    def setUp(self):
+        self.member = UserFactory(is_active=True)
+        self.stranger = UserFactory(is_active=True)
+        self.budget = BudgetFactory(members=(self.member,))
+        self.transactions = [
+            TransactionFactory(
+                budget=self.budget, creator=self.member, created_at=datetime.datetime(2021, 5, day, tzinfo=pytz.UTC)
+            )
+            for day in (1, 2, 3)
+        ]
+        TransactionFactory()
+        self.url = reverse('budgets-async:transactions', kwargs=dict(pk=self.budget.pk))
+
+    async def test_cannot_get_transaction_list_as_unauthenticated_user(self):
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, 403)
+
+    async def test_cannot_get_transaction_list_from_someone_else_budget(self):
+        await sync_to_async(self.async_client.force_login)(self.stranger)
+
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, 404)
+        self.assertDictEqual(response.json(), {'detail': 'Not found.'})
+
+    async def test_get_transaction_list(self):
+        await sync_to_async(self.async_client.force_login)(self.member)
+
+        response = await self.async_client.get(f'{self.url}?page_size=2')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['results'], camelize(TransactionSerializer(self.transactions[:0:-1], many=True).data))
+        self.assertIsNone(data['previous'])
+
+        response = await self.async_client.get(data['next'])
+        self.assertEqual(
+            response.json()['results'], camelize(TransactionSerializer(self.transactions[:1], many=True).data)
+        )
+
+    async def test_filter_transaction_list(self):
+        await sync_to_async(self.async_client.force_login)(self.member)
+
+        response = await self.async_client.get(f'{self.url}?created_at_after=2021-05-02T00:00:00Z')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 2)
+
+        response = await self.async_client.get(f'{self.url}?created_at_after=invalid')
+        self.assertEqual(response.status_code, 400)
+
+
+class AsyncAPIViewTest(SimpleTestCase):
+    def test_get_data_is_abstract(self):
+        with self.assertRaises(TypeError):
+            AsyncAPIView()
@@ -0,0 +1,108 @@
+import datetime
+import json
+
+from budgets import urls
+from budgets.categorization import category_index
+from budgets.factories import BudgetFactory, TransactionFactory, UserFactory
+from budgets.management.commands.bench_endpoints import (
+    DEFAULT_BASELINE,
+    Command,
+    Target,
+    benchmark_endpoint,
+    find_regressions,
+    get_endpoints,
+    get_path,
+)
+from budgets.memberships import membership_cache
+from django.core.cache import cache
+from django.test import Client, TestCase, TransactionTestCase
+from django.urls import reverse
+
+BASELINE = {
+    '1000': {
+        'GET transactions': {'p50_ms': 10.0, 'p99_ms': 20.0, 'queries': 5, 'peak_kib': 100.0},
+        'concurrent transfers': {'p50_ms': 30.0, 'p99_ms': 60.0, 'transfers_per_s': 100.0},
+    },
+}
+
+
+class BenchEndpointsTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory(is_active=True)
+        self.budget = BudgetFactory(creator=self.user)
+        self.budget.members.add(self.user)
+        others = [UserFactory().pk for _ in range(5)]
+        self.target = Target(budget=self.budget, user=self.user, others=others, today=datetime.date.today())
+
+    def test_endpoints_cover_every_route(self):
+        routes = {endpoint.route for endpoint in get_endpoints(self.target)}
+
+        self.assertEqual(routes, {pattern.name for pattern in urls.urlpatterns})
+
+    def test_benchmark_endpoint(self):
+        TransactionFactory.create_batch(3, budget=self.budget, creator=self.user)
+        client = Client()
+        client.force_login(self.user)
+
+        for endpoint in get_endpoints(self.target):
+            if endpoint.route in ('transactions', 'bulk-members'):
+                path = reverse(f'budgets:{endpoint.route}', kwargs=dict(pk=self.budget.pk))
+                metrics = benchmark_endpoint(client, endpoint, path, warmup=1, requests=2)
+
+                self.assertEqual(set(metrics), {'p50_ms', 'p99_ms', 'queries', 'peak_kib'})
+                self.assertGreater(metrics['queries'], 0)
+                self.assertGreater(metrics['peak_kib'], 0)
+
+    def test_find_regressions(self):
+        results = {
+            '1000': {
+                'GET transactions': {'p50_ms': 20.0, 'p99_ms': 40.0, 'queries': 6, 'peak_kib': 150.0},
+                'concurrent transfers': {'p50_ms': 30.0, 'p99_ms': 60.0, 'transfers_per_s': 60.0},
+                'GET summary': {'p50_ms': 100.0},
+            },
+        }
+
+        self.assertEqual(
+            find_regressions(results, BASELINE, margin=0.5),
+            [
+                '1000 transactions, GET transactions: p50_ms 20.0 (baseline 10.0, limit 16.00)',
+                '1000 transactions, GET transactions: queries 6 (baseline 5, limit 5.00)',
+                '1000 transactions, concurrent transfers: transfers_per_s 60.0 (baseline 100.0, limit 66.67)',
+            ],
+        )
+        self.assertEqual(
+            find_regressions(results, BASELINE, margin=1.0),
+            [
+                '1000 transactions, GET transactions: queries 6 (baseline 5, limit 5.00)',
+            ],
+        )
+
+
+class CommittedBaselineTest(TransactionTestCase):
+    """
+    Query counts do not depend on the machine, so the suite checks them against the committed baseline. Timings are
+    compared by the benchmark job of CI.
+    """
+
+    def setUp(self):
+        # the benchmark runs in a fresh process
+        cache.clear()
+        membership_cache.clear()
+        category_index.clear()
+
+    def test_query_counts_match_baseline(self):
+        baseline = json.loads(DEFAULT_BASELINE.read_text())['results']
+        size = min(baseline, key=int)
+        target = Command().generate(int(size), others=3)
+        client = Client()
+        client.force_login(target.user)
+
+        queries = {
+            endpoint.result_name: benchmark_endpoint(
+                client, endpoint, get_path(target, endpoint), warmup=1, requests=1
+            )['queries']
+            for endpoint in get_endpoints(target)
+        }
+
+        expected = {name: metrics['queries'] for name, metrics in baseline[size].items() if 'queries' in metrics}
+        self.assertEqual(queries, expected, 'Update the baseline with bench_endpoints --update-baseline.')
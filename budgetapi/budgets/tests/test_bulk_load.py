@@ -0,0 +1,193 @@
+import datetime
+import decimal
+import io
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from budgets.bulk_load import iter_json_list
+from budgets.categorization import category_index
+from budgets.factories import BudgetFactory, TransactionFactory, UserFactory
+from budgets.memberships import membership_cache
+from budgets.models import Budget, BudgetDailyBalance, Category, Transaction, TransactionType
+from budgets.summaries import summary_cache_key
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase
+
+USERS = [
+    {
+        'model': 'auth.user',
+        'pk': 10,
+        'fields': {'username': 'demo', 'password': '', 'date_joined': '2021-10-10T15:45Z'},
+    },
+    {
+        'model': 'auth.user',
+        'pk': 11,
+        'fields': {'username': 'john', 'password': '', 'date_joined': '2021-10-10T15:45Z'},
+    },
+]
+BUDGETS = [
+    {
+        'model': 'budgets.budget',
+        'pk': 20,
+        'fields': {'creator': 10, 'balance': '30.00', 'created_at': '2021-10-20T18:36:51Z', 'members': [10, 11]},
+    },
+]
+CATEGORIES = [
+    {'model': 'budgets.category', 'pk': 30, 'fields': {'name': 'edukacja', 'tags': '["książka", "pod\\"ręcznik"]'}},
+]
+TRANSACTIONS = [
+    {
+        'model': 'budgets.transaction',
+        'pk': 40 + index,
+        'fields': {
+            'creator': 10,
+            'budget': 20,
+            'amount': '10.00',
+            'created_at': f'2021-10-2{index}T18:37:25Z',
+            'title': 'Za\tksiążki\n\\',
+            'category': 30 if index else None,
+            'type': 'TRANSFER',
+            'current_balance': '30.00',
+        },
+    }
+    for index in range(3)
+]
+
+
+class BulkLoadTest(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def write_json(self, name, objects):
+        path = self.directory / name
+        path.write_text(json.dumps(objects, indent=4, ensure_ascii=False), encoding='utf-8')
+        return path
+
+    def write_ndjson(self, name, objects):
+        path = self.directory / name
+        path.write_text(''.join(json.dumps(obj, ensure_ascii=False) + '\n' for obj in objects), encoding='utf-8')
+        return path
+
+    def get_indexes(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT indexname FROM pg_indexes WHERE tablename = 'budgets_transaction' ORDER BY 1")
+            return [row[0] for row in cursor.fetchall()]
+
+    def test_load(self):
+        indexes = self.get_indexes()
+        fixtures = [
+            self.write_ndjson('transactions.ndjson', TRANSACTIONS),
+            self.write_json('users.json', USERS),
+            self.write_json('budgets.json', BUDGETS + CATEGORIES),
+        ]
+        output = StringIO()
+
+        call_command('bulk_load', *fixtures, chunk_size=2, stdout=output)
+
+        self.assertIn('budgets_transaction: 3 rows\n', output.getvalue())
+        self.assertIn('Loaded 9 rows from 3 fixtures', output.getvalue())
+        budget = Budget.objects.get(pk=20)
+        self.assertEqual(str(budget.balance), '30.00')
+        self.assertEqual(budget.shard_count, 1)
+        self.assertEqual(budget.version, 1)
+        self.assertIsNotNone(budget.modified_at)
+        self.assertEqual(sorted(budget.members.values_list('username', flat=True)), ['demo', 'john'])
+        self.assertEqual(Category.objects.get(pk=30).tags, ['książka', 'pod"ręcznik'])
+        transaction = Transaction.objects.get(pk=41)
+        self.assertEqual(transaction.title, 'Za\tksiążki\n\\')
+        self.assertEqual(transaction.type, TransactionType.TRANSFER)
+        self.assertEqual(transaction.category_id, 30)
+        self.assertIsNone(Transaction.objects.get(pk=40).category_id)
+        self.assertEqual(self.get_indexes(), indexes)
+
+    def test_daily_balances_are_rebuilt(self):
+        fixtures = [self.write_json('budgets.json', USERS + BUDGETS + CATEGORIES + TRANSACTIONS)]
+        output = StringIO()
+
+        call_command('bulk_load', *fixtures, stdout=output)
+
+        self.assertIn('Rebuilt daily balance snapshots of 1 budgets', output.getvalue())
+        self.assertEqual(
+            list(BudgetDailyBalance.objects.filter(budget_id=20).order_by('date').values_list('date', 'count')),
+            [(datetime.date(2021, 10, day), 1) for day in (20, 21, 22)],
+        )
+        self.assertEqual(BudgetDailyBalance.objects.balance_on(20, datetime.date(2021, 10, 22)), decimal.Decimal(30))
+
+    def test_caches_are_invalidated(self):
+        membership_cache.clear()
+        category_index.clear()
+        self.addCleanup(membership_cache.clear)
+        self.addCleanup(category_index.clear)
+        UserFactory(pk=10)
+        budget = BudgetFactory(pk=20, creator_id=10)
+        TransactionFactory(budget=budget)
+        budget.refresh_from_db()
+        summary_key = summary_cache_key(20, datetime.datetime(2021, 10, 1, tzinfo=datetime.timezone.utc))
+        cache.set(summary_key, [])
+        self.assertEqual(membership_cache.get(10), frozenset())
+        self.assertIsNone(category_index.match(['książka']))
+        objects = (
+            CATEGORIES + TRANSACTIONS + [{**BUDGETS[0], 'pk': 21, 'fields': {**BUDGETS[0]['fields'], 'members': [10]}}]
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            # foreign keys of the empty membership table cannot be dropped after the factories inserted rows in the test
+            call_command('bulk_load', self.write_json('budgets.json', objects), defer=False, stdout=StringIO())
+
+        self.assertEqual(membership_cache.get(10), frozenset({21}))
+        self.assertEqual(category_index.match(['książka']).pk, 30)
+        self.assertIsNone(cache.get(summary_key))
+        self.assertEqual(Budget.objects.get(pk=20).version, budget.version + 1)
+        self.assertEqual(Budget.objects.get(pk=21).version, 1)
+
+    def test_sequences_are_reset(self):
+        call_command('bulk_load', self.write_json('users.json', USERS), stdout=StringIO())
+
+        self.assertEqual(UserFactory().pk, 12)
+
+    def test_objects_without_pk(self):
+        objects = [{'model': 'budgets.category', 'fields': {'name': 'transport', 'tags': ['bilet']}}]
+
+        call_command('bulk_load', self.write_ndjson('categories.jsonl', objects), stdout=StringIO())
+
+        self.assertEqual(Category.objects.get().tags, ['bilet'])
+
+    def test_load_into_table_with_rows(self):
+        budget = BudgetFactory(pk=20, creator=UserFactory(pk=10))
+        TransactionFactory(budget=budget)
+        indexes = self.get_indexes()
+
+        call_command('bulk_load', self.write_json('transactions.json', CATEGORIES + TRANSACTIONS), stdout=StringIO())
+
+        self.assertEqual(Transaction.objects.filter(budget=budget).count(), 4)
+        self.assertEqual(self.get_indexes(), indexes)
+
+    def test_invalid_fixtures(self):
+        with self.assertRaisesMessage(CommandError, "No installed app with label 'shop'"):
+            call_command('bulk_load', self.write_json('shop.json', [{'model': 'shop.item', 'fields': {}}]))
+        with self.assertRaisesMessage(CommandError, 'Unexpected end of fixture'):
+            path = self.directory / 'broken.json'
+            path.write_text('[{"model": "auth.user", "fields": {')
+            call_command('bulk_load', path)
+        # foreign keys are checked once the indexes are restored
+        with self.assertRaises(CommandError):
+            call_command('bulk_load', self.write_json('transactions.json', TRANSACTIONS), stdout=StringIO())
+        self.assertFalse(User.objects.exists())
+
+    def test_iter_json_list(self):
+        objects = USERS + BUDGETS
+
+        with mock.patch('budgets.bulk_load.READ_SIZE', 7):
+            lines = list(iter_json_list(io.StringIO(json.dumps(objects, indent=2))))
+
+        self.assertEqual([json.loads(line) for line in lines], objects)
+        self.assertTrue(all('\n' not in line for line in lines))
+        self.assertEqual(list(iter_json_list(io.StringIO(' [ ] '))), [])
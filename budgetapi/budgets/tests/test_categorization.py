@@ -0,0 +1,159 @@
+import multiprocessing
+from unittest import mock
+
+from budgets import categorization
+from budgets.categorization import categorize_title, category_index, stem_word, text_stemming
+from budgets.factories import CategoryFactory
+from budgets.models import Category
+from budgets.tests.utils import SharedCacheMixin
+from django.apps import apps
+from django.core.cache import cache
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+
+
+class CategorizeTitleTest(TestCase):
+    def setUp(self):
+        category_index.clear()
+
+    def test_text_stemming(self):
+        self.assertEqual(
+            text_stemming('oddaję pieniądze za przejazd samochodem'),
+            ['oddawać', 'pieniądz', 'za', 'przejazd', 'samochód'],
+        )
+
+    def test_text_stemming_memoizes_stems(self):
+        stem_word.cache_clear()
+
+        text_stemming('bilet bilet')
+
+        self.assertEqual(stem_word.cache_info().hits, 1)
+        self.assertEqual(stem_word.cache_info().misses, 1)
+
+    def test_categorize_title(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            transport_category = CategoryFactory(name="transport", tags=['bilet', 'przejazd'])
+            education_category = CategoryFactory(name="edukacja", tags=['książka', 'podręcznik'])
+
+        self.assertEqual(categorize_title('Oddaje pieniądze'), None)
+        self.assertEqual(categorize_title('Oddaje pieniądze za ostatnie przejazdy samochodem'), transport_category)
+        self.assertEqual(categorize_title('Oddaje pieniądze za książki'), education_category)
+
+    def test_categorize_title_prefers_first_category(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            transport_category = CategoryFactory(name="transport", tags=['bilet', 'przejazd'])
+            CategoryFactory(name="wycieczki", tags=['przejazd'])
+
+        self.assertEqual(categorize_title('Płacę za przejazd'), transport_category)
+
+    def test_categorize_title_does_not_query_categories(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            CategoryFactory(name="transport", tags=['bilet', 'przejazd'])
+        categorize_title('kupiłem bilet')
+
+        with self.assertNumQueries(0):
+            categorize_title('kupiłem bilet')
+
+
+class CategoryIndexTest(TestCase):
+    def setUp(self):
+        category_index.clear()
+
+    def test_index_is_built_from_database(self):
+        category = Category.objects.bulk_create([Category(name="transport", tags=['bilet'])])[0]
+
+        self.assertEqual(category_index.match(['bilet']), category)
+
+    def test_index_follows_category_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            category = CategoryFactory(name="transport", tags=['bilet'])
+        self.assertEqual(category_index.match(['bilet']), category)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            category.tags = ['przejazd']
+            category.save()
+        self.assertEqual(category_index.match(['bilet']), None)
+        self.assertEqual(category_index.match(['przejazd']), category)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            category.delete()
+        self.assertEqual(category_index.match(['przejazd']), None)
+
+    @override_settings(BUDGETS_CATEGORY_INDEX_POLL_INTERVAL=0)
+    def test_index_is_rebuilt_when_changed_elsewhere(self):
+        category_index.match(['bilet'])
+        category = Category.objects.bulk_create([Category(name="transport", tags=['bilet'])])[0]
+        self.assertEqual(category_index.match(['bilet']), None)
+
+        category_index._bump_version()
+
+        self.assertEqual(category_index.match(['bilet']), category)
+
+    def test_version_is_checked_every_poll_interval(self):
+        category_index.match(['bilet'])
+        category = Category.objects.bulk_create([Category(name="transport", tags=['bilet'])])[0]
+        category_index._bump_version()
+
+        with mock.patch('budgets.categorization.cache') as shared_cache:
+            self.assertEqual(category_index.match(['bilet']), None)
+        self.assertEqual(shared_cache.method_calls, [])
+
+        category_index._next_poll = 0.0
+        self.assertEqual(category_index.match(['bilet']), category)
+
+    def test_index_is_rebuilt_when_expired(self):
+        with override_settings(BUDGETS_CATEGORY_INDEX_TIMEOUT=0):
+            category_index.match(['bilet'])
+        # no signal is sent and the version stays the same
+        category = Category.objects.bulk_create([Category(name="transport", tags=['bilet'])])[0]
+
+        self.assertEqual(category_index.match(['bilet']), category)
+
+
+def rename_tags(category_id, tags):
+    try:
+        category = Category.objects.get(pk=category_id)
+        category.tags = tags
+        category.save()
+    finally:
+        connection.close()
+
+
+@override_settings(BUDGETS_CATEGORY_INDEX_POLL_INTERVAL=0)
+class CategoryIndexAcrossProcessesTest(SharedCacheMixin, TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        category_index.clear()
+        self.addCleanup(category_index.clear)
+
+    def test_index_follows_changes_made_in_other_process(self):
+        category = CategoryFactory(name="transport", tags=['bilet'])
+        self.assertEqual(category_index.match(['bilet']), category)
+
+        # the forked process stands for another server worker or the admin, it must not share the connection
+        connections.close_all()
+        process = multiprocessing.get_context('fork').Process(target=rename_tags, args=(category.pk, ['przejazd']))
+        process.start()
+        process.join()
+
+        self.assertEqual(process.exitcode, 0)
+        self.assertEqual(category_index.match(['bilet']), None)
+        self.assertEqual(category_index.match(['przejazd']), category)
+
+
+class BudgetsConfigTest(TestCase):
+    @override_settings(BUDGETS_PRELOAD_STEMMER=True)
+    def test_preload_stemmer(self):
+        with mock.patch.object(categorization, 'stemmer', None), mock.patch('budgets.apps.gc.freeze') as freeze:
+            apps.get_app_config('budgets').ready()
+
+            self.assertIsNotNone(categorization.stemmer)
+            freeze.assert_called_once()
+
+    @override_settings(BUDGETS_PRELOAD_STEMMER=False)
+    def test_stemmer_is_loaded_lazily(self):
+        with mock.patch.object(categorization, 'stemmer', None):
+            apps.get_app_config('budgets').ready()
+
+            self.assertIsNone(categorization.stemmer)
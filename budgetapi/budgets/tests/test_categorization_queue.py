@@ -0,0 +1,90 @@
+from io import StringIO
+
+from budgets.categorization import category_index
+from budgets.categorization_queue import categorize_pending
+from budgets.factories import BudgetFactory, CategoryFactory, UserFactory
+from budgets.memberships import membership_cache
+from budgets.models import Budget, PendingCategorization, Transaction, TransactionType
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+
+@override_settings(BUDGETS_DEFERRED_CATEGORIZATION=True)
+class DeferredCategorizationTest(APITestCase):
+    def setUp(self):
+        category_index.clear()
+        # users created by other tests may share ids with these ones, so their cached memberships are stale
+        cache.clear()
+        membership_cache.clear()
+        self.category = CategoryFactory(name='transport', tags=['bilet'])
+        self.member = UserFactory()
+        self.budget = BudgetFactory(members=(self.member,), balance='100')
+        self.client.force_authenticate(self.member)
+
+    def test_transfer_is_queued(self):
+        response = self.client.post(
+            reverse('budgets:create-transfer', kwargs=dict(pk=self.budget.pk)),
+            data=dict(amount='12.50', title='Kupiłem bilet'),
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertIsNone(response.json()['category'])
+        self.assertTrue(response.json()['categoryPending'])
+        self.assertEqual(
+            list(PendingCategorization.objects.values_list('transaction_id', flat=True)), [response.json()['id']]
+        )
+
+    def test_batch_queues_only_transfers(self):
+        response = self.client.post(
+            reverse('budgets:create-transactions-batch', kwargs=dict(pk=self.budget.pk)),
+            data=dict(
+                transactions=[
+                    dict(type=TransactionType.TRANSFER, title='Kupiłem bilet', amount='12.50'),
+                    dict(type=TransactionType.WITHDRAWAL, amount='10.00'),
+                ]
+            ),
+            format='json',
+        )
+        self.assertEqual(response.status_code, 201)
+        transfer = Transaction.objects.get(type=TransactionType.TRANSFER)
+        withdrawal = Transaction.objects.get(type=TransactionType.WITHDRAWAL)
+        self.assertTrue(transfer.category_pending)
+        self.assertFalse(withdrawal.category_pending)
+        self.assertEqual(list(PendingCategorization.objects.values_list('transaction_id', flat=True)), [transfer.pk])
+
+    def test_categorize_pending(self):
+        for title in ('Kupiłem bilet', 'Za obiad', 'Drugi bilet'):
+            self.client.post(
+                reverse('budgets:create-transfer', kwargs=dict(pk=self.budget.pk)), data=dict(amount='1', title=title)
+            )
+        version = Budget.objects.get(pk=self.budget.pk).version
+
+        self.assertEqual(categorize_pending(2), 2)
+        self.assertEqual(PendingCategorization.objects.count(), 1)
+        self.assertEqual(categorize_pending(2), 1)
+        self.assertEqual(categorize_pending(2), 0)
+
+        transactions = Transaction.objects.order_by('id')
+        self.assertEqual(
+            [(item.category_id, item.category_pending) for item in transactions],
+            [(self.category.pk, False), (None, False), (self.category.pk, False)],
+        )
+        self.assertEqual(Budget.objects.get(pk=self.budget.pk).version, version + 2)
+
+    def test_command(self):
+        self.client.post(
+            reverse('budgets:create-transfer', kwargs=dict(pk=self.budget.pk)),
+            data=dict(amount='12.50', title='Kupiłem bilet'),
+        )
+        output = StringIO()
+
+        call_command('categorize_pending', once=True, stdout=output)
+
+        self.assertIn('Categorized 1 transfers', output.getvalue())
+        self.assertEqual(Transaction.objects.get().category_id, self.category.pk)
+        self.assertFalse(PendingCategorization.objects.exists())
+
+        with self.assertRaisesMessage(CommandError, 'Batch size must be at least 1.'):
+            call_command('categorize_pending', once=True, batch_size=0)
@@ -0,0 +1,164 @@
+import multiprocessing
+from unittest import mock
+
+from budgets.factories import BudgetFactory, UserFactory
+from budgets.memberships import MEMBERSHIP_GENERATION_KEY, MembershipCache, membership_cache, membership_changes_key
+from budgets.models import Budget
+from budgets.serializers import BudgetAddMemberSerializer
+from budgets.tests.utils import SharedCacheMixin
+from django.core.cache import cache
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+
+class MembershipCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        membership_cache.clear()
+        self.user = UserFactory()
+        self.budget = BudgetFactory(members=(self.user,))
+
+    def test_get(self):
+        other_budget = BudgetFactory(members=(self.user,))
+        BudgetFactory()
+
+        self.assertEqual(membership_cache.get(self.user.pk), {self.budget.pk, other_budget.pk})
+        with self.assertNumQueries(0):
+            self.assertTrue(membership_cache.is_member(self.user.pk, self.budget.pk))
+
+    def test_hits_are_served_without_cache_lookups(self):
+        memberships = MembershipCache(maxsize=10, timeout=60, poll_interval=60)
+        memberships.get(self.user.pk)
+
+        with mock.patch('budgets.memberships.cache') as shared_cache, self.assertNumQueries(0):
+            self.assertEqual(memberships.get(self.user.pk), {self.budget.pk})
+        self.assertEqual(shared_cache.method_calls, [])
+
+    def test_least_recently_used_entries_are_evicted(self):
+        other_user = UserFactory()
+        memberships = MembershipCache(maxsize=1, timeout=60, poll_interval=60)
+        memberships.get(self.user.pk)
+        memberships.get(other_user.pk)
+
+        with self.assertNumQueries(0):
+            memberships.get(other_user.pk)
+        with self.assertNumQueries(1):
+            memberships.get(self.user.pk)
+
+    def test_entries_expire(self):
+        memberships = MembershipCache(maxsize=10, timeout=0, poll_interval=60)
+        memberships.get(self.user.pk)
+        # a queryset delete sends no m2m_changed signal, so only the expiry can drop the entry
+        Budget.members.through.objects.filter(user_id=self.user.pk).delete()
+
+        self.assertEqual(memberships.get(self.user.pk), frozenset())
+
+    def test_other_instances_poll_invalidations(self):
+        other_user = UserFactory()
+        BudgetFactory(members=(other_user,))
+        other_process_cache = MembershipCache(maxsize=10, timeout=60, poll_interval=0)
+        self.assertTrue(other_process_cache.is_member(self.user.pk, self.budget.pk))
+        other_process_cache.get(other_user.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.budget.members.remove(self.user)
+
+        self.assertFalse(other_process_cache.is_member(self.user.pk, self.budget.pk))
+        with self.assertNumQueries(0):
+            other_process_cache.get(other_user.pk)
+
+    def test_invalidations_are_polled_every_interval(self):
+        other_process_cache = MembershipCache(maxsize=10, timeout=60, poll_interval=60)
+        other_process_cache.get(self.user.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.budget.members.remove(self.user)
+
+        self.assertTrue(other_process_cache.is_member(self.user.pk, self.budget.pk))
+
+    def test_lost_changes_evict_all_entries(self):
+        other_process_cache = MembershipCache(maxsize=10, timeout=60, poll_interval=0)
+        other_process_cache.get(self.user.pk)
+        membership_cache.invalidate([0])
+        cache.delete(membership_changes_key(cache.get(MEMBERSHIP_GENERATION_KEY)))
+
+        with self.assertNumQueries(1):
+            other_process_cache.get(self.user.pk)
+
+    def test_adding_member_invalidates_cache(self):
+        user = UserFactory()
+        self.assertFalse(membership_cache.is_member(user.pk, self.budget.pk))
+        serializer = BudgetAddMemberSerializer(data={'user': user.pk}, context=dict(budget=self.budget))
+        serializer.is_valid(raise_exception=True)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            serializer.save()
+
+        self.assertTrue(membership_cache.is_member(user.pk, self.budget.pk))
+
+    def test_removing_member_invalidates_cache(self):
+        self.assertTrue(membership_cache.is_member(self.user.pk, self.budget.pk))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.budget.members.remove(self.user)
+
+        self.assertFalse(membership_cache.is_member(self.user.pk, self.budget.pk))
+
+    def test_clearing_members_invalidates_cache(self):
+        self.assertTrue(membership_cache.is_member(self.user.pk, self.budget.pk))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.budget.members.clear()
+
+        self.assertFalse(membership_cache.is_member(self.user.pk, self.budget.pk))
+
+    def test_changing_user_budgets_invalidates_cache(self):
+        budget = BudgetFactory()
+        self.assertFalse(membership_cache.is_member(self.user.pk, budget.pk))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.budget_set.add(budget)
+
+        self.assertTrue(membership_cache.is_member(self.user.pk, budget.pk))
+
+
+class MembershipCacheSharedBackendTest(SharedCacheMixin, TestCase):
+    def test_invalidation_cost_does_not_depend_on_user_count(self):
+        membership_cache.invalidate([0])
+        counts = []
+        for count in (1, 100):
+            with CaptureQueriesContext(connection) as queries:
+                membership_cache.invalidate(range(count))
+            counts.append(len(queries))
+
+        self.assertEqual(counts[0], counts[1])
+
+
+def remove_member(budget_id, user_id):
+    try:
+        Budget.objects.get(pk=budget_id).members.remove(user_id)
+    finally:
+        connection.close()
+
+
+class MembershipCacheAcrossProcessesTest(SharedCacheMixin, TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        membership_cache.clear()
+
+    def test_removing_member_in_other_process_invalidates_cache(self):
+        user = UserFactory()
+        budget = BudgetFactory(members=(user,))
+        memberships = MembershipCache(maxsize=10, timeout=60, poll_interval=0)
+        self.assertTrue(memberships.is_member(user.pk, budget.pk))
+
+        # the forked process stands for another server worker, it must not share the connection of this one
+        connections.close_all()
+        process = multiprocessing.get_context('fork').Process(target=remove_member, args=(budget.pk, user.pk))
+        process.start()
+        process.join()
+
+        self.assertEqual(process.exitcode, 0)
+        self.assertFalse(memberships.is_member(user.pk, budget.pk))
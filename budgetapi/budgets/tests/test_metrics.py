@@ -0,0 +1,224 @@
+import asyncio
+import json
+import logging
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from budgets.factories import BudgetFactory, UserFactory
+from django.contrib.auth.models import User
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from budgetapi.metrics import (
+    Histogram,
+    MetricsMiddleware,
+    MetricsRegistry,
+    RequestMetrics,
+    current_metrics,
+    quiet_request_log,
+    registry,
+    timer,
+)
+
+
+class TimerTest(SimpleTestCase):
+    def test_timer_adds_to_current_request(self):
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            with timer('stem'):
+                pass
+            with timer('stem'):
+                pass
+        finally:
+            current_metrics.reset(token)
+
+        self.assertEqual(list(metrics.timings), ['stem'])
+        self.assertGreater(metrics.timings['stem'], 0)
+
+    def test_timer_outside_of_request(self):
+        with timer('stem'):
+            pass
+
+
+class QuietRequestLogTest(SimpleTestCase):
+    def setUp(self):
+        self.logger = logging.getLogger('budgetapi.metrics')
+        self.addCleanup(self.logger.setLevel, self.logger.level)
+        self.logger.setLevel(logging.INFO)
+
+    def test_request_log_is_hidden(self):
+        with quiet_request_log(1):
+            self.assertFalse(self.logger.isEnabledFor(logging.INFO))
+        self.assertTrue(self.logger.isEnabledFor(logging.INFO))
+
+    def test_verbose(self):
+        with quiet_request_log(2):
+            self.assertTrue(self.logger.isEnabledFor(logging.INFO))
+
+
+class HistogramTest(SimpleTestCase):
+    def test_buckets_are_cumulative(self):
+        histogram = Histogram((1, 10))
+        for value in (0.5, 1, 5, 20):
+            histogram.observe(value)
+
+        self.assertEqual(histogram.as_dict(), {'count': 4, 'sum': 26.5, 'buckets': {'1': 2, '10': 3, '+Inf': 4}})
+
+    def test_merge_loaded(self):
+        histogram = Histogram((1, 10))
+        histogram.observe(5)
+        other = Histogram.load(json.loads(json.dumps(histogram.dump())))
+        other.observe(20)
+
+        histogram.merge(other)
+
+        self.assertEqual(histogram.as_dict(), {'count': 3, 'sum': 30.0, 'buckets': {'1': 0, '10': 2, '+Inf': 3}})
+
+
+class MetricsRegistryTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def record(self, registry, sql_count):
+        metrics = RequestMetrics()
+        metrics.sql_count = sql_count
+        metrics.add('total', 0.002)
+        registry.record('GET metrics', metrics)
+
+    def test_single_process(self):
+        registry = MetricsRegistry()
+        self.record(registry, 1)
+
+        self.assertEqual(registry.snapshot()['GET metrics']['sql_count']['count'], 1)
+        self.assertFalse(list(Path(self.directory).iterdir()))
+
+    def test_processes_are_merged(self):
+        with override_settings(METRICS_MULTIPROCESS_DIR=self.directory, METRICS_FLUSH_INTERVAL=60):
+            first, second = MetricsRegistry(), MetricsRegistry()
+            self.record(first, 1)
+            self.record(second, 3)
+            # flushed at most every interval, the latest requests are seen with the next flush
+            self.record(second, 3)
+
+            snapshot = first.snapshot()
+
+        self.assertEqual(snapshot['GET metrics']['sql_count']['count'], 2)
+        self.assertEqual(snapshot['GET metrics']['sql_count']['sum'], 4)
+        self.assertEqual(snapshot['GET metrics']['total']['count'], 2)
+        self.assertEqual(len(list(Path(self.directory).glob('*.json'))), 2)
+
+    def test_forked_process_has_own_histograms(self):
+        with override_settings(METRICS_MULTIPROCESS_DIR=self.directory):
+            registry = MetricsRegistry()
+            self.record(registry, 1)
+            with mock.patch('os.getpid', return_value=-1):
+                self.record(registry, 1)
+                snapshot = registry.snapshot()
+
+        self.assertEqual(snapshot['GET metrics']['sql_count']['count'], 2)
+        self.assertEqual(len(list(Path(self.directory).glob('*.json'))), 2)
+
+
+class MetricsMiddlewareTest(APITestCase):
+    def setUp(self):
+        registry.clear()
+        self.user = UserFactory()
+        self.budget = BudgetFactory(creator=self.user, members=(self.user,))
+        self.client.force_authenticate(self.user)
+
+    def test_server_timing(self):
+        response = self.client.get(reverse('budgets:budget-details', kwargs=dict(pk=self.budget.pk)))
+
+        entries = dict(entry.split(';', 1) for entry in response['Server-Timing'].split(', '))
+        self.assertEqual(set(entries), {'sql', 'render', 'total'})
+        self.assertRegex(entries['sql'], r'^dur=[\d.]+;desc="\d+ queries"$')
+
+    def test_transfer_timings(self):
+        response = self.client.post(
+            reverse('budgets:create-transfer', kwargs=dict(pk=self.budget.pk)),
+            data={'amount': '1.00', 'title': 'bilet'},
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('categorize;dur=', response['Server-Timing'])
+        self.assertIn('stem;dur=', response['Server-Timing'])
+
+    def test_structured_log(self):
+        with self.assertLogs('budgetapi.metrics', 'INFO') as logs:
+            self.client.get(reverse('budgets:budget-details', kwargs=dict(pk=self.budget.pk)))
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'budgets:budget-details')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['sql_count'], 0)
+        self.assertIn('total_ms', record)
+
+    def test_histograms_per_view(self):
+        for _ in range(2):
+            self.client.get(reverse('budgets:budget-details', kwargs=dict(pk=self.budget.pk)))
+
+        snapshot = registry.snapshot()
+        self.assertEqual(list(snapshot), ['GET budgets:budget-details'])
+        self.assertEqual(snapshot['GET budgets:budget-details']['total']['count'], 2)
+        self.assertEqual(snapshot['GET budgets:budget-details']['sql_count']['count'], 2)
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_disabled(self):
+        response = self.client.get(reverse('budgets:budget-details', kwargs=dict(pk=self.budget.pk)))
+
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(registry.snapshot(), {})
+
+
+def count_users():
+    try:
+        return User.objects.count()
+    finally:
+        connection.close()
+
+
+class AsyncMetricsMiddlewareTest(TransactionTestCase):
+    async def test_async_request(self):
+        async def get_response(request):
+            with timer('stem'):
+                # async views query from worker threads
+                await sync_to_async(count_users, thread_sensitive=False)()
+            return HttpResponse()
+
+        middleware = MetricsMiddleware(get_response)
+
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        response = await middleware(RequestFactory().get('/'))
+        entries = dict(entry.split(';', 1) for entry in response['Server-Timing'].split(', '))
+        self.assertEqual(set(entries), {'sql', 'stem', 'total'})
+        self.assertRegex(entries['sql'], r'^dur=[\d.]+;desc="1 queries"$')
+
+
+class MetricsAPIViewTest(APITestCase):
+    def setUp(self):
+        registry.clear()
+
+    def test_metrics_are_staff_only(self):
+        self.client.force_authenticate(UserFactory(is_staff=False))
+
+        response = self.client.get(reverse('metrics'))
+
+        self.assertEqual(response.status_code, 403)
+
+    def test_metrics(self):
+        self.client.force_authenticate(UserFactory(is_staff=True))
+        self.client.get(reverse('metrics'))
+
+        response = self.client.get(reverse('metrics'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['GET metrics']['total']['count'], 1)
+        self.assertIn('sqlCount', response.json()['GET metrics'])
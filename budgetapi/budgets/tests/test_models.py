@@ -0,0 +1,329 @@
+import datetime
+import decimal
+import threading
+import time
+from unittest import mock
+
+import pytz
+from budgets.factories import BudgetFactory, TransactionFactory
+from budgets.models import Budget, BudgetBalanceShard, BudgetDailyBalance, TransactionType
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+
+
+class BudgetManagerTest(TestCase):
+    def setUp(self):
+        self.budget = BudgetFactory(balance=decimal.Decimal('10.00'))
+
+    def get_shard_balances(self):
+        return list(
+            BudgetBalanceShard.objects.filter(budget=self.budget).order_by('index').values_list('balance', flat=True)
+        )
+
+    def test_deposit(self):
+        self.assertEqual(Budget.objects.deposit(self.budget.pk, decimal.Decimal('2.50')), decimal.Decimal('12.50'))
+
+        self.budget.refresh_from_db()
+        self.assertEqual(self.budget.balance, decimal.Decimal('12.50'))
+
+    def test_deposit_to_sharded_budget(self):
+        Budget.objects.reshard(self.budget.pk, 4)
+
+        with mock.patch('budgets.models.random.randrange', side_effect=[2, 0, 2]):
+            balances = [Budget.objects.deposit(self.budget.pk, decimal.Decimal(amount), 4) for amount in (1, 2, 3)]
+
+        self.assertEqual(balances, [decimal.Decimal(11), decimal.Decimal(13), decimal.Decimal(16)])
+        self.assertEqual(self.get_shard_balances(), [2, 0, 4, 0])
+        self.budget.refresh_from_db()
+        self.assertEqual(self.budget.balance, decimal.Decimal(10))
+        self.assertEqual(self.budget.total_balance, decimal.Decimal(16))
+
+    def test_deposit_after_shards_were_removed(self):
+        self.assertEqual(Budget.objects.deposit(self.budget.pk, decimal.Decimal(1), 4), decimal.Decimal(11))
+
+        self.budget.refresh_from_db()
+        self.assertEqual(self.budget.balance, decimal.Decimal(11))
+
+    def test_withdraw(self):
+        self.assertEqual(Budget.objects.withdraw(self.budget.pk, decimal.Decimal(4)), decimal.Decimal(6))
+        self.assertEqual(Budget.objects.withdraw(self.budget.pk, decimal.Decimal(7)), None)
+
+        self.budget.refresh_from_db()
+        self.assertEqual(self.budget.balance, decimal.Decimal(6))
+
+    def test_withdraw_from_sharded_budget(self):
+        Budget.objects.reshard(self.budget.pk, 2)
+        BudgetBalanceShard.objects.filter(budget=self.budget, index=1).update(balance=5)
+
+        self.assertEqual(Budget.objects.withdraw(self.budget.pk, decimal.Decimal(4)), decimal.Decimal(11))
+        self.assertEqual(self.get_shard_balances(), [0, 5])
+
+        self.assertEqual(Budget.objects.withdraw(self.budget.pk, decimal.Decimal(9)), decimal.Decimal(2))
+        self.assertEqual(self.get_shard_balances(), [0, 0])
+        self.budget.refresh_from_db()
+        self.assertEqual(self.budget.balance, decimal.Decimal(2))
+
+        self.assertEqual(Budget.objects.withdraw(self.budget.pk, decimal.Decimal(3)), None)
+
+    def test_get_version(self):
+        version, modified_at = Budget.objects.get_version(self.budget.pk)
+
+        Budget.objects.deposit(self.budget.pk, decimal.Decimal(1))
+        self.assertEqual(Budget.objects.get_version(self.budget.pk)[0], version + 1)
+
+        Budget.objects.reshard(self.budget.pk, 2)
+        Budget.objects.deposit(self.budget.pk, decimal.Decimal(1), 2)
+        sharded_version, sharded_modified_at = Budget.objects.get_version(self.budget.pk)
+        self.assertEqual(sharded_version, version + 3)
+        self.assertGreaterEqual(sharded_modified_at, modified_at)
+
+        Budget.objects.reshard(self.budget.pk, 1)
+        self.assertGreater(Budget.objects.get_version(self.budget.pk)[0], sharded_version)
+        self.assertIsNone(Budget.objects.get_version(0))
+
+    def test_reshard(self):
+        Budget.objects.reshard(self.budget.pk, 3)
+        self.assertEqual(self.get_shard_balances(), [0, 0, 0])
+        BudgetBalanceShard.objects.filter(budget=self.budget).update(balance=1)
+
+        Budget.objects.reshard(self.budget.pk, 1)
+
+        self.assertEqual(self.get_shard_balances(), [])
+        self.budget.refresh_from_db()
+        self.assertEqual(self.budget.shard_count, 1)
+        self.assertEqual(self.budget.balance, decimal.Decimal(13))
+
+
+class ConcurrentBalanceChangesTest(TransactionTestCase):
+    def test_sharded_deposit_and_withdrawal_do_not_deadlock(self):
+        budget = BudgetFactory(balance=decimal.Decimal('10.00'))
+        Budget.objects.reshard(budget.pk, 2)
+        BudgetBalanceShard.objects.filter(budget=budget).update(balance=5)
+        deposited = threading.Event()
+        errors = []
+
+        def deposit():
+            try:
+                with transaction.atomic():
+                    balance = Budget.objects.deposit(budget.pk, decimal.Decimal(1), 2)
+                    deposited.set()
+                    # let the withdrawal lock the budget row and wait for the shards
+                    time.sleep(0.5)
+                    # the foreign key of the transaction locks the budget row as well
+                    TransactionFactory(
+                        budget=budget,
+                        creator=budget.creator,
+                        amount=1,
+                        type=TransactionType.TRANSFER,
+                        current_balance=balance,
+                    )
+            except Exception as error:
+                errors.append(error)
+            finally:
+                deposited.set()
+                connection.close()
+
+        def withdraw():
+            deposited.wait()
+            try:
+                with transaction.atomic():
+                    Budget.objects.withdraw(budget.pk, decimal.Decimal(18))
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=deposit), threading.Thread(target=withdraw)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(Budget.objects.get_total_balance(budget.pk), decimal.Decimal(3))
+
+
+class BudgetDailyBalanceManagerTest(TestCase):
+    def setUp(self):
+        self.budget = BudgetFactory()
+
+    def create_transaction(self, amount, current_balance, created_at, type=TransactionType.TRANSFER):
+        return TransactionFactory(
+            budget=self.budget,
+            amount=decimal.Decimal(amount),
+            current_balance=decimal.Decimal(current_balance),
+            type=type,
+            created_at=created_at,
+        )
+
+    def get_snapshots(self):
+        return list(
+            BudgetDailyBalance.objects.filter(budget=self.budget)
+            .order_by('date')
+            .values_list('date', 'opening_balance', 'closing_balance', 'inflow', 'outflow', 'count')
+        )
+
+    def test_record_transactions(self):
+        transactions = [
+            self.create_transaction('10', '10', datetime.datetime(2021, 5, 1, 10, tzinfo=pytz.UTC)),
+            self.create_transaction(
+                '4', '6', datetime.datetime(2021, 5, 1, 11, tzinfo=pytz.UTC), TransactionType.WITHDRAWAL
+            ),
+            self.create_transaction('5', '11', datetime.datetime(2021, 5, 3, 11, tzinfo=pytz.UTC)),
+        ]
+
+        BudgetDailyBalance.objects.record_transactions(transactions[:1])
+        BudgetDailyBalance.objects.record_transactions(transactions[1:])
+
+        self.assertEqual(
+            self.get_snapshots(),
+            [
+                (
+                    datetime.date(2021, 5, 1),
+                    decimal.Decimal('0'),
+                    decimal.Decimal('6'),
+                    decimal.Decimal('10'),
+                    decimal.Decimal('4'),
+                    2,
+                ),
+                (
+                    datetime.date(2021, 5, 3),
+                    decimal.Decimal('6'),
+                    decimal.Decimal('11'),
+                    decimal.Decimal('5'),
+                    decimal.Decimal('0'),
+                    1,
+                ),
+            ],
+        )
+
+    def test_rebuild(self):
+        self.create_transaction('10', '10', datetime.datetime(2021, 5, 1, 10, tzinfo=pytz.UTC))
+        self.create_transaction(
+            '4', '6', datetime.datetime(2021, 5, 1, 11, tzinfo=pytz.UTC), TransactionType.WITHDRAWAL
+        )
+        self.create_transaction('5', '11', datetime.datetime(2021, 5, 3, 11, tzinfo=pytz.UTC))
+        BudgetDailyBalance.objects.create(
+            budget=self.budget, date=datetime.date(2021, 4, 1), opening_balance=1, closing_balance=1
+        )
+        TransactionFactory(created_at=datetime.datetime(2021, 5, 1, 10, tzinfo=pytz.UTC))
+
+        BudgetDailyBalance.objects.rebuild([self.budget.pk])
+
+        self.assertEqual(
+            self.get_snapshots(),
+            [
+                (
+                    datetime.date(2021, 5, 1),
+                    decimal.Decimal('0'),
+                    decimal.Decimal('6'),
+                    decimal.Decimal('10'),
+                    decimal.Decimal('4'),
+                    2,
+                ),
+                (
+                    datetime.date(2021, 5, 3),
+                    decimal.Decimal('6'),
+                    decimal.Decimal('11'),
+                    decimal.Decimal('5'),
+                    decimal.Decimal('0'),
+                    1,
+                ),
+            ],
+        )
+        self.assertEqual(BudgetDailyBalance.objects.count(), 2)
+
+    def test_balance_on(self):
+        BudgetDailyBalance.objects.create(
+            budget=self.budget, date=datetime.date(2021, 5, 1), opening_balance=0, closing_balance=6
+        )
+        BudgetDailyBalance.objects.create(
+            budget=self.budget, date=datetime.date(2021, 5, 3), opening_balance=6, closing_balance=11
+        )
+
+        self.assertEqual(BudgetDailyBalance.objects.balance_on(self.budget.pk, datetime.date(2021, 4, 30)), 0)
+        self.assertEqual(BudgetDailyBalance.objects.balance_on(self.budget.pk, datetime.date(2021, 5, 1)), 6)
+        self.assertEqual(BudgetDailyBalance.objects.balance_on(self.budget.pk, datetime.date(2021, 5, 2)), 6)
+        self.assertEqual(BudgetDailyBalance.objects.balance_on(self.budget.pk, datetime.date(2021, 6, 1)), 11)
+
+    def test_record_skips_sharded_budget(self):
+        transaction = self.create_transaction('10', '10', datetime.datetime(2021, 5, 1, 10, tzinfo=pytz.UTC))
+        Budget.objects.reshard(self.budget.pk, 2)
+
+        BudgetDailyBalance.objects.record_transactions([transaction])
+
+        self.assertEqual(self.get_snapshots(), [])
+
+    def create_sharded_history(self):
+        # current balances of transactions in a sharded budget are not a running balance, so they are not used
+        self.create_transaction('10', '0', datetime.datetime(2021, 5, 1, 10, tzinfo=pytz.UTC))
+        self.create_transaction(
+            '4', '0', datetime.datetime(2021, 5, 1, 11, tzinfo=pytz.UTC), TransactionType.WITHDRAWAL
+        )
+        self.create_transaction('5', '0', datetime.datetime(2021, 5, 3, 11, tzinfo=pytz.UTC))
+        TransactionFactory(created_at=datetime.datetime(2021, 5, 1, 10, tzinfo=pytz.UTC))
+        Budget.objects.filter(pk=self.budget.pk).update(balance=decimal.Decimal('7'))
+        Budget.objects.reshard(self.budget.pk, 2)
+        BudgetBalanceShard.objects.filter(budget=self.budget, index=0).update(balance=decimal.Decimal('4'))
+
+    def test_compute_days(self):
+        self.create_sharded_history()
+        may_1 = {
+            'date': datetime.date(2021, 5, 1),
+            'opening_balance': decimal.Decimal('0'),
+            'closing_balance': decimal.Decimal('6'),
+            'inflow': decimal.Decimal('10'),
+            'outflow': decimal.Decimal('4'),
+            'count': 2,
+        }
+        may_3 = {
+            'date': datetime.date(2021, 5, 3),
+            'opening_balance': decimal.Decimal('6'),
+            'closing_balance': decimal.Decimal('11'),
+            'inflow': decimal.Decimal('5'),
+            'outflow': decimal.Decimal('0'),
+            'count': 1,
+        }
+
+        self.assertEqual(BudgetDailyBalance.objects.compute_days(self.budget.pk), [may_1, may_3])
+        self.assertEqual(
+            BudgetDailyBalance.objects.compute_days(self.budget.pk, after=datetime.date(2021, 5, 2)), [may_3]
+        )
+        self.assertEqual(
+            BudgetDailyBalance.objects.compute_days(self.budget.pk, before=datetime.date(2021, 5, 1)), [may_1]
+        )
+
+    def test_compute_balance_on(self):
+        self.create_sharded_history()
+
+        self.assertEqual(BudgetDailyBalance.objects.compute_balance_on(self.budget.pk, datetime.date(2021, 4, 30)), 0)
+        self.assertEqual(BudgetDailyBalance.objects.compute_balance_on(self.budget.pk, datetime.date(2021, 5, 1)), 6)
+        self.assertEqual(BudgetDailyBalance.objects.compute_balance_on(self.budget.pk, datetime.date(2021, 5, 2)), 6)
+        self.assertEqual(BudgetDailyBalance.objects.compute_balance_on(self.budget.pk, datetime.date(2021, 6, 1)), 11)
+
+    def test_snapshots_are_rebuilt_when_sharding_is_disabled(self):
+        self.create_sharded_history()
+
+        Budget.objects.reshard(self.budget.pk, 1)
+
+        self.assertEqual(
+            self.get_snapshots(),
+            [
+                (
+                    datetime.date(2021, 5, 1),
+                    decimal.Decimal('0'),
+                    decimal.Decimal('6'),
+                    decimal.Decimal('10'),
+                    decimal.Decimal('4'),
+                    2,
+                ),
+                (
+                    datetime.date(2021, 5, 3),
+                    decimal.Decimal('6'),
+                    decimal.Decimal('11'),
+                    decimal.Decimal('5'),
+                    decimal.Decimal('0'),
+                    1,
+                ),
+            ],
+        )
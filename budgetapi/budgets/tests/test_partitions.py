@@ -0,0 +1,122 @@
+import datetime
+import json
+from io import StringIO
+from unittest import mock
+
+from budgets.factories import BudgetFactory, TransactionFactory
+from budgets.models import Transaction
+from budgets.partitions import (
+    DEFAULT_PARTITION,
+    add_months,
+    create_partition,
+    create_partitions_ahead,
+    detach_partitions,
+    list_partitions,
+    month_start,
+    partition_name,
+)
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+from .test_query_plans import iter_plan_nodes
+
+JANUARY = datetime.datetime(2021, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+class PartitionsTest(TestCase):
+    def setUp(self):
+        self.budget = BudgetFactory()
+
+    def get_partition(self, transaction: Transaction) -> str:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT tableoid::regclass::text FROM budgets_transaction WHERE id = %s', [transaction.pk])
+            return str(cursor.fetchone()[0])
+
+    def test_add_months(self):
+        self.assertEqual(add_months(JANUARY, 1), datetime.datetime(2021, 2, 1, tzinfo=datetime.timezone.utc))
+        self.assertEqual(add_months(JANUARY, 12), datetime.datetime(2022, 1, 1, tzinfo=datetime.timezone.utc))
+        self.assertEqual(add_months(JANUARY, -1), datetime.datetime(2020, 12, 1, tzinfo=datetime.timezone.utc))
+
+    def test_current_months_are_partitioned(self):
+        current = month_start(timezone.now())
+
+        partitions = list_partitions()
+
+        self.assertIn(partition_name(current), [partition.name for partition in partitions])
+        self.assertEqual(create_partitions_ahead(1), [])
+
+    def test_create_partition_moves_rows_from_default_partition(self):
+        transaction = TransactionFactory(budget=self.budget, created_at=JANUARY + datetime.timedelta(days=3))
+        other = TransactionFactory(budget=self.budget, created_at=add_months(JANUARY, 1))
+        self.assertEqual(self.get_partition(transaction), DEFAULT_PARTITION)
+
+        partition = create_partition(JANUARY)
+
+        self.assertEqual(partition.name, 'budgets_transaction_p2021_01')
+        self.assertEqual(self.get_partition(transaction), partition.name)
+        self.assertEqual(self.get_partition(other), DEFAULT_PARTITION)
+        self.assertIsNone(create_partition(JANUARY))
+        self.assertEqual(Transaction.objects.filter(budget=self.budget).count(), 2)
+
+    def test_create_partition_locks_default_partition(self):
+        create_partition(JANUARY)
+
+        # locks are held until the end of the test transaction
+        with connection.cursor() as cursor:
+            cursor.execute(
+                '''
+                SELECT mode FROM pg_locks
+                WHERE pid = pg_backend_pid() AND relation = %s::regclass AND mode = 'ShareRowExclusiveLock'
+                ''',
+                [DEFAULT_PARTITION],
+            )
+            self.assertEqual(cursor.fetchall(), [('ShareRowExclusiveLock',)])
+
+    def test_history_query_prunes_partitions(self):
+        for offset in range(3):
+            create_partition(add_months(JANUARY, offset))
+        queryset = Transaction.objects.filter(
+            budget=self.budget, created_at__gte=add_months(JANUARY, 1), created_at__lt=add_months(JANUARY, 2)
+        ).order_by('-created_at', '-id')
+        sql, params = queryset.query.sql_with_params()
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+
+        relations = {node['Relation Name'] for node in iter_plan_nodes(plan[0]['Plan']) if 'Relation Name' in node}
+        self.assertEqual(relations, {'budgets_transaction_p2021_02'})
+
+    def test_detach_partitions(self):
+        create_partition(JANUARY)
+        create_partition(add_months(JANUARY, 1))
+        transaction = TransactionFactory(budget=self.budget, created_at=JANUARY)
+
+        detached = detach_partitions(add_months(JANUARY, 1))
+
+        self.assertEqual([partition.name for partition in detached], ['budgets_transaction_p2021_01'])
+        self.assertNotIn('budgets_transaction_p2021_01', [partition.name for partition in list_partitions()])
+        self.assertFalse(Transaction.objects.filter(pk=transaction.pk).exists())
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM budgets_transaction_p2021_01')
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    def test_command(self):
+        create_partition(JANUARY)
+        output = StringIO()
+
+        with mock.patch('django.utils.timezone.now', return_value=add_months(JANUARY, 2)):
+            call_command('transaction_partitions', ahead=1, retention=1, drop=True, stdout=output)
+
+        self.assertEqual(
+            output.getvalue(),
+            'Created budgets_transaction_p2021_03\nCreated budgets_transaction_p2021_04\n'
+            'Dropped budgets_transaction_p2021_01\n',
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT to_regclass('budgets_transaction_p2021_01')")
+            self.assertIsNone(cursor.fetchone()[0])
@@ -0,0 +1,75 @@
+import tempfile
+from io import StringIO
+
+from budgets.factories import BudgetFactory, UserFactory
+from budgets.profiling import PROFILING_LOCK_KEY, list_profiles
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+
+class ProfilingTest(APITestCase):
+    def setUp(self):
+        cache.delete(PROFILING_LOCK_KEY)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(BUDGETS_PROFILE_DIR=directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = UserFactory(is_staff=True)
+        self.budget = BudgetFactory(creator=self.user, members=(self.user,))
+        self.url = reverse('budgets:transactions', kwargs=dict(pk=self.budget.pk))
+        self.client.force_authenticate(self.user)
+
+    def test_profile_request(self):
+        response = self.client.get(self.url, HTTP_X_PROFILE='1')
+
+        self.assertEqual(response.status_code, 200)
+        profiles = list_profiles()
+        self.assertEqual(len(profiles), 1)
+        self.assertEqual(response['X-Profile'], profiles[0]['name'])
+        self.assertEqual(profiles[0]['route'], 'budgets:transactions')
+        self.assertEqual(profiles[0]['budget_id'], self.budget.pk)
+        self.assertEqual(profiles[0]['user_id'], self.user.pk)
+        self.assertEqual(profiles[0]['status'], 200)
+
+    def test_profile_request_with_query_param(self):
+        response = self.client.get(self.url, {'profile': 'true'})
+
+        self.assertIn('X-Profile', response)
+
+    def test_profiling_is_rate_limited(self):
+        self.client.get(self.url, HTTP_X_PROFILE='1')
+        response = self.client.get(self.url, HTTP_X_PROFILE='1')
+
+        self.assertNotIn('X-Profile', response)
+        self.assertEqual(len(list_profiles()), 1)
+
+    def test_profiling_is_staff_only(self):
+        user = UserFactory(is_staff=False)
+        self.budget.members.add(user)
+        self.client.force_authenticate(user)
+
+        response = self.client.get(self.url, HTTP_X_PROFILE='1')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Profile', response)
+        self.assertEqual(list_profiles(), [])
+
+    def test_show_profiles(self):
+        name = self.client.get(self.url, HTTP_X_PROFILE='1')['X-Profile']
+
+        output = StringIO()
+        call_command('show_profiles', route='budgets:transactions', stdout=output)
+        self.assertIn(f'{name}  GET {self.url} status=200', output.getvalue())
+
+        output = StringIO()
+        call_command('show_profiles', budget=self.budget.pk + 1, stdout=output)
+        self.assertEqual(output.getvalue(), 'No profiles\n')
+
+        output = StringIO()
+        call_command('show_profiles', name, lines=5, stdout=output)
+        self.assertIn('function calls', output.getvalue())
@@ -0,0 +1,108 @@
+import datetime
+import decimal
+import json
+from typing import Iterator, List
+
+import pytz
+from budgets.factories import UserFactory
+from budgets.memberships import membership_cache
+from budgets.models import Budget, Transaction, TransactionType
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+BUDGETS_COUNT = 1000
+TRANSACTIONS_PER_BUDGET = 50
+LARGE_RELATIONS = ('budgets_budget', 'budgets_budget_members', 'budgets_transaction')
+
+
+def iter_plan_nodes(node: dict) -> Iterator[dict]:
+    yield node
+    for child in node.get('Plans', []):
+        yield from iter_plan_nodes(child)
+
+
+class QueryPlanTest(APITestCase):
+    """
+    Runs EXPLAIN for every query issued by the hot endpoints against a seeded dataset and fails when the planner falls
+    back to a sequential scan of one of the large tables or an explicit sort.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.member = UserFactory()
+        cls.budgets = Budget.objects.bulk_create(
+            Budget(creator=cls.member, balance=decimal.Decimal('1000')) for _ in range(BUDGETS_COUNT)
+        )
+        Budget.members.through.objects.bulk_create(
+            Budget.members.through(budget=budget, user=cls.member) for budget in cls.budgets
+        )
+        start = datetime.datetime(2021, 1, 1, tzinfo=pytz.UTC)
+        Transaction.objects.bulk_create(
+            Transaction(
+                creator=cls.member,
+                budget=budget,
+                amount=decimal.Decimal('1'),
+                title='Debt',
+                type=TransactionType.TRANSFER,
+                current_balance=decimal.Decimal('1000'),
+            )
+            for budget in cls.budgets
+            for _ in range(TRANSACTIONS_PER_BUDGET)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'UPDATE budgets_transaction SET created_at = %s + id * INTERVAL \'1 hour\'',
+                [start],
+            )
+            cursor.execute('ANALYZE')
+        cls.budget = cls.budgets[len(cls.budgets) // 2]
+
+    def setUp(self):
+        self.client.force_authenticate(self.member)
+        # memberships are cached, the member of every budget would rightly be fetched with a sequential scan
+        membership_cache.get(self.member.pk)
+
+    def assertNoSequentialScansOrSorts(self, queries: List[dict]) -> None:
+        self.assertTrue(queries)
+        for query in queries:
+            sql = query['sql']
+            if not sql.startswith(('SELECT', 'UPDATE', 'INSERT', 'DELETE')):
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+                plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            for node in iter_plan_nodes(plan[0]['Plan']):
+                # the transaction table is scanned through its monthly partitions
+                relation = node.get('Relation Name', '')
+                if relation in LARGE_RELATIONS or relation.startswith('budgets_transaction_'):
+                    self.assertNotEqual(node['Node Type'], 'Seq Scan', msg=f'{sql}\n{plan}')
+                self.assertNotEqual(node['Node Type'], 'Sort', msg=f'{sql}\n{plan}')
+
+    def test_transaction_history(self):
+        url = reverse('budgets:transactions', kwargs=dict(pk=self.budget.pk))
+        transactions = Transaction.objects.filter(budget=self.budget).order_by('created_at')
+        data = {
+            'created_at_after': transactions[5].created_at.isoformat(),
+            'created_at_before': transactions[40].created_at.isoformat(),
+            'page_size': 10,
+        }
+
+        with CaptureQueriesContext(connection) as queries:
+            first_page = self.client.get(url, data=data).json()
+            self.client.get(first_page['next'])
+            self.client.get(first_page['next'].replace('page_size=10', 'page_size=100'))
+
+        self.assertNoSequentialScansOrSorts(queries.captured_queries)
+
+    def test_budget_balance(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('budgets:budget-details', kwargs=dict(pk=self.budget.pk)))
+            self.client.post(
+                reverse('budgets:create-withdrawal', kwargs=dict(pk=self.budget.pk)), data=dict(amount='1.00')
+            )
+
+        self.assertNoSequentialScansOrSorts(queries.captured_queries)
@@ -0,0 +1,128 @@
+import datetime
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from budgets.categorization import category_index
+from budgets.factories import BudgetFactory, CategoryFactory, TransactionFactory
+from budgets.models import Budget, Category, TransactionType
+from budgets.summaries import month_start, summary_cache_key
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.utils import timezone
+
+
+class RecategorizeTransactionsTest(TestCase):
+    def setUp(self):
+        category_index.clear()
+        cache.clear()
+        self.transport = CategoryFactory(name='transport', tags=['bilet'])
+        self.education = CategoryFactory(name='edukacja', tags=['książka'])
+        self.budget = BudgetFactory()
+        self.transactions = [
+            self.create_transaction('Kupiłem bilet na przejazd', self.transport),
+            self.create_transaction('Za przejazd samochodem', None),
+            self.create_transaction('Za podręczniki', None),
+            self.create_transaction('Za książki i podręczniki', self.education),
+        ]
+        self.withdrawal = self.create_transaction('', None, type=TransactionType.WITHDRAWAL)
+
+    def create_transaction(self, title, category, **kwargs):
+        kwargs.setdefault('type', TransactionType.TRANSFER)
+        return TransactionFactory(
+            budget=self.budget, creator=self.budget.creator, title=title, category=category, **kwargs
+        )
+
+    def change_tags(self, category, tags):
+        Category.objects.filter(pk=category.pk).update(tags=tags)
+        category_index.clear()
+
+    def get_categories(self):
+        for transaction in self.transactions:
+            transaction.refresh_from_db()
+        return [transaction.category_id for transaction in self.transactions]
+
+    def recategorize(self, **options):
+        output = StringIO()
+        call_command('recategorize_transactions', workers=1, stdout=output, **options)
+        return output.getvalue()
+
+    def test_recategorize(self):
+        self.change_tags(self.transport, ['przejazd'])
+        self.change_tags(self.education, ['podręcznik'])
+        version = Budget.objects.get(pk=self.budget.pk).version
+
+        output = self.recategorize(chunk_size=2)
+
+        self.assertIn('Checked 4 transfers with 4 unique titles and updated 2 in', output)
+        self.assertEqual(
+            self.get_categories(), [self.transport.pk, self.transport.pk, self.education.pk, self.education.pk]
+        )
+        self.withdrawal.refresh_from_db()
+        self.assertIsNone(self.withdrawal.category_id)
+        # touched once for each chunk with changes
+        self.assertEqual(Budget.objects.get(pk=self.budget.pk).version, version + 2)
+
+    def test_recategorize_in_worker_processes(self):
+        self.change_tags(self.education, ['podręcznik'])
+
+        call_command('recategorize_transactions', workers=2, stdout=StringIO())
+
+        self.assertEqual(self.get_categories(), [self.transport.pk, None, self.education.pk, self.education.pk])
+
+    def test_recategorize_selected_categories(self):
+        self.change_tags(self.transport, ['przejazd', 'podręcznik'])
+        self.change_tags(self.education, ['nic'])
+
+        self.recategorize(categories=[self.transport.pk])
+
+        # transport has a lower id, so it wins over education for titles matching both
+        self.assertEqual(
+            self.get_categories(), [self.transport.pk, self.transport.pk, self.transport.pk, self.transport.pk]
+        )
+
+        # a stale category with an id lower than all selected ones is left alone
+        self.transactions[0].category = self.education
+        self.transactions[0].save()
+        other = CategoryFactory(name='inne', tags=['bilet'])
+        self.recategorize(categories=[other.pk])
+
+        self.assertEqual(self.get_categories()[0], self.education.pk)
+
+    def test_invalidates_closed_month_summaries(self):
+        last_month = month_start(month_start(timezone.now()) - datetime.timedelta(days=1))
+        transaction = self.create_transaction('Kupiłem podręcznik', None, created_at=last_month)
+        key = summary_cache_key(self.budget.pk, last_month)
+        cache.set(key, [])
+        self.change_tags(self.education, ['podręcznik'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recategorize()
+
+        transaction.refresh_from_db()
+        self.assertEqual(transaction.category_id, self.education.pk)
+        self.assertIsNone(cache.get(key))
+
+    def test_checkpoint(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        checkpoint = Path(directory.name) / 'recategorize.json'
+        checkpoint.write_text(json.dumps({'categories': [], 'after_id': self.transactions[1].pk}))
+        self.change_tags(self.transport, ['przejazd'])
+        self.change_tags(self.education, ['podręcznik'])
+
+        output = self.recategorize(checkpoint=checkpoint)
+
+        self.assertIn(f'Resuming after transaction {self.transactions[1].pk}', output)
+        self.assertEqual(self.get_categories(), [self.transport.pk, None, self.education.pk, self.education.pk])
+        self.assertFalse(checkpoint.exists())
+
+        checkpoint.write_text(json.dumps({'categories': [], 'after_id': 0}))
+        with self.assertRaisesMessage(CommandError, f'Checkpoint {checkpoint} was written for other categories.'):
+            self.recategorize(checkpoint=checkpoint, categories=[self.transport.pk])
+
+    def test_unknown_category(self):
+        with self.assertRaisesMessage(CommandError, 'Categories 0 do not exist.'):
+            self.recategorize(categories=[0])
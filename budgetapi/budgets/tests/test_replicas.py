@@ -0,0 +1,210 @@
+import asyncio
+from unittest import mock, skipUnless
+
+from budgets.factories import BudgetFactory, TransactionFactory, UserFactory
+from budgets.models import Transaction
+from django.conf import settings
+from django.core.cache.backends.db import BaseDatabaseCache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase, APITransactionTestCase
+
+from budgetapi.replicas import PrimaryPinMiddleware, ReplicaRouter, pinned_to_primary, read_from_replica, replica_reads
+
+REPLICA = 'replica'
+
+
+@override_settings(REPLICA_DATABASE='replica')
+class ReplicaRouterTest(SimpleTestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def test_reads_go_to_primary_by_default(self):
+        self.assertIsNone(self.router.db_for_read(Transaction))
+
+    def test_reads_from_replica(self):
+        with read_from_replica():
+            self.assertEqual(self.router.db_for_read(Transaction), 'replica')
+
+    def test_pinned_reads_go_to_primary(self):
+        token = pinned_to_primary.set(True)
+        try:
+            with read_from_replica():
+                self.assertIsNone(self.router.db_for_read(Transaction))
+        finally:
+            pinned_to_primary.reset(token)
+
+    def test_cache_reads_go_to_primary(self):
+        cache_model = BaseDatabaseCache('django_cache', {}).cache_model_class
+
+        with read_from_replica():
+            self.assertEqual(self.router.db_for_read(cache_model), DEFAULT_DB_ALIAS)
+
+    @override_settings(REPLICA_DATABASE=None)
+    def test_without_replica(self):
+        with read_from_replica():
+            self.assertIsNone(self.router.db_for_read(Transaction))
+
+    def test_writes_and_migrations_go_to_primary(self):
+        with read_from_replica():
+            self.assertEqual(self.router.db_for_write(Transaction), DEFAULT_DB_ALIAS)
+        self.assertTrue(self.router.allow_migrate(DEFAULT_DB_ALIAS, 'budgets'))
+        self.assertFalse(self.router.allow_migrate('replica', 'budgets'))
+
+
+@override_settings(REPLICA_PIN_SECONDS=5)
+class PrimaryPinMiddlewareTest(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def test_successful_write_pins_to_primary(self):
+        middleware = PrimaryPinMiddleware(lambda request: HttpResponse(status=201))
+
+        response = middleware(self.factory.post('/'))
+
+        self.assertEqual(response.cookies['pin_primary']['max-age'], 5)
+
+    def test_failed_write_and_read_do_not_pin(self):
+        self.assertNotIn(
+            'pin_primary',
+            PrimaryPinMiddleware(lambda request: HttpResponse(status=400))(self.factory.post('/')).cookies,
+        )
+        self.assertNotIn(
+            'pin_primary', PrimaryPinMiddleware(lambda request: HttpResponse())(self.factory.get('/')).cookies
+        )
+
+    def test_pinned_request(self):
+        pinned = []
+
+        def get_response(request):
+            pinned.append(pinned_to_primary.get())
+            return HttpResponse()
+
+        middleware = PrimaryPinMiddleware(get_response)
+        middleware(self.factory.get('/'))
+        request = self.factory.get('/')
+        request.COOKIES['pin_primary'] = '1'
+        middleware(request)
+
+        self.assertEqual(pinned, [False, True])
+        self.assertFalse(pinned_to_primary.get())
+
+    async def test_async_request(self):
+        pinned = []
+
+        async def get_response(request):
+            pinned.append(pinned_to_primary.get())
+            return HttpResponse(status=201)
+
+        middleware = PrimaryPinMiddleware(get_response)
+        request = self.factory.post('/')
+        request.COOKIES['pin_primary'] = '1'
+
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        response = await middleware(request)
+        self.assertEqual(pinned, [True])
+        self.assertEqual(response.cookies['pin_primary']['max-age'], 5)
+        self.assertFalse(pinned_to_primary.get())
+
+
+class ReplicaReadViewsTest(APITestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.budget = BudgetFactory(creator=self.user, members=(self.user,), balance=100)
+        self.client.force_authenticate(self.user)
+
+    def get_replica_reads(self, method, url, **kwargs):
+        reads = []
+
+        def db_for_read(model, **hints):
+            reads.append(replica_reads.get() and not pinned_to_primary.get())
+            return None
+
+        with mock.patch.object(ReplicaRouter, 'db_for_read', side_effect=db_for_read):
+            response = getattr(self.client, method)(url, **kwargs)
+        self.assertLess(response.status_code, 400)
+        return reads
+
+    def test_transaction_list_reads_from_replica(self):
+        reads = self.get_replica_reads('get', reverse('budgets:transactions', kwargs=dict(pk=self.budget.pk)))
+
+        self.assertTrue(reads)
+        self.assertTrue(all(reads))
+
+    def test_export_reads_from_replica(self):
+        url = reverse('budgets:export-transactions', kwargs=dict(pk=self.budget.pk))
+        reads = self.get_replica_reads('get', url)
+
+        self.assertTrue(all(reads))
+
+    def test_transfer_uses_primary(self):
+        url = reverse('budgets:create-transfer', kwargs=dict(pk=self.budget.pk))
+        reads = self.get_replica_reads('post', url, data={'amount': '1.00', 'title': 'bilet'})
+
+        self.assertFalse(any(reads))
+        self.assertIn('pin_primary', self.client.cookies)
+
+    def test_reads_after_write_use_primary(self):
+        self.client.post(
+            reverse('budgets:create-transfer', kwargs=dict(pk=self.budget.pk)), data={'amount': '1.00', 'title': 'a'}
+        )
+
+        reads = self.get_replica_reads('get', reverse('budgets:transactions', kwargs=dict(pk=self.budget.pk)))
+
+        self.assertFalse(any(reads))
+
+
+@skipUnless(REPLICA in settings.DATABASES, 'No replica database is configured, set POSTGRES_REPLICA_HOST.')
+@override_settings(REPLICA_DATABASE=REPLICA)
+class ReplicaDatabaseTest(APITransactionTestCase):
+    """
+    Runs against the configured replica alias, which mirrors the default database in tests. The replica has its own
+    connection, so the data has to be committed for it to see it.
+    """
+
+    # the runner sets up the databases of skipped tests too
+    databases = {DEFAULT_DB_ALIAS, REPLICA} if REPLICA in settings.DATABASES else {DEFAULT_DB_ALIAS}
+
+    def setUp(self):
+        self.user = UserFactory()
+        self.budget = BudgetFactory(creator=self.user, members=(self.user,))
+        TransactionFactory(budget=self.budget)
+        self.client.force_authenticate(self.user)
+        self.url = reverse('budgets:transactions', kwargs=dict(pk=self.budget.pk))
+
+    def get_queries(self, method, url, **kwargs):
+        with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as primary, CaptureQueriesContext(
+            connections[REPLICA]
+        ) as replica:
+            response = getattr(self.client, method)(url, **kwargs)
+        self.assertLess(response.status_code, 400)
+        return [query['sql'] for query in primary], [query['sql'] for query in replica]
+
+    def test_transaction_list_is_read_from_replica(self):
+        primary, replica = self.get_queries('get', self.url)
+
+        self.assertTrue(any('budgets_transaction' in sql for sql in replica))
+        self.assertFalse(any('budgets_transaction' in sql for sql in primary))
+
+    def test_reads_after_write_use_primary(self):
+        primary, replica = self.get_queries(
+            'post',
+            reverse('budgets:create-transfer', kwargs=dict(pk=self.budget.pk)),
+            data={'amount': '1.00', 'title': 'bilet'},
+        )
+        self.assertFalse(replica)
+
+        primary, replica = self.get_queries('get', self.url)
+
+        self.assertFalse(replica)
+        self.assertTrue(any('budgets_transaction' in sql for sql in primary))
+
+    def test_writes_go_to_primary(self):
+        with read_from_replica():
+            transaction = TransactionFactory(budget=self.budget)
+
+            self.assertEqual(transaction._state.db, DEFAULT_DB_ALIAS)
+            self.assertEqual(Transaction.objects.filter(pk=transaction.pk).db, REPLICA)
@@ -1,17 +1,23 @@
 import decimal
 
-from budgets.factories import BudgetFactory, CategoryFactory, UserFactory
-from budgets.models import TransactionType
+from budgets.categorization import category_index
+from budgets.factories import BudgetFactory, CategoryFactory, TransactionFactory, UserFactory
+from budgets.memberships import membership_cache
+from budgets.models import Budget, BudgetBalanceShard, BudgetDailyBalance, Transaction, TransactionType
+from budgets.renderers import FastCamelCaseJSONRenderer
 from budgets.serializers import (
     BudgetAddMemberSerializer,
+    BudgetBulkMembersSerializer,
     BudgetSerializer,
+    FastTransactionSerializer,
+    TransactionBatchSerializer,
+    TransactionSerializer,
     TransferSerializer,
     WithdrawalSerializer,
-    categorize_title,
-    text_stemming,
 )
 from django.http import HttpRequest
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from djangorestframework_camel_case.render import CamelCaseJSONRenderer
 from rest_framework import serializers
 from rest_framework.exceptions import ErrorDetail
 
@@ -57,7 +63,89 @@ class BudgetAddMemberSerializerTest(TestCase):
         self.assertEqual(list(budget.members.all().order_by('id')), [creator, member])
 
 
+class BudgetBulkMembersSerializerTest(TestCase):
+    def setUp(self):
+        self.creator, self.member = UserFactory.create_batch(2)
+        self.budget = BudgetFactory(creator=self.creator, members=(self.creator, self.member))
+
+    def save(self, data):
+        serializer = BudgetBulkMembersSerializer(data=data, context=dict(budget=self.budget))
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return serializer.data['results']
+
+    def test_add_and_remove_members(self):
+        new_members = UserFactory.create_batch(3)
+        user_ids = [user.pk for user in new_members]
+
+        results = self.save({'add': user_ids + [self.member.pk, 0], 'remove': [self.creator.pk]})
+
+        self.assertEqual(
+            results,
+            [
+                *({'user': user_id, 'outcome': 'added'} for user_id in user_ids),
+                {'user': self.member.pk, 'outcome': 'already_member'},
+                {'user': 0, 'outcome': 'not_found'},
+                {'user': self.creator.pk, 'outcome': 'creator'},
+            ],
+        )
+        self.assertEqual(
+            set(self.budget.members.values_list('pk', flat=True)), {self.creator.pk, self.member.pk, *user_ids}
+        )
+
+        results = self.save({'remove': [self.member.pk, self.member.pk, new_members[0].pk, 0]})
+
+        self.assertEqual(
+            results,
+            [
+                {'user': self.member.pk, 'outcome': 'removed'},
+                {'user': new_members[0].pk, 'outcome': 'removed'},
+                {'user': 0, 'outcome': 'not_found'},
+            ],
+        )
+        self.assertEqual(set(self.budget.members.values_list('pk', flat=True)), {self.creator.pk, *user_ids[1:]})
+
+    def test_invalidates_membership_cache(self):
+        user = UserFactory()
+        self.assertFalse(membership_cache.is_member(user.pk, self.budget.pk))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.save({'add': [user.pk]})
+
+        self.assertTrue(membership_cache.is_member(user.pk, self.budget.pk))
+
+    def test_number_of_queries_does_not_depend_on_number_of_users(self):
+        for count in (1, 10):
+            users = UserFactory.create_batch(count)
+
+            with self.assertNumQueries(7):
+                self.save({'add': [user.pk for user in users], 'remove': [self.member.pk]})
+
+            self.budget.members.add(self.member)
+
+    def test_same_user_cannot_be_added_and_removed(self):
+        serializer = BudgetBulkMembersSerializer(
+            data={'add': [self.member.pk], 'remove': [self.member.pk]}, context=dict(budget=self.budget)
+        )
+
+        self.assertEqual(serializer.is_valid(), False)
+        self.assertEqual(serializer.errors['non_field_errors'][0].code, 'invalid')
+
+    @override_settings(BUDGETS_BULK_MEMBERS_MAX_SIZE=2)
+    def test_too_many_users(self):
+        serializer = BudgetBulkMembersSerializer(data={'add': [1, 2, 3]}, context=dict(budget=self.budget))
+
+        self.assertEqual(serializer.is_valid(), False)
+        self.assertEqual(
+            serializer.errors['non_field_errors'],
+            [ErrorDetail('Ensure no more than 2 users are added and removed at once.', code='invalid')],
+        )
+
+
 class TransferSerializerTest(TestCase):
+    def setUp(self):
+        category_index.clear()
+
     def test_empty_data(self):
         serializer = TransferSerializer(data={})
 
@@ -82,7 +170,8 @@ class TransferSerializerTest(TestCase):
         )
 
     def test_transfer_money_to_budget(self):
-        education_category = CategoryFactory(name="edukacja", tags=['książka', 'podręcznik'])
+        with self.captureOnCommitCallbacks(execute=True):
+            education_category = CategoryFactory(name="edukacja", tags=['książka', 'podręcznik'])
         user = UserFactory()
         request = HttpRequest()
         request.user = user
@@ -105,6 +194,56 @@ class TransferSerializerTest(TestCase):
         self.assertEqual(transaction.category, education_category)
         self.assertEqual(transaction.current_balance, decimal.Decimal('20.80'))
 
+        daily_balance = BudgetDailyBalance.objects.get(budget=budget)
+        self.assertEqual(daily_balance.date, transaction.created_at.date())
+        self.assertEqual(daily_balance.opening_balance, decimal.Decimal('10.30'))
+        self.assertEqual(daily_balance.closing_balance, decimal.Decimal('20.80'))
+        self.assertEqual(daily_balance.inflow, decimal.Decimal('10.50'))
+        self.assertEqual(daily_balance.outflow, decimal.Decimal('0'))
+        self.assertEqual(daily_balance.count, 1)
+
+    def test_transfer_money_to_sharded_budget(self):
+        user = UserFactory()
+        request = HttpRequest()
+        request.user = user
+        budget = BudgetFactory(balance=decimal.Decimal('10.30'))
+        Budget.objects.reshard(budget.pk, 4)
+        budget.refresh_from_db()
+        serializer = TransferSerializer(
+            data={'title': 'Zwrot', 'amount': '10.50'}, context=dict(request=request, budget=budget)
+        )
+
+        serializer.is_valid(raise_exception=True)
+        transaction = serializer.save()
+
+        self.assertEqual(transaction.current_balance, decimal.Decimal('20.80'))
+        self.assertEqual(Budget.objects.get(pk=budget.pk).balance, decimal.Decimal('10.30'))
+        self.assertEqual(
+            sorted(BudgetBalanceShard.objects.filter(budget=budget).values_list('balance', flat=True)),
+            [0, 0, 0, decimal.Decimal('10.50')],
+        )
+        self.assertFalse(BudgetDailyBalance.objects.filter(budget=budget).exists())
+
+    def test_transfer_money_to_budget_sharded_no_more(self):
+        user = UserFactory()
+        request = HttpRequest()
+        request.user = user
+        budget = BudgetFactory(balance=decimal.Decimal('10.30'))
+        Budget.objects.reshard(budget.pk, 4)
+        budget.refresh_from_db()
+        Budget.objects.reshard(budget.pk, 1)
+        serializer = TransferSerializer(
+            data={'title': 'Zwrot', 'amount': '10.50'}, context=dict(request=request, budget=budget)
+        )
+
+        serializer.is_valid(raise_exception=True)
+        transaction = serializer.save()
+
+        self.assertEqual(transaction.current_balance, decimal.Decimal('20.80'))
+        daily_balance = BudgetDailyBalance.objects.get(budget=budget)
+        self.assertEqual(daily_balance.opening_balance, decimal.Decimal('10.30'))
+        self.assertEqual(daily_balance.closing_balance, decimal.Decimal('20.80'))
+
 
 class WithdrawalSerializerTest(TestCase):
     def test_empty_data(self):
@@ -169,18 +308,186 @@ class WithdrawalSerializerTest(TestCase):
         self.assertEqual(transaction.category, None)
         self.assertEqual(transaction.current_balance, decimal.Decimal('4.80'))
 
+        daily_balance = BudgetDailyBalance.objects.get(budget=budget)
+        self.assertEqual(daily_balance.opening_balance, decimal.Decimal('10.30'))
+        self.assertEqual(daily_balance.closing_balance, decimal.Decimal('4.80'))
+        self.assertEqual(daily_balance.inflow, decimal.Decimal('0'))
+        self.assertEqual(daily_balance.outflow, decimal.Decimal('5.50'))
+        self.assertEqual(daily_balance.count, 1)
+
+
+class TransactionBatchSerializerTest(TestCase):
+    def setUp(self):
+        category_index.clear()
+
+    def test_empty_data(self):
+        serializer = TransactionBatchSerializer(data={'transactions': []})
 
-class CategorizeTitle(TestCase):
-    def test_text_stemming(self):
+        self.assertEqual(serializer.is_valid(), False)
+        self.assertEqual(
+            serializer.errors,
+            {'transactions': {'non_field_errors': [ErrorDetail(string='This list may not be empty.', code='empty')]}},
+        )
+
+    def test_transfer_without_title(self):
+        serializer = TransactionBatchSerializer(
+            data={
+                'transactions': [
+                    {'type': TransactionType.WITHDRAWAL, 'amount': '10'},
+                    {'type': TransactionType.TRANSFER, 'amount': '10'},
+                ]
+            }
+        )
+
+        self.assertEqual(serializer.is_valid(), False)
+        self.assertEqual(
+            serializer.errors,
+            {'transactions': [{}, {'title': [ErrorDetail(string='This field is required.', code='required')]}]},
+        )
+
+    @override_settings(BUDGETS_BATCH_MAX_SIZE=1)
+    def test_too_many_transactions(self):
+        serializer = TransactionBatchSerializer(
+            data={'transactions': [{'type': TransactionType.WITHDRAWAL, 'amount': '10'}] * 2}
+        )
+
+        self.assertEqual(serializer.is_valid(), False)
+        self.assertEqual(
+            serializer.errors,
+            {'transactions': [ErrorDetail(string='Ensure this field has no more than 1 elements.', code='invalid')]},
+        )
+
+    def test_create_transactions(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            education_category = CategoryFactory(name="edukacja", tags=['książka', 'podręcznik'])
+        user = UserFactory()
+        request = HttpRequest()
+        request.user = user
+        budget = BudgetFactory(balance=decimal.Decimal('10.00'))
+        data = {
+            'transactions': [
+                {'type': TransactionType.WITHDRAWAL, 'amount': '10.00'},
+                {'type': TransactionType.TRANSFER, 'amount': '20.50', 'title': 'Oddaje pieniądze za książki'},
+                {'type': TransactionType.WITHDRAWAL, 'amount': '5.25'},
+            ]
+        }
+        serializer = TransactionBatchSerializer(data=data, context=dict(request=request, budget=budget))
+
+        serializer.is_valid(raise_exception=True)
+        category_index.match([])
+
+        # savepoint, lock, balance update, bulk insert, daily balance update and savepoint release
+        with self.assertNumQueries(6):
+            transactions = serializer.save()
+        budget.refresh_from_db()
+
+        self.assertEqual(budget.balance, decimal.Decimal('15.25'))
+        self.assertEqual(list(Transaction.objects.filter(budget=budget).order_by('id')), transactions)
+        self.assertEqual(
+            [(t.type, t.title, t.amount, t.category, t.current_balance, t.creator) for t in transactions],
+            [
+                (TransactionType.WITHDRAWAL, 'Withdrawal', decimal.Decimal('10.00'), None, decimal.Decimal('0'), user),
+                (
+                    TransactionType.TRANSFER,
+                    'Oddaje pieniądze za książki',
+                    decimal.Decimal('20.50'),
+                    education_category,
+                    decimal.Decimal('20.50'),
+                    user,
+                ),
+                (
+                    TransactionType.WITHDRAWAL,
+                    'Withdrawal',
+                    decimal.Decimal('5.25'),
+                    None,
+                    decimal.Decimal('15.25'),
+                    user,
+                ),
+            ],
+        )
+
+    def test_withdraw_more_than_available(self):
+        user = UserFactory()
+        request = HttpRequest()
+        request.user = user
+        budget = BudgetFactory(balance=decimal.Decimal('10.00'))
+        data = {
+            'transactions': [
+                {'type': TransactionType.WITHDRAWAL, 'amount': '20.00'},
+                {'type': TransactionType.TRANSFER, 'amount': '5.00', 'title': 'Debt'},
+                {'type': TransactionType.WITHDRAWAL, 'amount': '15.00'},
+            ]
+        }
+        serializer = TransactionBatchSerializer(data=data, context=dict(request=request, budget=budget))
+
+        serializer.is_valid(raise_exception=True)
+
+        with self.assertRaises(serializers.ValidationError) as cm:
+            serializer.save()
         self.assertEqual(
-            text_stemming('oddaję pieniądze za przejazd samochodem'),
-            ['oddawać', 'pieniądz', 'za', 'przejazd', 'samochód'],
+            cm.exception.detail,
+            {
+                'transactions': [
+                    {'amount': [ErrorDetail(string='Not enough funds in budget.', code='invalid')]},
+                    {},
+                    {},
+                ]
+            },
         )
 
-    def test_categorize_title(self):
-        transport_category = CategoryFactory(name="transport", tags=['bilet', 'przejazd'])
-        education_category = CategoryFactory(name="edukacja", tags=['książka', 'podręcznik'])
+        budget.refresh_from_db()
+
+        self.assertEqual(budget.balance, decimal.Decimal('10.00'))
+        self.assertEqual(Transaction.objects.filter(budget=budget).count(), 0)
+
+    def test_create_transactions_in_sharded_budget(self):
+        user = UserFactory()
+        request = HttpRequest()
+        request.user = user
+        budget = BudgetFactory(balance=decimal.Decimal('10.00'))
+        Budget.objects.reshard(budget.pk, 2)
+        BudgetBalanceShard.objects.filter(budget=budget).update(balance=decimal.Decimal('5.00'))
+        budget.refresh_from_db()
+        data = {'transactions': [{'type': TransactionType.WITHDRAWAL, 'amount': '18.00'}]}
+        serializer = TransactionBatchSerializer(data=data, context=dict(request=request, budget=budget))
+
+        serializer.is_valid(raise_exception=True)
+        transactions = serializer.save()
+
+        self.assertEqual(transactions[0].current_balance, decimal.Decimal('2.00'))
+        budget.refresh_from_db()
+        self.assertEqual(budget.balance, decimal.Decimal('2.00'))
+        self.assertEqual(budget.total_balance, decimal.Decimal('2.00'))
+
+
+class FastTransactionSerializerTest(TestCase):
+    def render(self, transactions):
+        queryset = Transaction.objects.filter(pk__in=[t.pk for t in transactions]).order_by('id')
+        old = CamelCaseJSONRenderer().render(
+            {'results': TransactionSerializer(queryset.select_related('creator', 'category'), many=True).data}
+        )
+        fast = FastCamelCaseJSONRenderer().render(
+            {'results': FastTransactionSerializer(queryset.values_list(*FastTransactionSerializer.fields)).data}
+        )
+        return old, fast
+
+    def test_matches_transaction_serializer(self):
+        transactions = [
+            TransactionFactory(amount=decimal.Decimal('10.5'), current_balance=decimal.Decimal('-3')),
+            TransactionFactory(category=None),
+        ]
+
+        old, fast = self.render(transactions)
+
+        self.assertEqual(fast, old)
+
+    @override_settings(TIME_ZONE='Europe/Warsaw')
+    def test_matches_transaction_serializer_in_local_time(self):
+        old, fast = self.render([TransactionFactory()])
+
+        self.assertEqual(fast, old)
+
+    def test_renderer_camelizes_other_data(self):
+        content = FastCamelCaseJSONRenderer().render({'non_field_errors': ['error'], 'nested': {'first_name': 'a'}})
 
-        self.assertEqual(categorize_title('Oddaje pieniądze'), None)
-        self.assertEqual(categorize_title('Oddaje pieniądze za ostatnie przejazdy samochodem'), transport_category)
-        self.assertEqual(categorize_title('Oddaje pieniądze za książki'), education_category)
+        self.assertEqual(content, b'{"nonFieldErrors":["error"],"nested":{"firstName":"a"}}')
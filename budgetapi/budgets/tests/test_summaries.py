@@ -0,0 +1,279 @@
+import datetime
+import decimal
+import multiprocessing
+
+import pytz
+from budgets.factories import BudgetFactory, CategoryFactory, TransactionFactory
+from budgets.models import TransactionType
+from budgets.recategorization import save_categories
+from budgets.summaries import downsample_daily_balances, get_summary, summary_cache_key
+from budgets.tests.utils import SharedCacheMixin
+from django.core.cache import cache
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase
+from freezegun import freeze_time
+
+
+@freeze_time('2021-07-15 12:00:00')
+class GetSummaryTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.budget = BudgetFactory()
+        self.category = CategoryFactory()
+
+    def create_transaction(self, amount, day, type=TransactionType.TRANSFER, category=None):
+        return TransactionFactory(
+            budget=self.budget,
+            amount=decimal.Decimal(amount),
+            type=type,
+            category=category,
+            created_at=datetime.datetime.combine(day, datetime.time(12), tzinfo=pytz.UTC),
+        )
+
+    def test_empty_budget(self):
+        self.assertEqual(get_summary(self.budget.pk), [])
+
+    def test_summary(self):
+        self.create_transaction('10.00', datetime.date(2021, 5, 3), category=self.category)
+        self.create_transaction('5.50', datetime.date(2021, 6, 3), category=self.category)
+        self.create_transaction('2.00', datetime.date(2021, 7, 3), category=self.category)
+        self.create_transaction('1.00', datetime.date(2021, 7, 4))
+        self.create_transaction('3.00', datetime.date(2021, 6, 4), type=TransactionType.WITHDRAWAL)
+        TransactionFactory(amount='100', category=self.category)
+
+        category = {'id': self.category.pk, 'name': self.category.name}
+        self.assertEqual(
+            get_summary(self.budget.pk),
+            [
+                {'month': None, 'category': None, 'type': 'TRANSFER', 'total': decimal.Decimal('1.00'), 'count': 1},
+                {'month': None, 'category': None, 'type': 'WITHDRAWAL', 'total': decimal.Decimal('3.00'), 'count': 1},
+                {
+                    'month': None,
+                    'category': category,
+                    'type': 'TRANSFER',
+                    'total': decimal.Decimal('17.50'),
+                    'count': 3,
+                },
+            ],
+        )
+
+    def test_summary_by_month(self):
+        self.create_transaction('10.00', datetime.date(2021, 5, 3), category=self.category)
+        self.create_transaction('5.50', datetime.date(2021, 6, 3), category=self.category)
+        self.create_transaction('2.00', datetime.date(2021, 6, 30), category=self.category)
+        self.create_transaction('1.00', datetime.date(2021, 7, 4), category=self.category)
+
+        category = {'id': self.category.pk, 'name': self.category.name}
+        self.assertEqual(
+            get_summary(self.budget.pk, by_month=True),
+            [
+                {
+                    'month': datetime.date(2021, 5, 1),
+                    'category': category,
+                    'type': 'TRANSFER',
+                    'total': decimal.Decimal('10.00'),
+                    'count': 1,
+                },
+                {
+                    'month': datetime.date(2021, 6, 1),
+                    'category': category,
+                    'type': 'TRANSFER',
+                    'total': decimal.Decimal('7.50'),
+                    'count': 2,
+                },
+                {
+                    'month': datetime.date(2021, 7, 1),
+                    'category': category,
+                    'type': 'TRANSFER',
+                    'total': decimal.Decimal('1.00'),
+                    'count': 1,
+                },
+            ],
+        )
+
+    def test_summary_of_date_range(self):
+        self.create_transaction('10.00', datetime.date(2021, 5, 3))
+        self.create_transaction('5.50', datetime.date(2021, 5, 20))
+        self.create_transaction('2.00', datetime.date(2021, 6, 10))
+        self.create_transaction('1.00', datetime.date(2021, 6, 25))
+
+        summary = get_summary(
+            self.budget.pk,
+            after=datetime.datetime(2021, 5, 10, tzinfo=pytz.UTC),
+            before=datetime.datetime(2021, 6, 20, tzinfo=pytz.UTC),
+        )
+
+        self.assertEqual(
+            summary,
+            [{'month': None, 'category': None, 'type': 'TRANSFER', 'total': decimal.Decimal('7.50'), 'count': 2}],
+        )
+
+    def test_closed_months_are_cached(self):
+        self.create_transaction('10.00', datetime.date(2021, 5, 3))
+        self.create_transaction('5.50', datetime.date(2021, 6, 3))
+        self.create_transaction('2.00', datetime.date(2021, 7, 3))
+        after = datetime.datetime(2021, 5, 1, tzinfo=pytz.UTC)
+
+        with self.assertNumQueries(2):
+            summary = get_summary(self.budget.pk, after=after)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(get_summary(self.budget.pk, after=after), summary)
+
+        self.assertEqual(
+            cache.get(summary_cache_key(self.budget.pk, datetime.datetime(2021, 6, 1, tzinfo=pytz.UTC))),
+            [
+                {
+                    'category_id': None,
+                    'category__name': None,
+                    'type': 'TRANSFER',
+                    'total': decimal.Decimal('5.50'),
+                    'count': 1,
+                }
+            ],
+        )
+
+    def test_editing_closed_month_invalidates_cache(self):
+        transaction = self.create_transaction('10.00', datetime.date(2021, 5, 3))
+        get_summary(self.budget.pk)
+        key = summary_cache_key(self.budget.pk, datetime.datetime(2021, 5, 1, tzinfo=pytz.UTC))
+        self.assertIsNotNone(cache.get(key))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            transaction.amount = decimal.Decimal('20.00')
+            transaction.save()
+
+        self.assertIsNone(cache.get(key))
+        self.assertEqual(get_summary(self.budget.pk)[0]['total'], decimal.Decimal('20.00'))
+
+    @freeze_time('2021-07-01 00:05:00')
+    def test_month_is_not_cached_right_after_it_closes(self):
+        self.create_transaction('10.00', datetime.date(2021, 5, 3))
+        self.create_transaction('5.50', datetime.date(2021, 6, 30))
+
+        get_summary(self.budget.pk)
+
+        self.assertIsNotNone(
+            cache.get(summary_cache_key(self.budget.pk, datetime.datetime(2021, 5, 1, tzinfo=pytz.UTC)))
+        )
+        self.assertIsNone(cache.get(summary_cache_key(self.budget.pk, datetime.datetime(2021, 6, 1, tzinfo=pytz.UTC))))
+
+
+def categorize(transaction, category_id):
+    try:
+        save_categories([(transaction.pk, transaction.created_at, transaction.budget_id, category_id)])
+    finally:
+        connection.close()
+
+
+@freeze_time('2021-07-15 12:00:00')
+class SummaryCacheAcrossProcessesTest(SharedCacheMixin, TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_recategorizing_in_other_process_invalidates_cached_month(self):
+        category = CategoryFactory()
+        transaction = TransactionFactory(
+            category=None, created_at=datetime.datetime(2021, 6, 3, tzinfo=pytz.UTC), type=TransactionType.TRANSFER
+        )
+        self.assertIsNone(get_summary(transaction.budget_id)[0]['category'])
+
+        # the forked process stands for a management command, it must not share the connection of this one
+        connections.close_all()
+        process = multiprocessing.get_context('fork').Process(target=categorize, args=(transaction, category.pk))
+        process.start()
+        process.join()
+
+        self.assertEqual(process.exitcode, 0)
+        self.assertEqual(get_summary(transaction.budget_id)[0]['category'], {'id': category.pk, 'name': category.name})
+
+
+class DownsampleDailyBalancesTest(TestCase):
+    def test_downsample(self):
+        days = [
+            {
+                'date': datetime.date(2021, 5, 3),
+                'opening_balance': 0,
+                'closing_balance': 5,
+                'inflow': 5,
+                'outflow': 0,
+                'count': 1,
+            },
+            {
+                'date': datetime.date(2021, 5, 9),
+                'opening_balance': 5,
+                'closing_balance': 3,
+                'inflow': 0,
+                'outflow': 2,
+                'count': 1,
+            },
+            {
+                'date': datetime.date(2021, 5, 10),
+                'opening_balance': 3,
+                'closing_balance': 9,
+                'inflow': 7,
+                'outflow': 1,
+                'count': 3,
+            },
+            {
+                'date': datetime.date(2021, 6, 1),
+                'opening_balance': 9,
+                'closing_balance': 10,
+                'inflow': 1,
+                'outflow': 0,
+                'count': 1,
+            },
+        ]
+
+        self.assertEqual(downsample_daily_balances(days, 'day'), days)
+        self.assertEqual(
+            downsample_daily_balances(days, 'week'),
+            [
+                {
+                    'date': datetime.date(2021, 5, 3),
+                    'opening_balance': 0,
+                    'closing_balance': 3,
+                    'inflow': 5,
+                    'outflow': 2,
+                    'count': 2,
+                },
+                {
+                    'date': datetime.date(2021, 5, 10),
+                    'opening_balance': 3,
+                    'closing_balance': 9,
+                    'inflow': 7,
+                    'outflow': 1,
+                    'count': 3,
+                },
+                {
+                    'date': datetime.date(2021, 5, 31),
+                    'opening_balance': 9,
+                    'closing_balance': 10,
+                    'inflow': 1,
+                    'outflow': 0,
+                    'count': 1,
+                },
+            ],
+        )
+        self.assertEqual(
+            downsample_daily_balances(days, 'month'),
+            [
+                {
+                    'date': datetime.date(2021, 5, 1),
+                    'opening_balance': 0,
+                    'closing_balance': 9,
+                    'inflow': 12,
+                    'outflow': 3,
+                    'count': 5,
+                },
+                {
+                    'date': datetime.date(2021, 6, 1),
+                    'opening_balance': 9,
+                    'closing_balance': 10,
+                    'inflow': 1,
+                    'outflow': 0,
+                    'count': 1,
+                },
+            ],
+        )
@@ -0,0 +1,113 @@
+import datetime
+from io import StringIO
+
+from budgets.memberships import membership_cache
+from budgets.models import Budget, BudgetDailyBalance, Transaction, TransactionType
+from budgets.synthetic import DatasetSpec, generate_dataset, plan_tasks, split_total, transaction_counts
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import transaction
+from django.test import TestCase
+
+END = datetime.datetime(2021, 10, 1, tzinfo=datetime.timezone.utc)
+SPEC = DatasetSpec(
+    seed=7,
+    users=20,
+    budgets=30,
+    categories=4,
+    transactions=600,
+    hot_budgets=2,
+    hot_share=0.3,
+    skew=1.1,
+    max_members=5,
+    start=END - datetime.timedelta(days=90),
+    end=END,
+)
+
+
+def dump():
+    return (
+        list(User.objects.order_by('pk').values_list('pk', 'username', 'first_name', 'last_name')),
+        list(Budget.objects.order_by('pk').values_list('pk', 'creator_id', 'balance', 'created_at', 'version')),
+        list(Budget.members.through.objects.order_by('budget_id', 'user_id').values_list('budget_id', 'user_id')),
+        list(Transaction.objects.order_by('pk').values_list()),
+    )
+
+
+class SyntheticDatasetTest(TestCase):
+    def tearDown(self):
+        # sequence resets are not rolled back, so later tests reuse ids of users cached by earlier ones
+        cache.clear()
+        membership_cache.clear()
+
+    def test_split_total(self):
+        self.assertEqual(split_total(10, [1, 1, 1]), [4, 3, 3])
+        self.assertEqual(split_total(7, [3, 1]), [5, 2])
+        self.assertEqual(split_total(5, []), [])
+
+    def test_transaction_counts(self):
+        counts = transaction_counts(SPEC)
+
+        self.assertEqual(len(counts), SPEC.budgets)
+        self.assertEqual(sum(counts), SPEC.transactions)
+        self.assertEqual(counts[:2], [90, 90])
+        self.assertGreater(max(counts[2:]), 5 * sorted(counts[2:])[len(counts) // 2])
+
+    def test_plan_tasks(self):
+        tasks = plan_tasks([5, 0, 3, 10, 1], 6)
+
+        self.assertEqual(
+            [(task.first_budget, task.counts, task.first_transaction) for task in tasks],
+            [
+                (0, [5, 0, 3], 0),
+                (3, [10], 8),
+                (4, [1], 18),
+            ],
+        )
+
+    def test_generate_is_deterministic(self):
+        with transaction.atomic():
+            counts = generate_dataset(SPEC, workers=1, batch_size=100)
+            first = dump()
+            transaction.set_rollback(True)
+        generate_dataset(SPEC, workers=1, batch_size=250)
+
+        self.assertEqual(dump(), first)
+        self.assertEqual(counts['transactions'], SPEC.transactions)
+        self.assertEqual(counts['budgets'], SPEC.budgets)
+        self.assertEqual(Budget.objects.get(pk=first[1][0][0]).members.count(), SPEC.max_members)
+
+    def test_balance_chains(self):
+        generate_dataset(SPEC, workers=1, batch_size=100)
+
+        for budget in Budget.objects.all():
+            balance = 0
+            transactions = Transaction.objects.filter(budget=budget).order_by('created_at', 'id')
+            for item in transactions:
+                balance += item.amount if item.type == TransactionType.TRANSFER else -item.amount
+                self.assertEqual(item.current_balance, balance)
+                self.assertGreaterEqual(item.created_at, budget.created_at)
+                self.assertTrue(budget.members.filter(pk=item.creator_id).exists())
+            self.assertEqual(budget.balance, balance)
+            self.assertEqual(budget.version, len(transactions))
+
+    def test_snapshots_match_transactions(self):
+        generate_dataset(SPEC, workers=1, batch_size=100)
+        fields = ('budget_id', 'date', 'opening_balance', 'closing_balance', 'inflow', 'outflow', 'count')
+        snapshots = list(BudgetDailyBalance.objects.order_by('budget_id', 'date').values_list(*fields))
+
+        BudgetDailyBalance.objects.rebuild(Budget.objects.values_list('pk', flat=True))
+
+        self.assertEqual(list(BudgetDailyBalance.objects.order_by('budget_id', 'date').values_list(*fields)), snapshots)
+
+    def test_command(self):
+        output = StringIO()
+
+        call_command('generate_dataset', users=5, budgets=3, transactions=50, workers=1, end=END.date(), stdout=output)
+
+        self.assertIn('transactions: 50\n', output.getvalue())
+        self.assertEqual(Transaction.objects.count(), 50)
+        self.assertLess(Transaction.objects.latest('created_at').created_at, END)
+        with self.assertRaisesMessage(CommandError, 'Hot share must be between 0 and 1.'):
+            call_command('generate_dataset', hot_share=2)
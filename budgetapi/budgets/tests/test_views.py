@@ -1,6 +1,14 @@
-from budgets.factories import BudgetFactory, TransactionFactory, UserFactory
-from budgets.models import Budget, Transaction
-from budgets.serializers import BudgetSerializer, TransactionSerializer, TransferSerializer
+import datetime
+import decimal
+import json
+
+import pytz
+from budgets.factories import BudgetFactory, CategoryFactory, TransactionFactory, UserFactory
+from budgets.models import Budget, BudgetDailyBalance, Transaction, TransactionType
+from budgets.serializers import BudgetSerializer, TransactionBatchSerializer, TransactionSerializer, TransferSerializer
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from djangorestframework_camel_case.util import camelize
 from rest_framework.test import APITestCase
@@ -23,6 +31,64 @@ class BudgetCreateAPIViewTest(APITestCase):
         self.assertDictEqual(response.json(), camelize(BudgetSerializer(budget).data))
 
 
+class BudgetListAPIViewTest(APITestCase):
+    def create_budgets(self, user, count):
+        budgets = [BudgetFactory(creator=user, members=(user, UserFactory(), UserFactory())) for _ in range(count)]
+        Budget.objects.reshard(budgets[0].pk, 2)
+        Budget.objects.deposit(budgets[0].pk, decimal.Decimal('2.50'), 2)
+        return budgets
+
+    def test_cannot_list_budgets_as_unauthenticated_user(self):
+        response = self.client.get(reverse('budgets:create-budget'))
+
+        self.assertEqual(response.status_code, 403)
+
+    def test_list_budgets(self):
+        user = UserFactory()
+        budgets = self.create_budgets(user, 2)
+        BudgetFactory()
+        self.client.force_authenticate(user)
+
+        response = self.client.get(reverse('budgets:create-budget'))
+
+        self.assertEqual(response.status_code, 200)
+        expected = [Budget.objects.prefetch_related('members').get(pk=budget.pk) for budget in reversed(budgets)]
+        self.assertEqual(response.json()['results'], camelize(BudgetSerializer(expected, many=True).data))
+        self.assertEqual(response.json()['results'][1]['balance'], f'{budgets[0].balance + decimal.Decimal("2.50")}')
+
+    def test_list_budgets_with_member_count(self):
+        user = UserFactory()
+        budgets = self.create_budgets(user, 2)
+        self.client.force_authenticate(user)
+
+        response = self.client.get(reverse('budgets:create-budget'), {'members': 'count'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([budget['id'] for budget in response.json()['results']], [budgets[1].pk, budgets[0].pk])
+        self.assertEqual([budget['memberCount'] for budget in response.json()['results']], [3, 3])
+        self.assertNotIn('members', response.json()['results'][0])
+
+    def test_list_budgets_with_invalid_members_format(self):
+        self.client.force_authenticate(UserFactory())
+
+        response = self.client.get(reverse('budgets:create-budget'), {'members': 'none'})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'members': ['Select one of: full, count.']})
+
+    def test_number_of_queries_does_not_depend_on_number_of_budgets(self):
+        for members_format, queries in (('full', 3), ('count', 2)):
+            for count in (1, 5):
+                user = UserFactory()
+                self.create_budgets(user, count)
+                self.client.force_authenticate(user)
+
+                with self.assertNumQueries(queries):
+                    response = self.client.get(reverse('budgets:create-budget'), {'members': members_format})
+
+                self.assertEqual(len(response.json()['results']), count)
+
+
 class BudgetRetrieveAPIViewTest(APITestCase):
     def test_cannot_retrieve_budget_as_unauthenticated_user(self):
         budget = BudgetFactory()
@@ -49,6 +115,129 @@ class BudgetRetrieveAPIViewTest(APITestCase):
         self.assertEqual(response.status_code, 200)
         self.assertDictEqual(response.json(), camelize(BudgetSerializer(budget).data))
 
+    def test_retrieve_sharded_budget(self):
+        user = UserFactory()
+        budget = BudgetFactory(creator=user, members=(user,), balance=10)
+        Budget.objects.reshard(budget.pk, 2)
+        Budget.objects.deposit(budget.pk, decimal.Decimal('2.50'), 2)
+        self.client.force_authenticate(user)
+
+        response = self.client.get(reverse('budgets:budget-details', kwargs=dict(pk=budget.pk)))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['balance'], '12.50')
+
+
+class BudgetConditionalGetTest(APITestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.budget = BudgetFactory(creator=self.user, members=(self.user,), balance=10)
+        self.client.force_authenticate(self.user)
+
+    def test_budget_details_not_modified(self):
+        url = reverse('budgets:budget-details', kwargs=dict(pk=self.budget.pk))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['ETag'])
+        self.assertTrue(response['Last-Modified'])
+
+        with self.assertNumQueries(1):
+            not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+        self.assertEqual(not_modified.content, b'')
+
+        not_modified = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_budget_details_modified(self):
+        url = reverse('budgets:budget-details', kwargs=dict(pk=self.budget.pk))
+        etag = self.client.get(url)['ETag']
+
+        Budget.objects.deposit(self.budget.pk, decimal.Decimal(1))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['balance'], '11.00')
+        self.assertNotEqual(response['ETag'], etag)
+        etag = response['ETag']
+
+        self.budget.members.add(UserFactory())
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['members']), 2)
+
+    def test_sharded_budget_details_modified(self):
+        Budget.objects.reshard(self.budget.pk, 2)
+        url = reverse('budgets:budget-details', kwargs=dict(pk=self.budget.pk))
+        etag = self.client.get(url)['ETag']
+
+        Budget.objects.deposit(self.budget.pk, decimal.Decimal(1), 2)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['balance'], '11.00')
+
+    def test_cannot_get_not_modified_response_for_someone_else_budget(self):
+        url = reverse('budgets:budget-details', kwargs=dict(pk=self.budget.pk))
+        etag = self.client.get(url)['ETag']
+        self.client.force_authenticate(UserFactory())
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 404)
+
+    def test_transaction_list_not_modified(self):
+        url = reverse('budgets:transactions', kwargs=dict(pk=self.budget.pk))
+        TransactionFactory(budget=self.budget)
+        etag = self.client.get(url)['ETag']
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        Budget.objects.withdraw(self.budget.pk, decimal.Decimal(1))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_transaction_list_modified_by_category_change(self):
+        url = reverse('budgets:transactions', kwargs=dict(pk=self.budget.pk))
+        category = CategoryFactory()
+        TransactionFactory(budget=self.budget, category=category)
+        etag = self.client.get(url)['ETag']
+
+        category.name = 'renamed'
+        category.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['category']['name'], 'renamed')
+        etag = response['ETag']
+
+        category.delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [])
+
+    def test_modified_by_user_change(self):
+        creator = UserFactory()
+        self.budget.members.add(creator)
+        TransactionFactory(budget=self.budget, creator=creator)
+        self.budget.members.remove(creator)
+        urls = [
+            reverse('budgets:budget-details', kwargs=dict(pk=self.budget.pk)),
+            reverse('budgets:transactions', kwargs=dict(pk=self.budget.pk)),
+        ]
+        etags = [self.client.get(url)['ETag'] for url in urls]
+
+        for user in (self.user, creator):
+            user.first_name = 'Renamed'
+            user.save()
+
+            for url, etag in zip(urls, etags):
+                self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+            etags = [self.client.get(url)['ETag'] for url in urls]
+
+        self.user.save(update_fields=['last_login'])
+        for url, etag in zip(urls, etags):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
 
 class BudgetAddMemberAPIViewTest(APITestCase):
     def test_cannot_add_new_member_to_budget_as_unauthenticated_user(self):
@@ -87,6 +276,33 @@ class BudgetAddMemberAPIViewTest(APITestCase):
         self.assertDictEqual(response.json(), {})
 
 
+class BudgetBulkMembersAPIViewTest(APITestCase):
+    def test_budget_member_cannot_manage_members(self):
+        member, user = UserFactory.create_batch(2)
+        budget = BudgetFactory(members=(member,))
+        self.client.force_authenticate(member)
+
+        response = self.client.post(
+            reverse('budgets:bulk-members', kwargs=dict(pk=budget.pk)), data={'add': [user.pk]}, format='json'
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_add_members(self):
+        creator = UserFactory()
+        users = UserFactory.create_batch(2)
+        budget = BudgetFactory(creator=creator, members=(creator,))
+        self.client.force_authenticate(creator)
+
+        response = self.client.post(
+            reverse('budgets:bulk-members', kwargs=dict(pk=budget.pk)),
+            data={'add': [user.pk for user in users]},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json(), {'results': [{'user': user.pk, 'outcome': 'added'} for user in users]})
+        self.assertEqual(budget.members.count(), 3)
+
+
 class TransactionListAPIViewTest(APITestCase):
     def test_cannot_get_transaction_list_as_unauthenticated_user(self):
         budget = BudgetFactory()
@@ -113,7 +329,379 @@ class TransactionListAPIViewTest(APITestCase):
 
         response = self.client.get(reverse('budgets:transactions', kwargs=dict(pk=budget.pk)))
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.json(), camelize(TransactionSerializer([transaction], many=True).data))
+        self.assertEqual(
+            response.json(),
+            {'next': None, 'previous': None, 'results': camelize(TransactionSerializer([transaction], many=True).data)},
+        )
+
+    def test_membership_is_checked_without_database_query(self):
+        member = UserFactory()
+        budget = BudgetFactory(members=(member,))
+        self.client.force_authenticate(member)
+        self.client.get(reverse('budgets:transactions', kwargs=dict(pk=budget.pk)))
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('budgets:transactions', kwargs=dict(pk=budget.pk)))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([query for query in context.captured_queries if 'budgets_budget_members' in query['sql']])
+
+    def test_paginate_transaction_list(self):
+        member = UserFactory()
+        budget = BudgetFactory(members=(member,))
+        transactions = [
+            TransactionFactory(
+                budget=budget, creator=member, created_at=datetime.datetime(2021, 5, day, tzinfo=pytz.UTC)
+            )
+            for day in (1, 2, 2, 3, 4)
+        ]
+        self.client.force_authenticate(member)
+        url = reverse('budgets:transactions', kwargs=dict(pk=budget.pk))
+
+        with CaptureQueriesContext(connection) as queries:
+            first_page = self.client.get(url, data={'page_size': 2}).json()
+            second_page = self.client.get(first_page['next']).json()
+            third_page = self.client.get(second_page['next']).json()
+
+        for query in queries:
+            self.assertNotIn('OFFSET', query['sql'])
+            self.assertNotIn('COUNT(', query['sql'])
+
+        self.assertEqual([t['id'] for t in first_page['results']], [transactions[4].pk, transactions[3].pk])
+        self.assertEqual([t['id'] for t in second_page['results']], [transactions[2].pk, transactions[1].pk])
+        self.assertEqual([t['id'] for t in third_page['results']], [transactions[0].pk])
+        self.assertIsNone(first_page['previous'])
+        self.assertIsNone(third_page['next'])
+
+        previous_page = self.client.get(third_page['previous']).json()
+        self.assertEqual(previous_page['results'], second_page['results'])
+        previous_page = self.client.get(previous_page['previous']).json()
+        self.assertEqual(previous_page['results'], first_page['results'])
+        self.assertIsNone(previous_page['previous'])
+
+    def test_paginate_filtered_transaction_list(self):
+        member = UserFactory()
+        budget = BudgetFactory(members=(member,))
+        transactions = [
+            TransactionFactory(
+                budget=budget, creator=member, created_at=datetime.datetime(2021, 5, day, tzinfo=pytz.UTC)
+            )
+            for day in (1, 2, 3, 4)
+        ]
+        self.client.force_authenticate(member)
+        url = reverse('budgets:transactions', kwargs=dict(pk=budget.pk))
+        data = {
+            'page_size': 1,
+            'created_at_after': datetime.datetime(2021, 5, 2, tzinfo=pytz.UTC).isoformat(),
+            'created_at_before': datetime.datetime(2021, 5, 3, 12, tzinfo=pytz.UTC).isoformat(),
+        }
+
+        first_page = self.client.get(url, data=data).json()
+        second_page = self.client.get(first_page['next']).json()
+
+        self.assertEqual([t['id'] for t in first_page['results']], [transactions[2].pk])
+        self.assertEqual([t['id'] for t in second_page['results']], [transactions[1].pk])
+        self.assertIsNone(second_page['next'])
+
+    def test_invalid_cursor(self):
+        member = UserFactory()
+        budget = BudgetFactory(members=(member,))
+        self.client.force_authenticate(member)
+
+        response = self.client.get(reverse('budgets:transactions', kwargs=dict(pk=budget.pk)), data={'cursor': 'abc'})
+        self.assertEqual(response.status_code, 404)
+        self.assertDictEqual(response.json(), {'detail': 'Invalid cursor'})
+
+
+class TransactionExportAPIViewTest(APITestCase):
+    def test_cannot_export_transactions_as_unauthenticated_user(self):
+        budget = BudgetFactory()
+
+        response = self.client.get(reverse('budgets:export-transactions', kwargs=dict(pk=budget.pk)))
+        self.assertEqual(response.status_code, 403)
+        self.assertDictEqual(response.json(), {'detail': 'Authentication credentials were not provided.'})
+
+    def test_cannot_export_transactions_from_someone_else_budget(self):
+        budget = BudgetFactory()
+        user = UserFactory()
+        self.client.force_authenticate(user)
+
+        response = self.client.get(reverse('budgets:export-transactions', kwargs=dict(pk=budget.pk)))
+        self.assertEqual(response.status_code, 404)
+        self.assertDictEqual(response.json(), {'detail': 'Not found.'})
+
+    def test_invalid_file_format(self):
+        member = UserFactory()
+        budget = BudgetFactory(members=(member,))
+        self.client.force_authenticate(member)
+
+        response = self.client.get(
+            reverse('budgets:export-transactions', kwargs=dict(pk=budget.pk)), data={'file_format': 'xml'}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertDictEqual(response.json(), {'fileFormat': ['Select one of: csv, ndjson.']})
+
+    def test_export_csv(self):
+        member = UserFactory(first_name='Jan', last_name='Kowalski')
+        budget = BudgetFactory(members=(member,))
+        transaction = TransactionFactory(
+            budget=budget,
+            creator=member,
+            title='Bilet, "ulgowy"',
+            amount='12.50',
+            current_balance='112.50',
+            created_at=datetime.datetime(2021, 5, 2, 10, 30, tzinfo=pytz.UTC),
+        )
+        TransactionFactory(budget=budget, created_at=datetime.datetime(2021, 6, 2, tzinfo=pytz.UTC))
+        TransactionFactory()
+        self.client.force_authenticate(member)
+
+        response = self.client.get(
+            reverse('budgets:export-transactions', kwargs=dict(pk=budget.pk)),
+            data={'created_at_before': datetime.datetime(2021, 6, 1, tzinfo=pytz.UTC).isoformat()},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(response['Content-Disposition'], f'attachment; filename="budget-{budget.pk}-transactions.csv"')
+        self.assertEqual(
+            b''.join(response.streaming_content).decode(),
+            'id,created_at,type,amount,title,current_balance,creator_id,creator_username,creator_first_name,'
+            'creator_last_name,category_id,category_name,category_pending\r\n'
+            f'{transaction.pk},2021-05-02T10:30:00Z,{transaction.type},12.50,"Bilet, ""ulgowy""",112.50,'
+            f'{member.pk},{member.username},Jan,Kowalski,{transaction.category.pk},{transaction.category.name},False\r\n',
+        )
+
+    def test_export_ndjson(self):
+        member = UserFactory()
+        budget = BudgetFactory(members=(member,))
+        transactions = [
+            TransactionFactory(
+                budget=budget, creator=member, created_at=datetime.datetime(2021, 5, 1, tzinfo=pytz.UTC)
+            ),
+            TransactionFactory(
+                budget=budget, creator=member, category=None, created_at=datetime.datetime(2021, 5, 2, tzinfo=pytz.UTC)
+            ),
+        ]
+        self.client.force_authenticate(member)
+
+        response = self.client.get(
+            reverse('budgets:export-transactions', kwargs=dict(pk=budget.pk)), data={'file_format': 'ndjson'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(
+            [json.loads(line) for line in lines],
+            camelize(TransactionSerializer(reversed(transactions), many=True).data),
+        )
+
+    @override_settings(BUDGETS_EXPORT_CHUNK_SIZE=2)
+    def test_export_is_streamed_in_chunks(self):
+        member = UserFactory()
+        budget = BudgetFactory(members=(member,))
+        transactions = [
+            TransactionFactory(budget=budget, created_at=datetime.datetime(2021, 5, day, tzinfo=pytz.UTC))
+            for day in (1, 2, 2, 2, 3)
+        ]
+        self.client.force_authenticate(member)
+
+        response = self.client.get(
+            reverse('budgets:export-transactions', kwargs=dict(pk=budget.pk)), data={'file_format': 'ndjson'}
+        )
+        content = iter(response.streaming_content)
+        with CaptureQueriesContext(connection) as queries:
+            first_chunk = next(content)
+        self.assertEqual(len(queries), 1)
+        self.assertIn('LIMIT 2', queries[0]['sql'])
+
+        lines = (first_chunk + b''.join(content)).decode().splitlines()
+        self.assertEqual(
+            [json.loads(line)['id'] for line in lines],
+            [transactions[4].pk, transactions[3].pk, transactions[2].pk, transactions[1].pk, transactions[0].pk],
+        )
+
+
+class TransactionSummaryAPIViewTest(APITestCase):
+    def test_cannot_get_summary_as_unauthenticated_user(self):
+        budget = BudgetFactory()
+
+        response = self.client.get(reverse('budgets:summary', kwargs=dict(pk=budget.pk)))
+        self.assertEqual(response.status_code, 403)
+        self.assertDictEqual(response.json(), {'detail': 'Authentication credentials were not provided.'})
+
+    def test_cannot_get_summary_of_someone_else_budget(self):
+        budget = BudgetFactory()
+        user = UserFactory()
+        self.client.force_authenticate(user)
+
+        response = self.client.get(reverse('budgets:summary', kwargs=dict(pk=budget.pk)))
+        self.assertEqual(response.status_code, 404)
+        self.assertDictEqual(response.json(), {'detail': 'Not found.'})
+
+    def test_invalid_bucket(self):
+        member = UserFactory()
+        budget = BudgetFactory(members=(member,))
+        self.client.force_authenticate(member)
+
+        response = self.client.get(reverse('budgets:summary', kwargs=dict(pk=budget.pk)), data={'bucket': 'year'})
+        self.assertEqual(response.status_code, 400)
+        self.assertDictEqual(response.json(), {'bucket': ['Select one of: month.']})
+
+    def test_get_summary(self):
+        member = UserFactory()
+        budget = BudgetFactory(members=(member,))
+        transaction = TransactionFactory(
+            budget=budget, amount='12.50', created_at=datetime.datetime(2021, 5, 2, tzinfo=pytz.UTC)
+        )
+        TransactionFactory(budget=budget, created_at=datetime.datetime(2021, 6, 2, tzinfo=pytz.UTC))
+        self.client.force_authenticate(member)
+
+        response = self.client.get(
+            reverse('budgets:summary', kwargs=dict(pk=budget.pk)),
+            data={
+                'created_at_before': datetime.datetime(2021, 6, 1, tzinfo=pytz.UTC).isoformat(),
+                'bucket': 'month',
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json(),
+            [
+                {
+                    'month': '2021-05-01',
+                    'category': {'id': transaction.category.pk, 'name': transaction.category.name},
+                    'type': transaction.type,
+                    'total': '12.50',
+                    'count': 1,
+                }
+            ],
+        )
+
+
+class BudgetBalanceHistoryAPIViewTest(APITestCase):
+    def test_cannot_get_balance_history_as_unauthenticated_user(self):
+        budget = BudgetFactory()
+
+        response = self.client.get(reverse('budgets:balance-history', kwargs=dict(pk=budget.pk)))
+        self.assertEqual(response.status_code, 403)
+        self.assertDictEqual(response.json(), {'detail': 'Authentication credentials were not provided.'})
+
+    def test_cannot_get_balance_history_of_someone_else_budget(self):
+        budget = BudgetFactory()
+        user = UserFactory()
+        self.client.force_authenticate(user)
+
+        response = self.client.get(reverse('budgets:balance-history', kwargs=dict(pk=budget.pk)))
+        self.assertEqual(response.status_code, 404)
+        self.assertDictEqual(response.json(), {'detail': 'Not found.'})
+
+    def test_get_balance_history(self):
+        member = UserFactory()
+        budget = BudgetFactory(members=(member,))
+        for day, closing_balance in ((1, 10), (2, 5), (15, 7), (20, 1)):
+            BudgetDailyBalance.objects.create(
+                budget=budget,
+                date=datetime.date(2021, 5, day),
+                opening_balance=0,
+                closing_balance=closing_balance,
+                inflow=closing_balance,
+                count=1,
+            )
+        self.client.force_authenticate(member)
+
+        response = self.client.get(
+            reverse('budgets:balance-history', kwargs=dict(pk=budget.pk)),
+            data={'date_after': '2021-05-02', 'date_before': '2021-05-16', 'bucket': 'week'},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json(),
+            [
+                {
+                    'date': '2021-04-26',
+                    'openingBalance': '0.00',
+                    'closingBalance': '5.00',
+                    'inflow': '5.00',
+                    'outflow': '0.00',
+                    'count': 1,
+                },
+                {
+                    'date': '2021-05-10',
+                    'openingBalance': '0.00',
+                    'closingBalance': '7.00',
+                    'inflow': '7.00',
+                    'outflow': '0.00',
+                    'count': 1,
+                },
+            ],
+        )
+
+    def test_get_balance_history_of_sharded_budget(self):
+        member = UserFactory()
+        budget = BudgetFactory(members=(member,), balance=0)
+        Budget.objects.reshard(budget.pk, 2)
+        for day, amount in ((1, 10), (2, 5)):
+            Budget.objects.deposit(budget.pk, decimal.Decimal(amount), 2)
+            TransactionFactory(
+                budget=budget,
+                amount=amount,
+                type=TransactionType.TRANSFER,
+                created_at=datetime.datetime(2021, 5, day, tzinfo=pytz.UTC),
+            )
+        self.client.force_authenticate(member)
+
+        response = self.client.get(
+            reverse('budgets:balance-history', kwargs=dict(pk=budget.pk)), data={'date_after': '2021-05-02'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json(),
+            [
+                {
+                    'date': '2021-05-02',
+                    'openingBalance': '10.00',
+                    'closingBalance': '15.00',
+                    'inflow': '5.00',
+                    'outflow': '0.00',
+                    'count': 1,
+                },
+            ],
+        )
+
+        response = self.client.get(reverse('budgets:balance', kwargs=dict(pk=budget.pk)), data={'date': '2021-05-01'})
+        self.assertEqual(response.json(), {'date': '2021-05-01', 'balance': '10.00'})
+
+
+class BudgetBalanceAPIViewTest(APITestCase):
+    def test_cannot_get_balance_of_someone_else_budget(self):
+        budget = BudgetFactory()
+        user = UserFactory()
+        self.client.force_authenticate(user)
+
+        response = self.client.get(reverse('budgets:balance', kwargs=dict(pk=budget.pk)), data={'date': '2021-05-01'})
+        self.assertEqual(response.status_code, 404)
+        self.assertDictEqual(response.json(), {'detail': 'Not found.'})
+
+    def test_date_is_required(self):
+        member = UserFactory()
+        budget = BudgetFactory(members=(member,))
+        self.client.force_authenticate(member)
+
+        response = self.client.get(reverse('budgets:balance', kwargs=dict(pk=budget.pk)))
+        self.assertEqual(response.status_code, 400)
+        self.assertDictEqual(response.json(), {'date': ['This field is required.']})
+
+    def test_get_balance(self):
+        member = UserFactory()
+        budget = BudgetFactory(members=(member,))
+        BudgetDailyBalance.objects.create(
+            budget=budget, date=datetime.date(2021, 5, 1), opening_balance=0, closing_balance='12.50'
+        )
+        self.client.force_authenticate(member)
+
+        response = self.client.get(reverse('budgets:balance', kwargs=dict(pk=budget.pk)), data={'date': '2021-05-03'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'date': '2021-05-03', 'balance': '12.50'})
 
 
 class TransferCreateAPIViewTest(APITestCase):
@@ -182,3 +770,49 @@ class WithdrawalCreateAPIViewTest(APITestCase):
         self.assertEqual(response.status_code, 201)
         transaction = Transaction.objects.get(budget=budget)
         self.assertEqual(response.json(), camelize(TransferSerializer(transaction).data))
+
+
+class TransactionBatchCreateAPIViewTest(APITestCase):
+    def test_cannot_create_transactions_as_unauthenticated_user(self):
+        budget = BudgetFactory()
+
+        response = self.client.post(
+            reverse('budgets:create-transactions-batch', kwargs=dict(pk=budget.pk)),
+            data=dict(transactions=[dict(type=TransactionType.TRANSFER, title='Debt', amount='12.50')]),
+            format='json',
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertDictEqual(response.json(), {'detail': 'Authentication credentials were not provided.'})
+
+    def test_cannot_create_transactions_in_someone_else_budget(self):
+        budget = BudgetFactory()
+        user = UserFactory()
+        self.client.force_authenticate(user)
+
+        response = self.client.post(
+            reverse('budgets:create-transactions-batch', kwargs=dict(pk=budget.pk)),
+            data=dict(transactions=[dict(type=TransactionType.TRANSFER, title='Debt', amount='12.50')]),
+            format='json',
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertDictEqual(response.json(), {'detail': 'Not found.'})
+
+    def test_create_transactions(self):
+        member = UserFactory()
+        budget = BudgetFactory(members=(member,), balance='0')
+        self.client.force_authenticate(member)
+
+        response = self.client.post(
+            reverse('budgets:create-transactions-batch', kwargs=dict(pk=budget.pk)),
+            data=dict(
+                transactions=[
+                    dict(type=TransactionType.TRANSFER, title='Debt', amount='12.50'),
+                    dict(type=TransactionType.WITHDRAWAL, amount='2.50'),
+                ]
+            ),
+            format='json',
+        )
+        self.assertEqual(response.status_code, 201)
+        transactions = list(Transaction.objects.filter(budget=budget).order_by('id'))
+        self.assertEqual(len(transactions), 2)
+        self.assertEqual(response.json(), camelize(TransactionBatchSerializer(transactions).data))
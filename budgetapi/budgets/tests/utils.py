@@ -0,0 +1,25 @@
+from django.core.management import call_command
+from django.test import override_settings
+
+# forked processes of a test share the database, so the database cache stands for a shared backend like memcached
+SHARED_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'test_shared_cache'},
+}
+
+
+class SharedCacheMixin:
+    """
+    Runs the tests with a cache backend shared by the test process and the processes it forks.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls._shared_caches = override_settings(CACHES=SHARED_CACHES)
+        cls._shared_caches.enable()
+        super().setUpClass()
+        call_command('createcachetable')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls._shared_caches.disable()
@@ -1,9 +1,15 @@
 # Routers provide an easy way of automatically determining the URL conf.
 from budgets.views import (
     BudgetAddMemberAPIView,
-    BudgetCreateAPIView,
+    BudgetBalanceAPIView,
+    BudgetBalanceHistoryAPIView,
+    BudgetBulkMembersAPIView,
+    BudgetListCreateAPIView,
     BudgetRetrieveAPIView,
+    TransactionBatchCreateAPIView,
+    TransactionExportAPIView,
     TransactionListAPIView,
+    TransactionSummaryAPIView,
     TransferCreateAPIView,
     WithdrawalCreateAPIView,
 )
@@ -12,10 +18,16 @@ from django.urls import path
 app_name = 'budgets'
 
 urlpatterns = [
-    path('', BudgetCreateAPIView.as_view(), name='create-budget'),
+    path('', BudgetListCreateAPIView.as_view(), name='create-budget'),
     path('<int:pk>/', BudgetRetrieveAPIView.as_view(), name='budget-details'),
     path('<int:pk>/members/', BudgetAddMemberAPIView.as_view(), name='add-member'),
+    path('<int:pk>/members/bulk/', BudgetBulkMembersAPIView.as_view(), name='bulk-members'),
     path('<int:pk>/transactions/', TransactionListAPIView.as_view(), name='transactions'),
+    path('<int:pk>/transactions/export/', TransactionExportAPIView.as_view(), name='export-transactions'),
+    path('<int:pk>/transactions/batch/', TransactionBatchCreateAPIView.as_view(), name='create-transactions-batch'),
+    path('<int:pk>/balance/', BudgetBalanceAPIView.as_view(), name='balance'),
+    path('<int:pk>/balance-history/', BudgetBalanceHistoryAPIView.as_view(), name='balance-history'),
+    path('<int:pk>/summary/', TransactionSummaryAPIView.as_view(), name='summary'),
     path('<int:pk>/transfers/', TransferCreateAPIView.as_view(), name='create-transfer'),
     path('<int:pk>/withdrawals/', WithdrawalCreateAPIView.as_view(), name='create-withdrawal'),
 ]
@@ -1,34 +1,154 @@
-from typing import cast
+from typing import Any, List, Optional, Type, cast
 
-from budgets.filters import TransactionFilter
-from budgets.models import Budget, Transaction
+from budgets.exports import EXPORT_FORMATS
+from budgets.filters import BudgetDailyBalanceFilter, TransactionFilter
+from budgets.memberships import membership_cache
+from budgets.models import Budget, BudgetDailyBalance, Transaction
+from budgets.pagination import KeysetPagination
+from budgets.profiling import PROFILE_HEADER, RequestProfiler, start_profiling
 from budgets.serializers import (
     BudgetAddMemberSerializer,
+    BudgetBalanceSerializer,
+    BudgetBulkMembersSerializer,
+    BudgetDailyBalanceSerializer,
+    BudgetMemberCountSerializer,
     BudgetSerializer,
+    FastTransactionSerializer,
+    TransactionBatchSerializer,
     TransactionSerializer,
+    TransactionSummarySerializer,
     TransferSerializer,
     WithdrawalSerializer,
 )
+from budgets.summaries import BALANCE_BUCKETS, downsample_daily_balances, get_summary
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.db import models
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import models, router
+from django.http import Http404, StreamingHttpResponse
+from django.http.response import HttpResponseBase
+from django.utils.cache import get_conditional_response
 from django.utils.functional import cached_property
-from rest_framework.generics import CreateAPIView, GenericAPIView, ListAPIView, RetrieveAPIView, get_object_or_404
+from django.utils.http import http_date
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter, PolymorphicProxySerializer, extend_schema
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import (
+    CreateAPIView,
+    GenericAPIView,
+    ListAPIView,
+    ListCreateAPIView,
+    RetrieveAPIView,
+    get_object_or_404,
+)
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.serializers import BaseSerializer
+
+from budgetapi.replicas import read_from_replica
+
+MEMBERS_FORMATS = ('full', 'count')
+
+
+class ProfilingMixin(GenericAPIView):
+    # staff users can profile a request with the X-Profile header or the profile query parameter, the profile covers
+    # the handler after authentication and permission checks
+    profiler: Optional[RequestProfiler] = None
+
+    def initial(self, request: Request, *args: Any, **kwargs: Any) -> None:
+        super().initial(request, *args, **kwargs)
+        self.profiler = start_profiling(request)
+
+    def finalize_response(self, request: Request, response: Response, *args: Any, **kwargs: Any) -> Response:
+        if self.profiler is not None:
+            response[PROFILE_HEADER] = self.profiler.save(request, self.kwargs.get('pk'), response.status_code)
+            self.profiler = None
+        return super().finalize_response(request, response, *args, **kwargs)
 
 
-class BudgetCreateAPIView(CreateAPIView):
+class ReplicaReadMixin(GenericAPIView):
+    # safe requests read from the replica, a user who wrote recently is pinned to the primary by PrimaryPinMiddleware
+    def dispatch(self, request: Request, *args: Any, **kwargs: Any) -> HttpResponseBase:  # type: ignore[override]
+        if request.method not in SAFE_METHODS:
+            return cast(HttpResponseBase, super().dispatch(request, *args, **kwargs))
+        with read_from_replica():
+            return cast(HttpResponseBase, super().dispatch(request, *args, **kwargs))
+
+
+class BudgetListCreateAPIView(ListCreateAPIView, ProfilingMixin):
     serializer_class = BudgetSerializer
+    pagination_class = KeysetPagination
+
+    @cached_property
+    def members_format(self) -> str:
+        members_format = self.request.query_params.get('members', 'full')
+        if members_format not in MEMBERS_FORMATS:
+            raise ValidationError({'members': [f'Select one of: {", ".join(MEMBERS_FORMATS)}.']})
+        return members_format
+
+    def get_queryset(self) -> models.QuerySet['Budget']:
+        budget_ids = membership_cache.get(cast(User, self.request.user).pk)
+        queryset = Budget.objects.with_total_balance().filter(pk__in=budget_ids).select_related('creator')
+        if self.members_format == 'count':
+            return queryset.annotate(member_count=models.Count('members'))
+        return queryset.prefetch_related(
+            models.Prefetch('members', queryset=User.objects.only('id', 'username', 'first_name', 'last_name'))
+        )
+
+    def get_serializer_class(self) -> Type[BaseSerializer]:
+        if self.request.method == 'GET' and self.members_format == 'count':
+            return BudgetMemberCountSerializer
+        return BudgetSerializer
+
+    @extend_schema(
+        parameters=[OpenApiParameter('members', enum=list(MEMBERS_FORMATS), default='full')],
+        responses=PolymorphicProxySerializer(
+            'BudgetList', serializers=[BudgetSerializer, BudgetMemberCountSerializer], resource_type_field_name=None
+        ),
+    )
+    def get(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        return self.list(request, *args, **kwargs)
+
 
+class BudgetConditionalGetMixin(ProfilingMixin):
+    # answers with 304 Not Modified when the budget's version matches If-None-Match (or it was not modified since
+    # If-Modified-Since) before anything is serialized; no docstring so it does not end up in the API description
+    def get(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        budget_id = self.kwargs['pk']
+        if not membership_cache.is_member(cast(User, request.user).pk, budget_id):
+            raise Http404
+        state = Budget.objects.get_version(budget_id)
+        if state is None:
+            raise Http404
 
-class BudgetRetrieveAPIView(RetrieveAPIView):
+        # the version is read before the response data, so a concurrent change can only make the ETag older
+        version, modified_at = state
+        etag = f'W/"{budget_id}-{version}"'
+        last_modified = int(modified_at.timestamp())
+        if get_conditional_response(cast(WSGIRequest, request._request), etag=etag, last_modified=last_modified):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = super().get(request, *args, **kwargs)  # type: ignore
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        return response
+
+
+class BudgetRetrieveAPIView(BudgetConditionalGetMixin, RetrieveAPIView):
     serializer_class = BudgetSerializer
 
     def get_queryset(self) -> models.QuerySet['Budget']:
-        return Budget.objects.filter(members=cast(User, self.request.user)).select_related('creator')
+        return Budget.objects.select_related('creator')
 
+    def get_object(self) -> Budget:
+        if not membership_cache.is_member(cast(User, self.request.user).pk, self.kwargs['pk']):
+            raise Http404
+        return cast(Budget, super().get_object())
 
-class BudgetAddMemberAPIView(CreateAPIView):
-    serializer_class = BudgetAddMemberSerializer
 
+class BudgetCreatorAPIViewMixin(ProfilingMixin):
     def get_serializer_context(self) -> dict:
         context = super().get_serializer_context()
         context['budget'] = get_object_or_404(
@@ -37,10 +157,20 @@ class BudgetAddMemberAPIView(CreateAPIView):
         return context
 
 
-class BudgetAPIViewMixin(GenericAPIView):
+class BudgetAddMemberAPIView(CreateAPIView, BudgetCreatorAPIViewMixin):
+    serializer_class = BudgetAddMemberSerializer
+
+
+class BudgetBulkMembersAPIView(CreateAPIView, BudgetCreatorAPIViewMixin):
+    serializer_class = BudgetBulkMembersSerializer
+
+
+class BudgetAPIViewMixin(ProfilingMixin):
     @cached_property
     def budget(self) -> Budget:
-        return get_object_or_404(Budget.objects.filter(members=cast(User, self.request.user)), pk=self.kwargs['pk'])
+        if not membership_cache.is_member(cast(User, self.request.user).pk, self.kwargs['pk']):
+            raise Http404
+        return get_object_or_404(Budget, pk=self.kwargs['pk'])
 
     def get_serializer_context(self) -> dict:
         context = super().get_serializer_context()
@@ -48,14 +178,128 @@ class BudgetAPIViewMixin(GenericAPIView):
         return context
 
 
-class TransactionListAPIView(ListAPIView, BudgetAPIViewMixin):
+class TransactionListAPIView(ReplicaReadMixin, BudgetConditionalGetMixin, ListAPIView, BudgetAPIViewMixin):
     serializer_class = TransactionSerializer
     filterset_class = TransactionFilter
+    pagination_class = KeysetPagination
 
     def get_queryset(self) -> models.QuerySet['Transaction']:
-        return (
-            Transaction.objects.filter(budget=self.budget).select_related('creator', 'category').order_by('-created_at')
+        return Transaction.objects.filter(budget=self.budget).order_by('-created_at', '-id')
+
+    def list(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        queryset = self.filter_queryset(self.get_queryset()).values_list(*FastTransactionSerializer.fields, named=True)
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(FastTransactionSerializer(cast(List[Any], page)).data)
+
+
+class TransactionExportAPIView(ReplicaReadMixin, BudgetAPIViewMixin):
+    filterset_class = TransactionFilter
+
+    def get_queryset(self) -> models.QuerySet['Transaction']:
+        return Transaction.objects.filter(budget=self.budget).order_by('-created_at', '-id')
+
+    @extend_schema(
+        parameters=[OpenApiParameter('file_format', enum=list(EXPORT_FORMATS), default='csv')],
+        responses={(200, content_type): OpenApiTypes.STR for content_type, _ in EXPORT_FORMATS.values()},
+    )
+    def get(self, request: Request, *args: Any, **kwargs: Any) -> StreamingHttpResponse:
+        file_format = request.query_params.get('file_format', 'csv')
+        if file_format not in EXPORT_FORMATS:
+            raise ValidationError({'file_format': [f'Select one of: {", ".join(EXPORT_FORMATS)}.']})
+
+        # the response is streamed after the view returns, so the database is chosen now
+        queryset = self.filter_queryset(self.get_queryset()).using(router.db_for_read(Transaction))
+        content_type, export = EXPORT_FORMATS[file_format]
+
+        response = StreamingHttpResponse(
+            export(queryset, settings.BUDGETS_EXPORT_CHUNK_SIZE), content_type=f'{content_type}; charset=utf-8'
         )
+        response['Content-Disposition'] = f'attachment; filename="budget-{self.budget.pk}-transactions.{file_format}"'
+        return response
+
+
+class TransactionSummaryAPIView(BudgetAPIViewMixin):
+    serializer_class = TransactionSummarySerializer
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter('created_at_after', OpenApiTypes.DATETIME),
+            OpenApiParameter('created_at_before', OpenApiTypes.DATETIME),
+            OpenApiParameter('bucket', enum=['month']),
+        ],
+        responses=TransactionSummarySerializer(many=True),
+    )
+    def get(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        filterset = TransactionFilter(request.query_params, queryset=Transaction.objects.none())
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+
+        bucket = request.query_params.get('bucket')
+        if bucket not in (None, 'month'):
+            raise ValidationError({'bucket': ['Select one of: month.']})
+
+        created_at = filterset.form.cleaned_data['created_at']
+        summary = get_summary(
+            self.budget.pk,
+            after=created_at.start if created_at else None,
+            before=created_at.stop if created_at else None,
+            by_month=bucket == 'month',
+        )
+        return Response(self.get_serializer(summary, many=True).data)
+
+
+class BudgetBalanceHistoryAPIView(ReplicaReadMixin, BudgetAPIViewMixin):
+    serializer_class = BudgetDailyBalanceSerializer
+    filterset_class = BudgetDailyBalanceFilter
+
+    def get_queryset(self) -> models.QuerySet['BudgetDailyBalance']:
+        return BudgetDailyBalance.objects.filter(budget=self.budget).order_by('date')
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter('date_after', OpenApiTypes.DATE),
+            OpenApiParameter('date_before', OpenApiTypes.DATE),
+            OpenApiParameter('bucket', enum=list(BALANCE_BUCKETS), default='day'),
+        ],
+        responses=BudgetDailyBalanceSerializer(many=True),
+    )
+    def get(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        bucket = request.query_params.get('bucket', 'day')
+        if bucket not in BALANCE_BUCKETS:
+            raise ValidationError({'bucket': [f'Select one of: {", ".join(BALANCE_BUCKETS)}.']})
+
+        if self.budget.shard_count > 1:
+            # snapshots of sharded budgets are not recorded on each transaction
+            filterset = self.filterset_class(request.query_params, queryset=self.get_queryset())
+            if not filterset.is_valid():
+                raise ValidationError(filterset.errors)
+            date = filterset.form.cleaned_data['date']
+            days = BudgetDailyBalance.objects.compute_days(
+                self.budget.pk,
+                after=date.start.date() if date and date.start else None,
+                before=date.stop.date() if date and date.stop else None,
+            )
+        else:
+            days = self.filter_queryset(self.get_queryset()).values(
+                'date', 'opening_balance', 'closing_balance', 'inflow', 'outflow', 'count'
+            )
+        return Response(self.get_serializer(downsample_daily_balances(days, bucket), many=True).data)
+
+
+class BudgetBalanceAPIView(ReplicaReadMixin, BudgetAPIViewMixin):
+    serializer_class = BudgetBalanceSerializer
+
+    @extend_schema(parameters=[OpenApiParameter('date', OpenApiTypes.DATE, required=True)])
+    def get(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        serializer = self.get_serializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        date = serializer.validated_data['date']
+
+        if self.budget.shard_count > 1:
+            balance = BudgetDailyBalance.objects.compute_balance_on(self.budget.pk, date)
+        else:
+            balance = BudgetDailyBalance.objects.balance_on(self.budget.pk, date)
+        return Response(self.get_serializer({'date': date, 'balance': balance}).data)
 
 
 class TransferCreateAPIView(CreateAPIView, BudgetAPIViewMixin):
@@ -64,3 +308,7 @@ class TransferCreateAPIView(CreateAPIView, BudgetAPIViewMixin):
 
 class WithdrawalCreateAPIView(CreateAPIView, BudgetAPIViewMixin):
     serializer_class = WithdrawalSerializer
+
+
+class TransactionBatchCreateAPIView(CreateAPIView, BudgetAPIViewMixin):
+    serializer_class = TransactionBatchSerializer
@@ -7,6 +7,8 @@ import sys
 def main() -> None:
     """Run administrative tasks."""
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'budgetapi.settings')
+    if sys.argv[1:2] == ['test'] and os.environ['DJANGO_SETTINGS_MODULE'] == 'budgetapi.settings':
+        os.environ['DJANGO_SETTINGS_MODULE'] = 'budgetapi.settings_test'
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc:
@@ -9,9 +9,10 @@ echo "Waiting for PostgreSQL"
 echo "Running migrations"
 
 python manage.py migrate
+python manage.py createcachetable
 
 echo "Loading fixtures"
 
-python manage.py loaddata ../fixtures/*.json
+python manage.py bulk_load ../fixtures/*.json
 
 echo "Bootstrapped app"
@@ -6,4 +6,5 @@ set -o nounset
 . /app/entrypoint/wait-postgres.sh
 
 python manage.py migrate
+python manage.py createcachetable
 python manage.py runserver 0.0.0.0:8000 "$@"